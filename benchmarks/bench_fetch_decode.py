@@ -0,0 +1,63 @@
+"""Decode cost of a fetched rules file: JSON+base64 contents vs raw media type.
+
+Run: python -m benchmarks.bench_fetch_decode
+"""
+from __future__ import annotations
+
+import base64
+import json
+import time
+import tracemalloc
+
+from benchmarks.synthetic import make_rules_text
+from bot.services.github_store import git_blob_sha
+
+SIZES = (100_000, 500_000, 1_000_000)
+
+
+def _json_body(raw: bytes) -> bytes:
+    # GitHub wraps base64 content at 60 columns
+    b64 = base64.encodebytes(raw).decode("ascii")
+    return json.dumps({"sha": git_blob_sha(raw), "encoding": "base64", "content": b64}).encode("utf-8")
+
+
+def decode_json(body: bytes) -> tuple[str, str]:
+    """Previous path: r.json() + base64 decode."""
+    data = json.loads(body)
+    return data["sha"], base64.b64decode(data["content"]).decode("utf-8")
+
+
+def decode_raw(body: bytes) -> tuple[str, str]:
+    """Raw media type: decode bytes, compute blob sha locally."""
+    return git_blob_sha(body), body.decode("utf-8")
+
+
+def _measure(fn, body: bytes, repeat: int = 3) -> tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(body)
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    fn(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main() -> None:
+    print(f"{'lines':>10} {'MB':>6} | {'json ms':>8} {'json peak MB':>12} | {'raw ms':>8} {'raw peak MB':>11} | speedup")
+    for n in SIZES:
+        raw = make_rules_text(n).encode("utf-8")
+        body = _json_body(raw)
+        assert decode_json(body) == decode_raw(raw)
+        t_json, m_json = _measure(decode_json, body)
+        t_raw, m_raw = _measure(decode_raw, raw)
+        print(
+            f"{n:>10} {len(raw) / 1e6:>6.1f} | {t_json * 1e3:>8.1f} {m_json / 1e6:>12.1f} |"
+            f" {t_raw * 1e3:>8.1f} {m_raw / 1e6:>11.1f} | {t_json / t_raw:>6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Tail latency of GitHubFileStore.fetch with and without hedged reads.
+
+Sequential revalidating fetches (cache TTL 0) against the fake GitHub server
+under injected latency distributions. Reports p50/p99 wall time and the
+share of extra (hedge) requests for each hedge quantile.
+
+Run: python -m benchmarks.bench_hedged_reads [--n 300]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import time
+
+from benchmarks.synthetic import make_rules_text
+from bot.testing.fake_github import FakeGitHub
+
+PATH = "rules/private.list"
+GET = "GET /repos/o/r/contents/{path}"
+
+
+def lognormal(rnd: random.Random):
+    return lambda: rnd.lognormvariate(math.log(0.04), 0.6)
+
+
+def long_tail(rnd: random.Random):
+    # Mostly fast, with 3% of responses stuck for ~1 s
+    return lambda: rnd.uniform(0.8, 1.2) if rnd.random() < 0.03 else rnd.uniform(0.02, 0.06)
+
+
+DISTRIBUTIONS = {"lognormal(40ms, 0.6)": lognormal, "long tail (3% ~1s)": long_tail}
+
+
+def _pct(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+async def run_case(latency, quantile: float, n: int):
+    fake = FakeGitHub(latency=latency)
+    fake.put_file(PATH, make_rules_text(2000))
+    os.environ["GITHUB_API_URL"] = await fake.start()
+    os.environ["GITHUB_HEDGE_QUANTILE"] = str(quantile)
+    from bot.config import Settings
+    from bot.services.github_store import GitHubFileStore
+
+    store = GitHubFileStore(Settings())  # type: ignore[call-arg]
+    store.cache_ttl = 0
+    timings = []
+    try:
+        for _ in range(n):
+            t0 = time.perf_counter()
+            await store.fetch(file_path=PATH)
+            timings.append(time.perf_counter() - t0)
+    finally:
+        await store.close()
+        await fake.close()
+    return timings, fake.requests[GET] / n - 1
+
+
+async def main_async(n: int) -> None:
+    os.environ.setdefault("BOT_TOKEN", "bench")
+    os.environ.setdefault("GITHUB_TOKEN", "bench")
+    os.environ["GITHUB_OWNER"], os.environ["GITHUB_REPO"] = "o", "r"
+    print(f"{n} sequential fetches per case (If-None-Match revalidation)")
+    print(f"{'latency':<22} {'hedge':>8} {'p50 ms':>8} {'p99 ms':>8} {'extra req':>10}")
+    for name, make in DISTRIBUTIONS.items():
+        for quantile in (0.0, 0.95, 0.9):
+            timings, extra = await run_case(make(random.Random(42)), quantile, n)
+            label = "off" if not quantile else f"p{quantile * 100:.0f}"
+            print(f"{name:<22} {label:>8} {_pct(timings, 50) * 1e3:>8.0f} {_pct(timings, 99) * 1e3:>8.0f} {extra:>9.1%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=300)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.n))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""parse_text() throughput: the original regex parser vs the split-based tokenizer.
+
+The baseline is parse_text() as it was before the tokenizer (commit
+3901c11), copied verbatim with its four-type enum and dataclass records:
+RULE_RE per line, Enum(value) in try/except, no interning. Both run under
+the same GC settings. A mixed file with the other Shadowrocket rule types shows how
+many lines each parser recognises.
+
+Run: python -m benchmarks.bench_parse
+"""
+from __future__ import annotations
+
+import re
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import List, Optional
+
+from benchmarks.synthetic import make_mixed_rules_text, make_rules_text
+from bot.models.enums import Policy
+from bot.services.rules_file import parse_text
+
+SIZES = (10_000, 100_000, 1_000_000)
+
+
+class BaselineRuleType(str, Enum):
+    DOMAIN_SUFFIX = "DOMAIN-SUFFIX"
+    DOMAIN = "DOMAIN"
+    DOMAIN_KEYWORD = "DOMAIN-KEYWORD"
+    IP_CIDR = "IP-CIDR"
+
+
+@dataclass
+class BaselineRule:
+    type: BaselineRuleType
+    value: str
+    policy: Optional[Policy]
+
+
+@dataclass
+class BaselineLine:
+    kind: str
+    text: str
+    rule: Optional[BaselineRule] = None
+
+
+RULE_RE = re.compile(r"^\s*([A-Z\-]+)\s*,\s*([^,#]+?)\s*(?:,\s*([A-Z]+)\s*)?$")
+
+
+def parse_baseline(text: str) -> List[BaselineLine]:
+    lines: List[BaselineLine] = []
+    for raw in text.splitlines():
+        s = raw.rstrip("\n")
+        if not s or s.lstrip().startswith("#"):
+            lines.append(BaselineLine(kind="comment", text=raw))
+            continue
+        m = RULE_RE.match(s)
+        if not m:
+            lines.append(BaselineLine(kind="other", text=raw))
+            continue
+        t_raw, v_raw, p_raw = m.group(1), m.group(2), m.group(3)
+        try:
+            rtype = BaselineRuleType(t_raw)
+        except Exception:
+            lines.append(BaselineLine(kind="other", text=raw))
+            continue
+        policy = None
+        if p_raw:
+            try:
+                policy = Policy(p_raw)
+            except Exception:
+                policy = None
+        rule = BaselineRule(type=rtype, value=v_raw.strip(), policy=policy)
+        lines.append(BaselineLine(kind="rule", text=raw, rule=rule))
+    return lines
+
+
+def _fields(lines) -> list:
+    """What both parsers must agree on (the baseline also keeps the raw text of rule lines)."""
+    return [(l.kind, (l.rule.type.value, l.rule.value, l.rule.policy) if l.rule else l.text) for l in lines]
+
+
+def _best(fn, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    print(f"{'lines':>9} | {'baseline ms':>11} {'Mlines/s':>8} | {'tokenizer ms':>12} {'Mlines/s':>8} | speedup")
+    for n in SIZES:
+        text = make_rules_text(n)
+        assert _fields(parse_text(text)) == _fields(parse_baseline(text))
+        repeat = 5 if n <= 100_000 else 2
+        t_prev = _best(parse_baseline, text, repeat)
+        t_new = _best(parse_text, text, repeat)
+        print(
+            f"{n:>9} | {t_prev * 1e3:>11.1f} {n / t_prev / 1e6:>8.2f} |"
+            f" {t_new * 1e3:>12.1f} {n / t_new / 1e6:>8.2f} | {t_prev / t_new:>6.1f}x"
+        )
+
+    mixed = make_mixed_rules_text(100_000)
+    t_prev, t_new = _best(parse_baseline, mixed, 3), _best(parse_text, mixed, 3)
+    rules_prev = sum(1 for l in parse_baseline(mixed) if l.rule)
+    rules_new = sum(1 for l in parse_text(mixed) if l.rule)
+    print(
+        f"mixed 100000 lines: baseline {t_prev * 1e3:.1f} ms, {rules_prev} rules |"
+        f" tokenizer {t_new * 1e3:.1f} ms, {rules_new} rules | {t_prev / t_new:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Full parse_text() vs reparse() against the previous version of the file.
+
+Models a new snapshot arriving after an edit of k lines (the bot's own
+commit, or a push seen by the refresher): half of the edits append rules,
+half remove rules from the middle of the file.
+
+Run: python -m benchmarks.bench_reparse
+"""
+from __future__ import annotations
+
+import time
+
+from benchmarks.synthetic import make_rules_text
+from bot.services.rules_file import parse_text, reparse
+
+SIZES = (100_000, 1_000_000)
+EDITS = (1, 10, 100, 1_000)
+
+
+def _edited(text: str, k: int) -> str:
+    raws = text.splitlines()
+    removed = k // 2
+    step = max(1, len(raws) // (removed + 1))
+    keep = set(range(step, step * (removed + 1), step)) if removed else set()
+    raws = [r for i, r in enumerate(raws) if i not in keep]
+    raws += [f"DOMAIN,added{i}.example" for i in range(k - removed)]
+    return "\n".join(raws) + "\n"
+
+
+def _best(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    print(f"{'lines':>9} {'edited':>7} | {'full ms':>8} | {'reparse ms':>10} | speedup")
+    for n in SIZES:
+        old_text = make_rules_text(n)
+        old_lines = parse_text(old_text)
+        for k in EDITS:
+            text = _edited(old_text, k)
+            assert reparse(old_text, old_lines, text) == parse_text(text)
+            t_full = _best(lambda: parse_text(text))
+            t_inc = _best(lambda: reparse(old_text, old_lines, text))
+            print(f"{n:>9} {k:>7} | {t_full * 1e3:>8.1f} | {t_inc * 1e3:>10.1f} | {t_full / t_inc:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Cost of one rule edit on a large rules file: list copy vs LineRope.
+
+Each rules_file edit used to copy the whole List[Line]; on a LineRope it
+copies one root-to-leaf path. Reports time and memory allocated per edit,
+and render time, at 200k lines.
+
+Run: python -m benchmarks.bench_rule_edits
+"""
+from __future__ import annotations
+
+import time
+import tracemalloc
+
+from benchmarks.synthetic import make_rules_text
+from bot.services.line_rope import LineRope
+from bot.services.rules_file import Line, clear_policy, delete_rule, parse_text, render_lines
+
+N_LINES = 200_000
+EDITS = 50
+
+
+def _list_edit(lines, idx):
+    # The previous implementation of a single-line edit
+    new_lines = list(lines)
+    new_lines[idx] = Line(kind="comment", text="# edited")
+    return new_lines
+
+
+def _measure(edit, lines, indices) -> tuple[float, float]:
+    t0 = time.perf_counter()
+    for i in indices:
+        edit(lines, i)
+    per_edit = (time.perf_counter() - t0) / len(indices)
+    tracemalloc.start()
+    kept = [edit(lines, i) for i in indices[:10]]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return per_edit, allocated / 10
+
+
+def main() -> None:
+    parsed = parse_text(make_rules_text(N_LINES))
+    rope = LineRope(parsed)
+    indices = [i for i, l in enumerate(parsed) if l.rule][:: len(parsed) // EDITS][:EDITS]
+
+    rows = [
+        ("list copy + set", lambda ls, i: _list_edit(ls, i), parsed),
+        ("rope clear_policy", clear_policy, rope),
+        ("rope delete_rule", lambda ls, i: delete_rule(ls, i, "# Removed"), rope),
+    ]
+    print(f"{N_LINES} lines")
+    print(f"{'edit':<20} {'us/edit':>10} {'KB kept/edit':>13}")
+    for name, edit, lines in rows:
+        t, mem = _measure(edit, lines, indices)
+        print(f"{name:<20} {t * 1e6:>10.1f} {mem / 1e3:>13.1f}")
+
+    for name, lines in (("list", parsed), ("rope", rope)):
+        t0 = time.perf_counter()
+        text = render_lines(lines)
+        print(f"render {name}: {(time.perf_counter() - t0) * 1e3:.1f} ms ({len(text) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
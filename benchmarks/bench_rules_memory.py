@@ -0,0 +1,93 @@
+"""Memory held by a parsed rules file: previous dataclasses vs compact immutable records with interned values.
+
+Reports bytes retained per line and per rule (tracemalloc) for the
+previous representation (plain dataclasses with __dict__, raw text kept
+on rule lines, values not interned) and the current one, and the extra
+cost of a second snapshot of the same file, which shares interned values.
+
+Run: python -m benchmarks.bench_rules_memory
+"""
+from __future__ import annotations
+
+import gc
+import re
+import tracemalloc
+from dataclasses import dataclass
+from typing import List, Optional
+
+from benchmarks.synthetic import make_rules_text
+from bot.models.enums import Policy, RuleType
+from bot.services.rules_file import parse_text
+
+SIZES = (100_000, 500_000)
+
+
+@dataclass
+class _PrevRule:
+    type: RuleType
+    value: str
+    policy: Optional[Policy]
+
+
+@dataclass
+class _PrevLine:
+    kind: str
+    text: str
+    rule: Optional[_PrevRule] = None
+
+
+_PREV_RULE_RE = re.compile(r"^\s*([A-Z\-]+)\s*,\s*([^,#]+?)\s*(?:,\s*([A-Z]+)\s*)?$")
+
+
+def parse_previous(text: str) -> List[_PrevLine]:
+    """parse_text() as it was with plain dataclass records."""
+    lines: List[_PrevLine] = []
+    for raw in text.splitlines():
+        if not raw or raw.lstrip().startswith("#"):
+            lines.append(_PrevLine("comment", raw))
+            continue
+        m = _PREV_RULE_RE.match(raw)
+        if not m:
+            lines.append(_PrevLine("other", raw))
+            continue
+        try:
+            rtype = RuleType(m.group(1))
+        except ValueError:
+            lines.append(_PrevLine("other", raw))
+            continue
+        policy = Policy(m.group(3)) if m.group(3) in Policy._value2member_map_ else None
+        lines.append(_PrevLine("rule", raw, _PrevRule(rtype, m.group(2).strip(), policy)))
+    return lines
+
+
+def _retained(parse, text: str, keep: list) -> int:
+    """Bytes still allocated after parse(text) once temporaries are freed."""
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    keep.append(parse(text))
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return after - before
+
+
+def main() -> None:
+    print(f"{'lines':>9} {'rules':>9} | {'prev B/line':>11} {'prev B/rule':>11} | {'now B/line':>10} {'now B/rule':>10} | {'2nd snapshot B/rule':>19}")
+    for n in SIZES:
+        text = make_rules_text(n)
+        n_rules = sum(1 for l in parse_text(text) if l.rule)
+        keep: list = []
+        prev = _retained(parse_previous, text, keep)
+        keep.clear()
+        now = _retained(parse_text, text, keep)
+        # Same content again (e.g. the next version of the file): values are shared
+        second = _retained(parse_text, text, keep)
+        print(
+            f"{n:>9} {n_rules:>9} | {prev / n:>11.0f} {prev / n_rules:>11.0f} |"
+            f" {now / n:>10.0f} {now / n_rules:>10.0f} | {second / n_rules:>19.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
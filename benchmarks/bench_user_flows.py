@@ -0,0 +1,153 @@
+"""Whole user flows (view, paging, add, delete) against the fake GitHub server.
+
+GitHub latency is drawn from a lognormal distribution; the handlers and
+GitHubFileStore run unmodified over real HTTP on 127.0.0.1.
+
+Run: python -m benchmarks.bench_user_flows [--median-ms 80] [--rounds 10]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+from benchmarks.synthetic import make_rules_text
+from bot.handlers.add_rule import on_confirm, on_enter_value
+from bot.handlers.delete_rule import on_del_confirm, on_del_pick, on_delete_query
+from bot.handlers.view_config import on_view_pager, view_config
+from bot.models.enums import RuleType
+from bot.services.rules_file import find_rule_index, parse_text
+from bot.testing.fake_github import FakeGitHub
+
+PATH = "rules/private.list"
+
+
+class _Msg:
+    def __init__(self, text: str = "") -> None:
+        self.text = text
+        self.from_user = SimpleNamespace(id=1, username="bench")
+        self.message = self
+
+    async def answer(self, *args, **kwargs):
+        return self
+
+    async def edit_text(self, *args, **kwargs):
+        return self
+
+    async def delete(self, *args, **kwargs):
+        return True
+
+    async def answer_document(self, *args, **kwargs):
+        return self
+
+
+class _Callback(_Msg):
+    def __init__(self, data: str) -> None:
+        super().__init__()
+        self.data = data
+
+
+class _State:
+    def __init__(self) -> None:
+        self._data: dict = {}
+
+    async def get_data(self):
+        return dict(self._data)
+
+    async def update_data(self, **kwargs):
+        self._data.update(kwargs)
+
+    async def set_state(self, s):
+        pass
+
+    async def clear(self):
+        self._data.clear()
+
+
+async def flow_view(store) -> None:
+    await view_config(_Msg(), store)
+    for page in range(1, 4):
+        await on_view_pager(_Callback(f"view:type:ALL:file:PROXY:page:{page}"), store)
+
+
+async def flow_add(store, value: str) -> None:
+    state = _State()
+    await state.update_data(rule_type="DOMAIN", policy="PROXY")
+    await on_enter_value(_Msg(value), state, store)
+    await on_confirm(_Callback("add:confirm:add"), state, store)
+
+
+async def flow_delete(store, value: str) -> None:
+    state = _State()
+    await state.update_data(file_type="PROXY")
+    await on_delete_query(_Msg(value), state, store)
+    idx = find_rule_index(parse_text((await store.fetch(file_path=PATH))["text"]), RuleType.DOMAIN, value)
+    await on_del_pick(_Callback(f"del:pick:{idx}:0"), state, store)
+    await on_del_confirm(_Callback("del:confirm:yes"), state, store)
+
+
+def _pct(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+async def run(median_ms: float, rounds: int, lines: int) -> None:
+    rnd = random.Random(7)
+    fake = FakeGitHub(latency=lambda: rnd.lognormvariate(math.log(median_ms / 1000), 0.5))
+    fake.put_file(PATH, make_rules_text(lines))
+    base_url = await fake.start()
+
+    os.environ.setdefault("BOT_TOKEN", "bench")
+    os.environ.setdefault("GITHUB_TOKEN", "bench")
+    os.environ["GITHUB_OWNER"], os.environ["GITHUB_REPO"] = fake.owner, fake.repo
+    os.environ["GITHUB_API_URL"] = base_url
+    from bot.config import Settings
+    from bot.services.github_store import GitHubFileStore
+
+    store = GitHubFileStore(Settings())  # type: ignore[call-arg]
+    await store.open()
+
+    timings: dict[str, list[float]] = {"view+3 pages": [], "add": [], "delete": []}
+    requests: dict[str, int] = {k: 0 for k in timings}
+    try:
+        for i in range(rounds):
+            value = f"bench{i}.example.org"
+            for name, coro in (
+                ("view+3 pages", lambda: flow_view(store)),
+                ("add", lambda: flow_add(store, value)),
+                ("delete", lambda: flow_delete(store, value)),
+            ):
+                before = sum(fake.requests.values())
+                t0 = time.perf_counter()
+                await coro()
+                timings[name].append(time.perf_counter() - t0)
+                requests[name] += sum(fake.requests.values()) - before
+    finally:
+        await store.close()
+        await fake.close()
+
+    print(f"GitHub latency: lognormal median {median_ms:.0f} ms, file {lines} lines, {rounds} rounds")
+    print(f"{'flow':<14} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'HTTP/flow':>10}")
+    for name, values in timings.items():
+        print(
+            f"{name:<14} {_pct(values, 50) * 1e3:>8.0f} {_pct(values, 95) * 1e3:>8.0f}"
+            f" {statistics.mean(values) * 1e3:>8.0f} {requests[name] / rounds:>10.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--median-ms", type=float, default=80.0)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--lines", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(run(args.median_ms, args.rounds, args.lines))
+
+
+if __name__ == "__main__":
+    main()
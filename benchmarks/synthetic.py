@@ -0,0 +1,48 @@
+"""Synthetic Shadowrocket rules files for benchmarks."""
+from __future__ import annotations
+
+import random
+
+_TYPES = ("DOMAIN-SUFFIX", "DOMAIN", "DOMAIN-KEYWORD", "IP-CIDR")
+
+
+def make_rules_text(n_lines: int, seed: int = 42) -> str:
+    """Rules file of n_lines lines: mostly rules, with Added markers and comments."""
+    rnd = random.Random(seed)
+    out = ["# Shadowrocket private rules"]
+    i = 0
+    while len(out) < n_lines:
+        rtype = rnd.choice(_TYPES)
+        if rtype == "IP-CIDR":
+            value = f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}/32"
+        elif rtype == "DOMAIN-KEYWORD":
+            value = f"kw{i}"
+        else:
+            value = f"host{i}.example{i % 97}.com"
+        if i % 10 == 0:
+            out.append(f"# Added: 2024-01-01 00:00:00 UTC | User: @user{i % 7}")
+        out.append(f"{rtype},{value}")
+        i += 1
+    return "\n".join(out[:n_lines]) + "\n"
+
+
+_EXTRA_RULES = (
+    "IP-CIDR6,2001:db8:{i:x}::/48,no-resolve",
+    "IP-CIDR,10.{a}.{b}.0/24,DIRECT,no-resolve",
+    "GEOIP,CN,DIRECT",
+    "IP-ASN,{i},PROXY",
+    "USER-AGENT,App{i}/1.0 (iPhone, iOS 17)*",
+    "URL-REGEX,^https?://ads{i}\\.example\\.com/.*{{1,3}},REJECT",
+    "RULE-SET,https://example.com/sets/{i}.list,PROXY",
+    "AND,((DOMAIN-SUFFIX,s{i}.com),(DST-PORT,443)),PROXY",
+)
+
+
+def make_mixed_rules_text(n_lines: int, seed: int = 42) -> str:
+    """Like make_rules_text(), with a fifth of the rules using the other Shadowrocket types and options."""
+    rnd = random.Random(seed)
+    out = make_rules_text(n_lines, seed).splitlines()
+    for n in range(1, len(out), 5):
+        i = n * 7
+        out[n] = rnd.choice(_EXTRA_RULES).format(i=i, a=(i >> 8) & 255, b=i & 255)
+    return "\n".join(out) + "\n"
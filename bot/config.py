@@ -11,11 +11,37 @@ class Settings(BaseSettings):
     bot_token: str = Field(alias="BOT_TOKEN")
 
     github_token: str = Field(alias="GITHUB_TOKEN")
+    github_api_url: str = Field(default="https://api.github.com", alias="GITHUB_API_URL")
     github_owner: str = Field(default="toffguy77", alias="GITHUB_OWNER")
     github_repo: str = Field(default="shadowrocket-configuration-file", alias="GITHUB_REPO")
     github_path_proxy: str = Field(default="rules/private.list", alias="GITHUB_PATH_PROXY")
     github_path_direct: str = Field(default="rules/private.direct.list", alias="GITHUB_PATH_DIRECT")
     github_branch: str = Field(default="main", alias="GITHUB_BRANCH")
+    # Seconds a fetched snapshot is served from memory before revalidating with If-None-Match
+    github_cache_ttl: float = Field(default=5.0, alias="GITHUB_CACHE_TTL")
+    # Circuit breaker: consecutive GitHub failures before going read-only, and seconds until a probe
+    circuit_failure_threshold: int = Field(default=5, alias="CIRCUIT_FAILURE_THRESHOLD")
+    circuit_reset_seconds: float = Field(default=30.0, alias="CIRCUIT_RESET_SECONDS")
+    # Directory for on-disk snapshots of the rules files (empty: disabled)
+    cache_dir: str = Field(default="", alias="CACHE_DIR")
+    # Hedged reads: resend a fetch slower than this quantile of recent latencies (e.g. 0.95; 0 = off)
+    github_hedge_quantile: float = Field(default=0.0, alias="GITHUB_HEDGE_QUANTILE")
+    # Background revalidation of the proxy/direct files and url_check.log; 0 = warm-up only.
+    # Reads of those files use the refreshed snapshot for this interval (+ GITHUB_CACHE_TTL)
+    snapshot_refresh_seconds: float = Field(default=60.0, alias="SNAPSHOT_REFRESH_SECONDS")
+    # Write-behind: coalesce add/delete edits made within this window into one commit; 0 = commit each edit
+    write_behind_seconds: float = Field(default=0.0, alias="WRITE_BEHIND_SECONDS")
+    # Staging mode (github backend): edits are committed to this branch and published to
+    # GITHUB_BRANCH every PUBLISH_INTERVAL_SECONDS (0 = only on /publish); empty = off
+    staging_branch: str = Field(default="", alias="STAGING_BRANCH")
+    publish_interval_seconds: float = Field(default=0.0, alias="PUBLISH_INTERVAL_SECONDS")
+    publish_mode: str = Field(default="squash", alias="PUBLISH_MODE")  # squash | ff
+
+    # Storage backend: "github" (Contents API) or "git_mirror" (local clone + push)
+    store_backend: str = Field(default="github", alias="STORE_BACKEND")
+    git_mirror_url: str = Field(default="", alias="GIT_MIRROR_URL")  # empty: GitHub repo over HTTPS with GITHUB_TOKEN
+    git_mirror_dir: str = Field(default="/tmp/shadowrocket-rules-mirror", alias="GIT_MIRROR_DIR")
+    git_mirror_refresh_seconds: float = Field(default=60.0, alias="GIT_MIRROR_REFRESH_SECONDS")
 
     allowed_users: List[int] = Field(default_factory=list, alias="ALLOWED_USERS")
 
@@ -24,6 +50,10 @@ class Settings(BaseSettings):
 
     metrics_addr: str = Field(default="0.0.0.0:9123", alias="METRICS_ADDR")
 
+    # Push webhook for cache invalidation; the endpoint is only started when a secret is set
+    github_webhook_secret: str = Field(default="", alias="GITHUB_WEBHOOK_SECRET")
+    webhook_addr: str = Field(default="0.0.0.0:9124", alias="WEBHOOK_ADDR")
+
     @field_validator("allowed_users", mode="before")
     @classmethod
     def _parse_allowed_users(cls, v):
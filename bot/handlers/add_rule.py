@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import datetime as dt
+from typing import Any, Dict
+
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.fsm.state import StatesGroup, State
@@ -11,15 +13,16 @@ from bot.keyboards.rule_type import rule_type_kb
 from bot.keyboards.confirm import confirm_add_kb, confirm_replace_kb
 from bot.models.enums import RuleType
 from bot.services.github_store import GitHubFileStore
+from bot.services.store import RuleStore
+from bot.services.write_queue import Notify, WriteBehindQueue
+from bot.services.circuit_breaker import CircuitOpen
+from bot.services.retry import RateLimitExceeded
 from bot.services.rules_file import (
-    parse_text,
+    parse_document,
     list_rules,
-    find_rule_index,
-    add_rule as rf_add_rule,
-    clear_policy as rf_clear_policy,
     rule_line,
     Rule as RFRule,
-    render_lines,
+    RuleOp,
 )
 from bot.validators.domain import normalize_domain_exact, normalize_domain_suffix
 from bot.validators.ip import normalize_ip
@@ -97,18 +100,43 @@ async def on_back_navigation(c: CallbackQuery, state: FSMContext) -> None:
     await c.answer()
 
 
-def _check_duplicate(lines, rtype, value):
+def queued_note(writer: WriteBehindQueue | None) -> str:
+    """Suffix for the optimistic confirmation of an edit left to the write-behind queue."""
+    if writer is None:
+        return ""
+    return f"\n\n⏳ Будет сохранено в GitHub в течение {writer.window:g} с"
+
+
+def queued_commit_notifier(message: Message, rule_text: str) -> Notify:
+    """Follow-up message once a queued edit has been committed (or has failed)."""
+    async def notify(resp: Dict[str, Any] | None, error: BaseException | None) -> None:
+        from aiogram.utils.keyboard import InlineKeyboardBuilder
+        if error is not None:
+            if isinstance(error, CircuitOpen):
+                await message.answer(f"🚧 <code>{rule_text}</code> не сохранено: GitHub недоступен. Попробуйте после {error.retry_time} UTC")
+            else:
+                await message.answer(f"❌ <code>{rule_text}</code> не сохранено в GitHub: {error}")
+            return
+        url = (resp or {}).get("commit", {}).get("html_url")
+        kb = InlineKeyboardBuilder()
+        if url:
+            kb.button(text="🔗 Посмотреть коммит", url=url)
+        await message.answer(f"💾 Сохранено в GitHub: <code>{rule_text}</code>", reply_markup=kb.as_markup() if kb.buttons else None)
+    return notify
+
+
+def _check_duplicate(document, rtype, value):
     """Check if rule exists and return (exists, has_policy, idx)."""
-    idx = find_rule_index(lines, rtype, value)
+    idx = document.find(rtype, value)
     if idx is None:
         return False, False, None
-    existing = lines[idx].rule
+    existing = document.lines[idx].rule
     has_policy = existing and existing.policy is not None
     return True, has_policy, idx
 
 
 @router.message(AddRule.entering_value)
-async def on_enter_value(m: Message, state: FSMContext, store: GitHubFileStore) -> None:
+async def on_enter_value(m: Message, state: FSMContext, store: RuleStore) -> None:
     txt = (m.text or "").strip()
     if txt.startswith("/cancel"):
         await state.clear()
@@ -164,16 +192,21 @@ async def on_enter_value(m: Message, state: FSMContext, store: GitHubFileStore)
     try:
         file_path = store.get_path_for_policy(policy)
         fetched = await store.fetch(file_path=file_path)
-        lines = parse_text(fetched["text"])
+        document = parse_document(fetched)
         if loading_msg:
             await loading_msg.delete()
+    except RateLimitExceeded as e:
+        if loading_msg:
+            await loading_msg.edit_text(f"⏳ Лимит запросов к GitHub исчерпан, попробуйте после {e.reset_time} UTC")
+        await state.clear()
+        return
     except Exception:
         if loading_msg:
             await loading_msg.edit_text("❌ Ошибка загрузки конфига")
         await state.clear()
         return
 
-    exists, has_policy, idx = _check_duplicate(lines, rtype, value)
+    exists, has_policy, idx = _check_duplicate(document, rtype, value)
     rule = RFRule(type=rtype, value=value, policy=None)
     preview = f"Тип: {rtype.value}\nЗначение: {value}\n\nПравило:\n{rule_line(rule)}"
 
@@ -182,7 +215,7 @@ async def on_enter_value(m: Message, state: FSMContext, store: GitHubFileStore)
     elif has_policy:
         await state.update_data(existing_idx=idx)
         await m.answer(
-            f"⚠️ Правило уже существует с политикой\n\nСтарое: {rule_line(lines[idx].rule)}\nНовое: {rule_line(rule)}\n\nЗаменить (убрать политику)?",
+            f"⚠️ Правило уже существует с политикой\n\nСтарое: {rule_line(document.lines[idx].rule)}\nНовое: {rule_line(rule)}\n\nЗаменить (убрать политику)?",
             reply_markup=confirm_replace_kb().as_markup(),
         )
     else:
@@ -194,7 +227,7 @@ async def on_enter_value(m: Message, state: FSMContext, store: GitHubFileStore)
 
 
 @router.callback_query(F.data.in_({"add:confirm:add", "add:confirm:replace", "add:confirm:keep", "add:confirm:cancel"}))
-async def on_confirm(c: CallbackQuery, state: FSMContext, store: GitHubFileStore) -> None:
+async def on_confirm(c: CallbackQuery, state: FSMContext, store: RuleStore, writer: WriteBehindQueue | None = None) -> None:
     action = c.data.split(":")[-1]
     if action == "cancel":
         await state.clear()
@@ -211,13 +244,14 @@ async def on_confirm(c: CallbackQuery, state: FSMContext, store: GitHubFileStore
     try:
         file_path = store.get_path_for_policy(policy)
         fetched = await store.fetch(file_path=file_path)
-        lines = parse_text(fetched["text"])
+        document = parse_document(fetched)
+        lines = document.lines
     except Exception as e:
         await c.message.edit_text(f"❌ Ошибка загрузки конфига: {e}")
         await c.answer()
         return
 
-    exists, has_policy, idx = _check_duplicate(lines, rtype, value)
+    exists, has_policy, idx = _check_duplicate(document, rtype, value)
     rule = RFRule(type=rtype, value=value, policy=None)
 
     if action == "add":
@@ -235,10 +269,21 @@ async def on_confirm(c: CallbackQuery, state: FSMContext, store: GitHubFileStore
             await c.answer()
             return
         cmnt = GitHubFileStore.added_comment(username)
-        new_lines = rf_add_rule(lines, rule, cmnt)
-        new_text = render_lines(new_lines)
+        ops = [RuleOp("add", rule, cmnt)]
         try:
-            resp = await store.commit(new_text, store.commit_message_add(rule_line(rule), username), username, None, fetched["sha"], file_path=file_path)
+            if writer is not None:
+                # Queued edits are replayed on the latest content at flush: nothing to render here
+                writer.submit(file_path, ops, store.commit_message_add(rule_line(rule), username), username, queued_commit_notifier(c.message, rule_line(rule)))
+                resp = {}
+            else:
+                # The cached document's index is updated in place, not rebuilt
+                document.add(rule, cmnt)
+                resp = await store.commit(document.render(), store.commit_message_add(rule_line(rule), username), username, None, fetched["sha"], file_path=file_path, ops=ops)
+        except CircuitOpen as e:
+            await c.message.edit_text(f"🚧 GitHub недоступен, изменения временно отключены. Попробуйте после {e.retry_time} UTC")
+            await state.clear()
+            await c.answer()
+            return
         except Exception as e:
             await c.message.edit_text(f"❌ Ошибка сохранения в GitHub: {e}")
             await state.clear()
@@ -251,7 +296,7 @@ async def on_confirm(c: CallbackQuery, state: FSMContext, store: GitHubFileStore
         kb = InlineKeyboardBuilder()
         if url:
             kb.button(text="🔗 Посмотреть коммит", url=url)
-        await c.message.edit_text(f"✅ <b>Правило добавлено</b>\n\n<code>{rule_line(rule)}</code>", reply_markup=kb.as_markup() if kb.buttons else None)
+        await c.message.edit_text(f"✅ <b>Правило добавлено</b>\n\n<code>{rule_line(rule)}</code>{queued_note(writer)}", reply_markup=kb.as_markup() if kb.buttons else None)
         await state.clear()
         await c.answer("✅ Готово!")
         return
@@ -263,15 +308,28 @@ async def on_confirm(c: CallbackQuery, state: FSMContext, store: GitHubFileStore
         return
 
     if action == "replace":
-        existing_idx = data.get("existing_idx")
-        if existing_idx is not None and existing_idx < len(lines):
-            new_lines = rf_clear_policy(lines, existing_idx)
+        # idx comes from the index of the current snapshot, so a file edited
+        # since the question was asked cannot point it at another line
+        if exists:
+            ops = [RuleOp("clear_policy", rule)]
         else:
             cmnt = GitHubFileStore.added_comment(username)
-            new_lines = rf_add_rule(lines, rule, cmnt)
-        new_text = render_lines(new_lines)
+            ops = [RuleOp("add", rule, cmnt)]
         try:
-            resp = await store.commit(new_text, store.commit_message_add(rule_line(rule), username), username, None, fetched["sha"], file_path=file_path)
+            if writer is not None:
+                writer.submit(file_path, ops, store.commit_message_add(rule_line(rule), username), username, queued_commit_notifier(c.message, rule_line(rule)))
+                resp = {}
+            else:
+                if exists:
+                    document.clear_policy(idx)
+                else:
+                    document.add(rule, cmnt)
+                resp = await store.commit(document.render(), store.commit_message_add(rule_line(rule), username), username, None, fetched["sha"], file_path=file_path, ops=ops)
+        except CircuitOpen as e:
+            await c.message.edit_text(f"🚧 GitHub недоступен, изменения временно отключены. Попробуйте после {e.retry_time} UTC")
+            await state.clear()
+            await c.answer()
+            return
         except Exception as e:
             await c.message.edit_text(f"❌ Ошибка сохранения в GitHub: {e}")
             await state.clear()
@@ -284,6 +342,6 @@ async def on_confirm(c: CallbackQuery, state: FSMContext, store: GitHubFileStore
         kb = InlineKeyboardBuilder()
         if url:
             kb.button(text="🔗 Посмотреть коммит", url=url)
-        await c.message.edit_text(f"✅ <b>Правило сохранено</b>\n\n<code>{rule_line(rule)}</code>", reply_markup=kb.as_markup() if kb.buttons else None)
+        await c.message.edit_text(f"✅ <b>Правило сохранено</b>\n\n<code>{rule_line(rule)}</code>{queued_note(writer)}", reply_markup=kb.as_markup() if kb.buttons else None)
         await state.clear()
         await c.answer("✅ Готово!")
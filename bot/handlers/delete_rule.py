@@ -10,7 +10,13 @@ from urllib.parse import urlparse
 
 from bot.models.enums import Policy, RuleType
 from bot.services.github_store import GitHubFileStore
-from bot.services.rules_file import parse_text, list_rules, delete_rule as rf_delete_rule, render_lines, rule_line
+from bot.handlers.add_rule import queued_commit_notifier, queued_note
+from bot.handlers.view_config import stale_banner
+from bot.services.store import RuleStore
+from bot.services.write_queue import WriteBehindQueue
+from bot.services.circuit_breaker import CircuitOpen
+from bot.services.retry import RateLimitExceeded
+from bot.services.rules_file import parse_document, parse_snapshot, list_rules, rule_line, RuleOp
 from bot.validators.domain import normalize_domain_exact, normalize_domain_suffix
 
 router = Router()
@@ -71,7 +77,7 @@ def _filter_rules_by_query(rules, query: str):
 
 
 @router.message(DeleteRule.entering_query)
-async def on_delete_query(m: Message, state: FSMContext, store: GitHubFileStore) -> None:
+async def on_delete_query(m: Message, state: FSMContext, store: RuleStore) -> None:
     q = (m.text or "").strip()
     if not q:
         await m.answer("⚠️ Пустой запрос")
@@ -84,10 +90,14 @@ async def on_delete_query(m: Message, state: FSMContext, store: GitHubFileStore)
     try:
         file_path = store.get_path_for_policy(file_type)
         fetched = await store.fetch(file_path=file_path)
-        rules_all = list_rules(parse_text(fetched["text"]))
+        rules_all = list_rules(parse_snapshot(fetched))
         filtered = _filter_rules_by_query(rules_all, q)
         if loading_msg:
             await loading_msg.delete()
+    except RateLimitExceeded as e:
+        if loading_msg:
+            await loading_msg.edit_text(f"⏳ Лимит запросов к GitHub исчерпан, попробуйте после {e.reset_time} UTC")
+        return
     except Exception:
         if loading_msg:
             await loading_msg.edit_text("❌ Ошибка загрузки")
@@ -99,6 +109,7 @@ async def on_delete_query(m: Message, state: FSMContext, store: GitHubFileStore)
     await state.set_state(DeleteRule.choosing_rule)
 
     body, btns, nav = _render_delete_page(filtered, page=0)
+    body = stale_banner(fetched) + body
     kb = btns.as_markup()
     nav_markup = nav.as_markup()
     if getattr(nav_markup, "inline_keyboard", None):
@@ -136,7 +147,7 @@ def _render_delete_page(rules, page: int):
 
 
 @router.message(F.text == "🗑️ Удалить правило")
-async def delete_entrypoint(m: Message, state: FSMContext, store: GitHubFileStore) -> None:
+async def delete_entrypoint(m: Message, state: FSMContext, store: RuleStore) -> None:
     await state.clear()
     await state.set_state(DeleteRule.choosing_file)
     from aiogram.utils.keyboard import InlineKeyboardBuilder
@@ -157,14 +168,14 @@ async def on_delete_file_select(c: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.callback_query(F.data.startswith("del:page:"))
-async def on_del_page(c: CallbackQuery, state: FSMContext, store: GitHubFileStore) -> None:
+async def on_del_page(c: CallbackQuery, state: FSMContext, store: RuleStore) -> None:
     page = int(c.data.split(":")[-1])
     data = await state.get_data()
     q = (data.get("delete_filter") or "").strip()
     file_type = data.get("file_type", "PROXY")
     file_path = store.get_path_for_policy(file_type)
     fetched = await store.fetch(file_path=file_path)
-    rules_all = list_rules(parse_text(fetched["text"]))
+    rules_all = list_rules(parse_snapshot(fetched))
     rules = _filter_rules_by_query(rules_all, q)
     body, btns, nav = _render_delete_page(rules, page)
     kb = btns.as_markup()
@@ -176,7 +187,7 @@ async def on_del_page(c: CallbackQuery, state: FSMContext, store: GitHubFileStor
 
 
 @router.callback_query(F.data.startswith("del:pick:"))
-async def on_del_pick(c: CallbackQuery, state: FSMContext, store: GitHubFileStore) -> None:
+async def on_del_pick(c: CallbackQuery, state: FSMContext, store: RuleStore) -> None:
     _, _, idx_str, page_str = c.data.split(":")
     idx_in_file = int(idx_str)
 
@@ -184,7 +195,7 @@ async def on_del_pick(c: CallbackQuery, state: FSMContext, store: GitHubFileStor
     file_type = data.get("file_type", "PROXY")
     file_path = store.get_path_for_policy(file_type)
     fetched = await store.fetch(file_path=file_path)
-    lines = parse_text(fetched["text"])
+    lines = parse_snapshot(fetched)
 
     rules = list_rules(lines)
     # idx_in_file refers to original file indices, so direct match
@@ -211,7 +222,7 @@ async def on_del_pick(c: CallbackQuery, state: FSMContext, store: GitHubFileStor
 
 
 @router.callback_query(F.data.startswith("del:confirm:"))
-async def on_del_confirm(c: CallbackQuery, state: FSMContext, store: GitHubFileStore) -> None:
+async def on_del_confirm(c: CallbackQuery, state: FSMContext, store: RuleStore, writer: WriteBehindQueue | None = None) -> None:
     action = c.data.split(":")[-1]
     if action == "no":
         await state.clear()
@@ -227,7 +238,8 @@ async def on_del_confirm(c: CallbackQuery, state: FSMContext, store: GitHubFileS
     try:
         file_path = store.get_path_for_policy(file_type)
         fetched = await store.fetch(file_path=file_path)
-        lines = parse_text(fetched["text"])
+        document = parse_document(fetched)
+        lines = document.lines
     except Exception as e:
         await c.message.edit_text(f"❌ Ошибка загрузки конфига: {e}")
         await c.answer()
@@ -240,10 +252,20 @@ async def on_del_confirm(c: CallbackQuery, state: FSMContext, store: GitHubFileS
         return
 
     removed_cmnt = GitHubFileStore.removed_comment(username)
-    new_lines = rf_delete_rule(lines, old_idx, removed_comment=removed_cmnt)
-    new_text = render_lines(new_lines)
+    ops = [RuleOp("delete", lines[old_idx].rule, removed_cmnt)]
+    preview = data.get("preview", "rule")
     try:
-        resp = await store.commit(new_text, store.commit_message_delete(data.get("preview", "rule"), username), username, None, fetched["sha"], file_path=file_path)  # type: ignore[arg-type]
+        if writer is not None:
+            # Queued edits are replayed on the latest content at flush: nothing to render here
+            writer.submit(file_path, ops, store.commit_message_delete(preview, username), username, queued_commit_notifier(c.message, preview))
+            resp = {}
+        else:
+            document.delete(old_idx, removed_comment=removed_cmnt)
+            resp = await store.commit(document.render(), store.commit_message_delete(preview, username), username, None, fetched["sha"], file_path=file_path, ops=ops)  # type: ignore[arg-type]
+    except CircuitOpen as e:
+        await c.message.edit_text(f"🚧 GitHub недоступен, изменения временно отключены. Попробуйте после {e.retry_time} UTC")
+        await c.answer()
+        return
     except Exception as e:
         await c.message.edit_text(f"❌ Ошибка сохранения в GitHub: {e}")
         await c.answer()
@@ -255,6 +277,6 @@ async def on_del_confirm(c: CallbackQuery, state: FSMContext, store: GitHubFileS
     kb = InlineKeyboardBuilder()
     if url:
         kb.button(text="🔗 Посмотреть коммит", url=url)
-    await c.message.edit_text(f"✅ <b>Правило удалено</b>\n\n<code>{data.get('preview', '')}</code>", reply_markup=kb.as_markup() if kb.buttons else None)
+    await c.message.edit_text(f"✅ <b>Правило удалено</b>\n\n<code>{data.get('preview', '')}</code>{queued_note(writer)}", reply_markup=kb.as_markup() if kb.buttons else None)
     await state.clear()
     await c.answer("✅ Удалено!")
@@ -2,24 +2,32 @@ from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import Message
 
-from bot.services.github_store import GitHubFileStore
-from bot.services.rules_file import parse_text, render_lines
+from bot.services.circuit_breaker import CircuitOpen
+from bot.services.store import FileChange, RuleStore
+from bot.services.rules_file import parse_snapshot, render_lines
 
 router = Router()
 
 
 @router.message(Command("normalize"))
-async def normalize_config(m: Message, store: GitHubFileStore) -> None:
+async def normalize_config(m: Message, store: RuleStore) -> None:
     loading_msg = await m.answer("⌛ Нормализую...")
     try:
-        fetched = await store.fetch()
-        lines = parse_text(fetched["text"])
-        new_text = render_lines(lines)
-        if new_text == fetched["text"]:
+        fetched = await store.fetch_many([store.path_proxy, store.path_direct])
+        if not fetched:
+            raise RuntimeError("rules files not found")
+        changes = []
+        for path, snapshot in fetched.items():
+            new_text = render_lines(parse_snapshot(snapshot))
+            if new_text != snapshot["text"]:
+                # Empty ops: on conflict the fresh content is re-normalized, not overwritten
+                changes.append(FileChange(path, new_text, snapshot["sha"], ops=[]))
+        if not changes:
             if loading_msg:
                 await loading_msg.edit_text("✅ Конфиг уже нормализован")
             return
-        resp = await store.commit(new_text, "Normalize: drop policy column", m.from_user.username if m.from_user else None, None, fetched["sha"])
+        # Both files in one commit: a half-normalized repository is never published
+        resp = await store.commit_many(changes, "Normalize: drop policy column", m.from_user.username if m.from_user else None, None)
         from aiogram.utils.keyboard import InlineKeyboardBuilder
         url = resp.get("commit", {}).get("html_url")
         kb = InlineKeyboardBuilder()
@@ -27,6 +35,9 @@ async def normalize_config(m: Message, store: GitHubFileStore) -> None:
             kb.button(text="🔗 Посмотреть коммит", url=url)
         if loading_msg:
             await loading_msg.edit_text("✅ <b>Нормализовано</b>", reply_markup=kb.as_markup() if kb.buttons else None)
+    except CircuitOpen as e:
+        if loading_msg:
+            await loading_msg.edit_text(f"🚧 GitHub недоступен, изменения временно отключены. Попробуйте после {e.retry_time} UTC")
     except Exception:
         if loading_msg:
             await loading_msg.edit_text("❌ Ошибка нормализации")
@@ -0,0 +1,36 @@
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from bot.services.circuit_breaker import CircuitOpen
+from bot.services.publisher import BranchPublisher, PublishConflict
+
+router = Router()
+
+
+@router.message(Command("publish"))
+async def publish_command(m: Message, publisher: BranchPublisher | None = None) -> None:
+    if publisher is None:
+        await m.answer("ℹ️ Изменения публикуются сразу: режим staging не включён")
+        return
+    loading_msg = await m.answer("⌛ Публикую...")
+    try:
+        result = await publisher.publish()
+    except CircuitOpen as e:
+        await loading_msg.edit_text(f"🚧 GitHub недоступен, публикация временно отключена. Попробуйте после {e.retry_time} UTC")
+        return
+    except PublishConflict:
+        await loading_msg.edit_text(f"⚠️ Ветка {publisher.target} изменена вручную и конфликтует с {publisher.staging}. Нужно разрешить конфликт в GitHub")
+        return
+    except Exception as e:
+        await loading_msg.edit_text(f"❌ Ошибка публикации: {e}")
+        return
+    if not result["published"]:
+        await loading_msg.edit_text("✅ Нечего публиковать")
+        return
+    from aiogram.utils.keyboard import InlineKeyboardBuilder
+    url = result["commit"].get("html_url")
+    kb = InlineKeyboardBuilder()
+    if url:
+        kb.button(text="🔗 Посмотреть коммит", url=url)
+    await loading_msg.edit_text(f"✅ <b>Опубликовано изменений: {result['published']}</b>", reply_markup=kb.as_markup() if kb.buttons else None)
@@ -2,16 +2,18 @@ from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message
 
-from bot.services.github_store import GitHubFileStore
+from bot.services.store import RuleStore
 
 router = Router()
 
+URL_CHECK_LOG_PATH = "url_check.log"
+
 
 @router.message(Command("urlcheck"))
 @router.message(F.text == "🔍 Проверка URL")
-async def url_check_command(m: Message, store: GitHubFileStore) -> None:
+async def url_check_command(m: Message, store: RuleStore) -> None:
     try:
-        fetched = await store.fetch(file_path="url_check.log")
+        fetched = await store.fetch(file_path=URL_CHECK_LOG_PATH)
         log_content = fetched["text"]
         
         if not log_content or log_content.strip() == "":
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from typing import List, Tuple
+import datetime as dt
+import html
+from typing import Any, Dict, List, Tuple
 
 from aiogram import Router, F
 from aiogram.filters import Command
@@ -8,66 +10,118 @@ from aiogram.types import Message, CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from bot.models.enums import Policy
-from bot.services.github_store import GitHubFileStore
-from bot.services.rules_file import parse_text, list_rules, describe_rule
+from bot.services.store import RuleStore
+from bot.services.retry import RateLimitExceeded
+from bot.services.rules_file import parse_snapshot, list_rules, describe_rule
 from bot.metrics import INPUT_VALID
 
 router = Router()
 
 
+def stale_banner(fetched: Dict[str, Any]) -> str:
+    """Warning line for snapshots served from cache while GitHub is unavailable."""
+    since = fetched.get("stale_since")
+    if since is None:
+        return ""
+    ts = dt.datetime.fromtimestamp(since, dt.timezone.utc).strftime("%Y-%m-%d %H:%M")
+    return f"⚠️ GitHub недоступен, показаны данные на {ts} UTC\n\n"
+
+
 @router.message(Command("stats"))
-async def stats_command(m: Message, store: GitHubFileStore) -> None:
+async def stats_command(m: Message, store: RuleStore) -> None:
     try:
         fetched = await store.fetch()
-        lines = parse_text(fetched["text"])
+        lines = parse_snapshot(fetched)
         rules = list_rules(lines)
         from collections import Counter
         stats = Counter(r.type.value for _, r in rules)
         total = len(rules)
-        lines_text = [f"📊 <b>Статистика правил</b>\n", f"📋 Всего: {total}\n"]
+        lines_text = [f"{stale_banner(fetched)}📊 <b>Статистика правил</b>\n", f"📋 Всего: {total}\n"]
         for rtype, count in sorted(stats.items()):
             pct = count * 100 // total if total else 0
             lines_text.append(f"{rtype}: {count} ({pct}%)")
         await m.answer("\n".join(lines_text))
+    except RateLimitExceeded as e:
+        await m.answer(f"⏳ Лимит запросов к GitHub исчерпан, попробуйте после {e.reset_time} UTC")
     except Exception:
         await m.answer("❌ Ошибка загрузки статистики")
 
 
+RECENT_PAGE_SIZE = 5
+# Rule lines shown per commit in /recent; the rest is summarised
+RECENT_RULES_SHOWN = 3
+
+
+async def build_recent_response(store: RuleStore, page: int = 1):
+    commits = await store.get_recent_commits(limit=RECENT_PAGE_SIZE, page=page)
+    if not commits:
+        return ("💭 Нет последних изменений" if page == 1 else "💭 Более ранних изменений нет"), None
+    lines_text = ["🕒 <b>Последние изменения</b>" + (f" (стр. {page})" if page > 1 else "") + "\n"]
+    for c in commits:
+        msg = html.escape(c.get("commit", {}).get("message", "").split("\n")[0][:50], quote=False)
+        author = c.get("commit", {}).get("author", {}).get("name", "Unknown")
+        date = c.get("commit", {}).get("author", {}).get("date", "")[:10]
+        url = c.get("html_url", "")
+        lines_text.append(f"• <code>{msg}</code>")
+        lines_text.append(f"  {author} | {date}")
+        rules = c.get("rules") or {}
+        changes = [("➕", r) for r in rules.get("added", ())] + [("➖", r) for r in rules.get("removed", ())]
+        for sign, rule in changes[:RECENT_RULES_SHOWN]:
+            lines_text.append(f"  {sign} <code>{html.escape(rule, quote=False)}</code>")
+        if len(changes) > RECENT_RULES_SHOWN:
+            lines_text.append(f"  … и ещё {len(changes) - RECENT_RULES_SHOWN}")
+        if url:
+            lines_text.append(f"  <a href='{url}'>Ссылка</a>")
+        lines_text.append("")
+
+    kb = InlineKeyboardBuilder()
+    if len(commits) == RECENT_PAGE_SIZE:
+        kb.button(text="⬅️ Раньше", callback_data=f"recent:page:{page + 1}")
+    if page > 1:
+        kb.button(text="➡️ Позже", callback_data=f"recent:page:{page - 1}")
+    return "\n".join(lines_text), kb.as_markup() if kb.buttons else None
+
+
 @router.message(Command("recent"))
-async def recent_command(m: Message, store: GitHubFileStore) -> None:
+async def recent_command(m: Message, store: RuleStore) -> None:
     try:
-        commits = await store.get_recent_commits(limit=5)
-        if not commits:
-            await m.answer("💭 Нет последних изменений")
-            return
-        lines_text = ["🕒 <b>Последние изменения</b>\n"]
-        for c in commits:
-            msg = c.get("commit", {}).get("message", "").split("\n")[0][:50]
-            author = c.get("commit", {}).get("author", {}).get("name", "Unknown")
-            date = c.get("commit", {}).get("author", {}).get("date", "")[:10]
-            url = c.get("html_url", "")
-            lines_text.append(f"• <code>{msg}</code>")
-            lines_text.append(f"  {author} | {date}")
-            if url:
-                lines_text.append(f"  <a href='{url}'>Ссылка</a>")
-            lines_text.append("")
-        await m.answer("\n".join(lines_text))
+        body, markup = await build_recent_response(store)
+    except RateLimitExceeded as e:
+        await m.answer(f"⏳ Лимит запросов к GitHub исчерпан, попробуйте после {e.reset_time} UTC")
+        return
     except Exception:
         await m.answer("❌ Ошибка загрузки истории")
+        return
+    await m.answer(body, reply_markup=markup)
+
+
+@router.callback_query(F.data.startswith("recent:page:"))
+async def on_recent_pager(c: CallbackQuery, store: RuleStore) -> None:
+    page = max(1, int(c.data.rsplit(":", 1)[1]))
+    try:
+        body, markup = await build_recent_response(store, page)
+    except RateLimitExceeded as e:
+        await c.answer(f"⏳ Лимит запросов к GitHub исчерпан до {e.reset_time} UTC", show_alert=True)
+        return
+    except Exception:
+        await c.answer("❌ Ошибка загрузки истории", show_alert=True)
+        return
+    await c.message.edit_text(body, reply_markup=markup)
+    await c.answer()
 
 PAGE_SIZE = 20
 
 
-async def build_view_response(store: GitHubFileStore, policy: str | None = None, page: int = 0, rule_type: str | None = None, file_type: str = "PROXY"):
+async def build_view_response(store: RuleStore, policy: str | None = None, page: int = 0, rule_type: str | None = None, file_type: str = "PROXY"):
     file_path = store.get_path_for_policy(file_type)
     fetched = await store.fetch(file_path=file_path)
-    lines = parse_text(fetched["text"])
+    lines = parse_snapshot(fetched)
     rules = list_rules(lines)
     filtered = _filter_rules(rules, None if policy in (None, "ALL") else policy)
     if rule_type and rule_type != "ALL":
         filtered = [r for r in filtered if r[1].type.value == rule_type]
     body, kb = _render_page(filtered, page, rule_type or "ALL", rules, file_type)
-    return body, kb.as_markup()
+    return stale_banner(fetched) + body, kb.as_markup()
 
 
 def _filter_rules(rules: List[Tuple[int, object]], policy: str | None):
@@ -123,9 +177,12 @@ def _render_page(filtered, page: int, rule_type: str, all_rules, file_type: str
 
 @router.message(F.text.in_({"📋 Просмотр конфига", "Просмотр конфига"}))
 @router.message(Command("view"))
-async def view_config(m: Message, store: GitHubFileStore) -> None:
+async def view_config(m: Message, store: RuleStore) -> None:
     try:
         body, markup = await build_view_response(store, policy="ALL", page=0, rule_type="ALL", file_type="PROXY")
+    except RateLimitExceeded as e:
+        await m.answer(f"⏳ Лимит запросов к GitHub исчерпан, попробуйте после {e.reset_time} UTC")
+        return
     except Exception:
         await m.answer("❌ Не удалось получить конфиг из GitHub")
         return
@@ -134,7 +191,7 @@ async def view_config(m: Message, store: GitHubFileStore) -> None:
 
 
 @router.callback_query(F.data.startswith("view:"))
-async def on_view_pager(c: CallbackQuery, store: GitHubFileStore) -> None:
+async def on_view_pager(c: CallbackQuery, store: RuleStore) -> None:
     parts = c.data.split(":")
     
     if parts[1] == "download":
@@ -167,6 +224,9 @@ async def on_view_pager(c: CallbackQuery, store: GitHubFileStore) -> None:
 
     try:
         body, markup = await build_view_response(store, policy="ALL", page=page, rule_type=rule_type, file_type=file_type)
+    except RateLimitExceeded as e:
+        await c.answer(f"⏳ Лимит запросов к GitHub исчерпан до {e.reset_time} UTC", show_alert=True)
+        return
     except Exception:
         await c.answer("❌ Ошибка загрузки", show_alert=True)
         return
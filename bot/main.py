@@ -11,7 +11,12 @@ from bot.config import get_settings
 from bot.utils.logger import setup_logging
 from bot.metrics import start_metrics_server
 from bot.services.github_store import GitHubFileStore
-from bot.handlers import start, add_rule, view_config, delete_rule, cancel, url_check
+from bot.services.git_mirror_store import GitMirrorStore
+from bot.services.publisher import BranchPublisher
+from bot.services.refresher import SnapshotRefresher
+from bot.services.webhook import PushWebhook, start_webhook_server
+from bot.services.write_queue import WriteBehindQueue
+from bot.handlers import start, add_rule, view_config, delete_rule, cancel, url_check, publish
 from bot.middlewares.access import AccessMiddleware
 from bot.middlewares.logging import LoggingMiddleware
 
@@ -26,8 +31,39 @@ async def main() -> None:
     bot = Bot(settings.bot_token, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
     dp = Dispatcher(storage=MemoryStorage())
 
-    store = GitHubFileStore(settings)
+    publisher = None
+    if settings.store_backend == "git_mirror":
+        if settings.staging_branch:
+            logger.warning("STAGING_BRANCH requires the github store backend, ignoring it")
+        store = GitMirrorStore(settings)
+    else:
+        store = GitHubFileStore(settings)
+        if settings.staging_branch:
+            publisher = BranchPublisher(store, settings.github_branch, settings.publish_interval_seconds, settings.publish_mode)
+            try:
+                await publisher.ensure_staging()
+            except Exception as e:
+                # Start degraded; the first publish creates the branch once GitHub answers again
+                logger.warning(f"Could not prepare staging branch {settings.staging_branch}: {e}")
+            dp["publisher"] = publisher
+    await store.open()
     dp["store"] = store
+    writer = None
+    if settings.write_behind_seconds > 0:
+        writer = WriteBehindQueue(store, settings.write_behind_seconds)
+        dp["writer"] = writer
+
+    tracked_paths = [settings.github_path_proxy, settings.github_path_direct, url_check.URL_CHECK_LOG_PATH]
+    refresher = SnapshotRefresher(store, tracked_paths, settings.snapshot_refresh_seconds)
+    refresher.start()
+    if publisher is not None:
+        publisher.start()
+
+    webhook = None
+    webhook_runner = None
+    if settings.github_webhook_secret:
+        webhook = PushWebhook(store, settings.github_webhook_secret, store.branch, tracked_paths)
+        webhook_runner = await start_webhook_server(settings.webhook_addr, webhook)
 
     dp.message.middleware(LoggingMiddleware())
     dp.callback_query.middleware(LoggingMiddleware())
@@ -41,6 +77,7 @@ async def main() -> None:
         view_config.router,
         delete_rule.router,
         url_check.router,
+        publish.router,
         __import__("bot.handlers.normalize", fromlist=["router"]).router,
     )
 
@@ -67,7 +104,18 @@ async def main() -> None:
             logger.warning("Polling task did not stop within timeout")
     finally:
         logger.info("Shutting down bot")
+        if writer is not None:
+            # Before the bot session closes: the flush sends commit follow-ups
+            await writer.close()
         await bot.session.close()
+        await refresher.stop()
+        if publisher is not None:
+            await publisher.stop()
+        if webhook_runner is not None:
+            await webhook_runner.cleanup()
+        if webhook is not None:
+            await webhook.close()
+        await store.close()
 
 
 if __name__ == "__main__":
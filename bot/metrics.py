@@ -1,7 +1,7 @@
 import logging
 from typing import Optional
 
-from prometheus_client import Counter, Histogram, start_http_server
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
 
 # Counters
 RULES_ADDED = Counter("rules_added_total", "Number of rules added")
@@ -10,6 +10,58 @@ RULES_DELETED = Counter("rules_deleted_total", "Number of rules deleted")
 INPUT_VALID = Counter("input_valid_total", "Valid user inputs", ["type"])
 INPUT_INVALID = Counter("input_invalid_total", "Invalid user inputs", ["type"])
 GITHUB_ERRORS = Counter("github_errors_total", "GitHub API errors", ["operation"])
+GITHUB_CONNECTIONS = Counter(
+    "github_connections_total",
+    "Pooled connections to GitHub API by state (new handshake vs keep-alive reuse)",
+    ["state"],
+)
+GITHUB_CACHE = Counter(
+    "github_cache_requests_total",
+    "Snapshot cache lookups in GitHubFileStore.fetch (hit, miss, not_modified, stale)",
+    ["result"],
+)
+GITHUB_FETCH_COALESCED = Counter(
+    "github_fetch_coalesced_total",
+    "Fetch callers that awaited an in-flight request for the same file instead of issuing their own",
+)
+GITHUB_FETCH_HEDGED = Counter(
+    "github_fetch_hedged_total",
+    "Fetches that sent a second (hedge) request because the first was slower than the hedge delay",
+)
+GITHUB_WEBHOOK_EVENTS = Counter(
+    "github_webhook_events_total",
+    "GitHub webhook deliveries by outcome (invalidated, ignored, ping, bad_signature, bad_payload)",
+    ["result"],
+)
+BRANCH_PUBLISHES = Counter(
+    "branch_publishes_total",
+    "Staging-to-published branch promotions by outcome (published, empty, conflict, error)",
+    ["result"],
+)
+
+# Gauges
+GITHUB_RATELIMIT_REMAINING = Gauge(
+    "github_ratelimit_remaining",
+    "Remaining GitHub REST API requests in the current window (X-RateLimit-Remaining)",
+)
+GITHUB_RATELIMIT_RESET = Gauge(
+    "github_ratelimit_reset_timestamp_seconds",
+    "Unix time when the GitHub REST API quota resets (X-RateLimit-Reset)",
+)
+
+GITHUB_CIRCUIT_STATE = Gauge(
+    "github_circuit_state",
+    "GitHub circuit breaker state: 0 closed, 1 half-open, 2 open (read-only degraded mode)",
+)
+RULES_SNAPSHOT_AGE = Gauge(
+    "rules_snapshot_age_seconds",
+    "Seconds since the cached snapshot of a file was last confirmed current with the remote",
+    ["path"],
+)
+WRITE_QUEUE_PENDING = Gauge(
+    "write_queue_pending",
+    "Rule edits waiting in the write-behind queue for the next batched commit",
+)
 
 # Histograms
 GITHUB_FETCH_SECONDS = Histogram(
@@ -22,6 +74,11 @@ GITHUB_COMMIT_SECONDS = Histogram(
     "Time spent committing file to GitHub",
     buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5),
 )
+WRITE_QUEUE_BATCH_SIZE = Histogram(
+    "write_queue_batch_size",
+    "Rule edits coalesced into one write-behind commit",
+    buckets=(1, 2, 5, 10, 20, 50),
+)
 
 
 def start_metrics_server(addr: str) -> None:
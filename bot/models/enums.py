@@ -6,6 +6,19 @@ class RuleType(str, Enum):
     DOMAIN = "DOMAIN"
     DOMAIN_KEYWORD = "DOMAIN-KEYWORD"
     IP_CIDR = "IP-CIDR"
+    # Recognised when reading rules files; the bot only adds the four above
+    IP_CIDR6 = "IP-CIDR6"
+    IP_ASN = "IP-ASN"
+    GEOIP = "GEOIP"
+    DOMAIN_SET = "DOMAIN-SET"
+    DOMAIN_WILDCARD = "DOMAIN-WILDCARD"
+    RULE_SET = "RULE-SET"
+    USER_AGENT = "USER-AGENT"
+    URL_REGEX = "URL-REGEX"
+    DST_PORT = "DST-PORT"
+    AND = "AND"
+    OR = "OR"
+    NOT = "NOT"
 
 
 class Policy(str, Enum):
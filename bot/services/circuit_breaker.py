@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import time
+
+from bot import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+# Gauge values for github_circuit_state
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpen(Exception):
+    """GitHub is considered down; the request was not sent. Retry after retry_at (epoch seconds)."""
+
+    def __init__(self, retry_at: float) -> None:
+        self.retry_at = retry_at
+        super().__init__(f"GitHub circuit open until {self.retry_time} UTC")
+
+    @property
+    def retry_time(self) -> str:
+        return dt.datetime.fromtimestamp(self.retry_at, dt.timezone.utc).strftime("%H:%M:%S")
+
+
+class CircuitBreaker:
+    """Stops calling GitHub after repeated failures instead of queueing handlers on timeouts.
+
+    closed: requests flow; failure_threshold consecutive failures open the circuit.
+    open: requests fail with CircuitOpen until reset_timeout has passed.
+    half_open: one probe request is let through; success closes the circuit,
+    failure opens it for another reset_timeout.
+
+    Only outages count as failures (5xx, connection errors, timeouts); 4xx
+    answers, including rate limiting, mean GitHub is up.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        metrics.GITHUB_CIRCUIT_STATE.set(STATE_VALUES[CLOSED])
+
+    def allow(self) -> None:
+        """Raise CircuitOpen unless a request may be sent now."""
+        if self.state == CLOSED:
+            return
+        now = time.time()
+        if self.state == OPEN:
+            if now - self.opened_at < self.reset_timeout:
+                raise CircuitOpen(self.opened_at + self.reset_timeout)
+            self._set_state(HALF_OPEN)
+            self.probe_started_at = now
+            return
+        # half_open: a single probe at a time; a probe that never reported back expires
+        if now - self.probe_started_at < self.reset_timeout:
+            raise CircuitOpen(self.probe_started_at + self.reset_timeout)
+        self.probe_started_at = now
+
+    def check(self) -> None:
+        """Raise CircuitOpen while the circuit is open, without taking the probe slot.
+
+        For work that reaches GitHub later (queued edits): it is refused in
+        read-only mode, and half-open lets it through like allow() would.
+        """
+        if self.state == OPEN and time.time() - self.opened_at < self.reset_timeout:
+            raise CircuitOpen(self.opened_at + self.reset_timeout)
+
+    def record_success(self) -> None:
+        self.failures = 0
+        if self.state != CLOSED:
+            logger.info("GitHub reachable again, circuit closed")
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+            logger.warning(f"GitHub circuit opened after {self.failures} failure(s), retrying in {self.reset_timeout:.0f}s")
+            self.opened_at = time.time()
+            self._set_state(OPEN)
+
+    def record(self, status: int) -> None:
+        if status >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        metrics.GITHUB_CIRCUIT_STATE.set(STATE_VALUES[state])
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from bot.models.enums import Policy, RuleType
+from bot.services.rules_file import Line, Rule
+
+# 2: rule rows carry options; older entries were parsed without the full set of rule types
+# 3: lines with an unknown policy column are no longer parsed as rules
+FORMAT_VERSION = 3
+_RULE_TYPES = {t.value: t for t in RuleType}
+_POLICIES = {p.value: p for p in Policy}
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PersistedSnapshot:
+    sha: str
+    text: str
+    etag: Optional[str]
+    lines: Optional[List[Line]]
+    saved_at: float  # wall clock (time.time()) of the save
+
+
+class SnapshotDiskCache:
+    """Last known snapshot of each rules file, kept on local disk across restarts.
+
+    One JSON file per (repository, branch, path) holding sha, ETag, text and
+    the parsed lines, so a restarted bot can answer reads before its first
+    GitHub round trip. Writes are atomic (temp file + rename); unreadable or
+    foreign entries are ignored.
+    """
+
+    def __init__(self, directory: str, repo: str, branch: str) -> None:
+        self.directory = Path(directory)
+        self.repo = repo
+        self.branch = branch
+
+    def _file(self, path: str) -> Path:
+        key = hashlib.sha1(f"{self.repo}@{self.branch}:{path}".encode("utf-8")).hexdigest()[:16]
+        return self.directory / f"{key}.json"
+
+    def load(self, path: str) -> Optional[PersistedSnapshot]:
+        try:
+            with open(self._file(path), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable snapshot cache for {path}: {e}")
+            return None
+        if data.get("version") != FORMAT_VERSION or data.get("key") != [self.repo, self.branch, path]:
+            return None
+        try:
+            lines = _lines_from_rows(data["lines"]) if data.get("lines") is not None else None
+            return PersistedSnapshot(
+                sha=data["sha"],
+                text=data["text"],
+                etag=data.get("etag"),
+                lines=lines,
+                saved_at=float(data.get("saved_at", 0.0)),
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Ignoring malformed snapshot cache for {path}: {e}")
+            return None
+
+    def save(self, path: str, sha: str, text: str, etag: Optional[str], lines: Optional[List[Line]] = None) -> None:
+        data = {
+            "version": FORMAT_VERSION,
+            "key": [self.repo, self.branch, path],
+            "sha": sha,
+            "etag": etag,
+            "saved_at": time.time(),
+            "text": text,
+            "lines": _lines_to_rows(lines) if lines is not None else None,
+        }
+        self.directory.mkdir(parents=True, exist_ok=True)
+        target = self._file(path)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=target.stem, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, target)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+
+def _lines_to_rows(lines: List[Line]) -> list:
+    rows = []
+    for l in lines:
+        if l.rule is None:
+            rows.append([l.kind, l.text])
+        else:
+            r = l.rule
+            row = [l.kind, l.text, r.type.value, r.value, r.policy.value if r.policy else None]
+            if r.options:
+                row.append(list(r.options))
+            rows.append(row)
+    return rows
+
+
+def _lines_from_rows(rows: list) -> List[Line]:
+    # Plain dict lookups instead of Enum(value) calls: this runs for every line at startup
+    lines: List[Line] = []
+    append = lines.append
+    for row in rows:
+        if len(row) == 2:
+            append(Line(row[0], row[1]))
+        else:
+            kind, _, rtype, value, policy = row[:5]
+            options = tuple(row[5]) if len(row) > 5 else ()
+            append(Line(kind, "", Rule(_RULE_TYPES[rtype], sys.intern(value), _POLICIES[policy] if policy else None, options)))
+    return lines
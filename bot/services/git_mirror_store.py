@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Sequence
+
+from bot.config import Settings
+from bot import metrics
+from bot.services.github_store import GitHubFileStore, git_blob_sha
+from bot.services.rules_file import RuleOp, parse_document, rule_changes
+from bot.services.store import FileChange
+
+GIT_TIMEOUT = 60
+BOT_NAME = "TG Shadowrocket Bot"
+BOT_EMAIL = "bot@users.noreply.github.com"
+
+logger = logging.getLogger(__name__)
+
+
+class GitCommandError(RuntimeError):
+    pass
+
+
+class GitMirrorStore:
+    """Rules storage backed by a local clone of the rules repository.
+
+    Same interface as GitHubFileStore: reads are served from the working tree
+    (no API quota), commits are made locally and pushed. The clone is brought
+    up to date when older than refresh_interval, or on demand via refresh().
+    Shas are git blob ids, so they are interchangeable with the Contents API.
+    """
+
+    commit_message_add = staticmethod(GitHubFileStore.commit_message_add)
+    commit_message_delete = staticmethod(GitHubFileStore.commit_message_delete)
+    added_comment = staticmethod(GitHubFileStore.added_comment)
+    removed_comment = staticmethod(GitHubFileStore.removed_comment)
+
+    def __init__(self, settings: Settings) -> None:
+        self.owner = settings.github_owner
+        self.repo = settings.github_repo
+        self.path_proxy = settings.github_path_proxy
+        self.path_direct = settings.github_path_direct
+        self.branch = settings.github_branch
+        self.token = settings.github_token
+        self.remote_url = settings.git_mirror_url or f"https://github.com/{self.owner}/{self.repo}.git"
+        # The token goes to git through the environment of each command, so it
+        # never lands in .git/config or in the process arguments
+        self._auth_env: Dict[str, str] = {}
+        if self.token and not settings.git_mirror_url:
+            credentials = base64.b64encode(f"x-access-token:{self.token}".encode("utf-8")).decode("ascii")
+            self._auth_env = {
+                "GIT_CONFIG_COUNT": "1",
+                "GIT_CONFIG_KEY_0": "http.https://github.com/.extraHeader",
+                "GIT_CONFIG_VALUE_0": f"Authorization: Basic {credentials}",
+            }
+        # Commit links only make sense when mirroring the GitHub repository itself
+        self.html_base = None if settings.git_mirror_url else f"https://github.com/{self.owner}/{self.repo}"
+        self.workdir = Path(settings.git_mirror_dir)
+        self.refresh_interval = settings.git_mirror_refresh_seconds
+        self._lock = asyncio.Lock()
+        self._synced_at = 0.0
+
+    def get_path_for_policy(self, policy: str) -> str:
+        """Get file path based on policy (PROXY -> proxy path, DIRECT -> direct path)"""
+        from bot.models.enums import Policy
+        if policy == Policy.DIRECT.value:
+            return self.path_direct
+        return self.path_proxy
+
+    async def open(self) -> None:
+        """Clone the repository if needed and bring it up to date."""
+        async with self._lock:
+            if not (self.workdir / ".git").exists():
+                self.workdir.parent.mkdir(parents=True, exist_ok=True)
+                logger.info(f"Cloning rules mirror into {self.workdir}")
+                await self._git("clone", "--branch", self.branch, "--single-branch", self.remote_url, str(self.workdir), cwd=self.workdir.parent)
+            else:
+                # Also drops a token embedded in the remote URL by older versions
+                await self._git("remote", "set-url", "origin", self.remote_url)
+            await self._sync()
+
+    async def close(self) -> None:
+        return None
+
+    def invalidate(self, file_path: str | None = None) -> None:
+        """Force the next read to sync with the remote first."""
+        self._synced_at = 0.0
+
+    async def refresh(self, file_path: str | None = None) -> Dict[str, Any]:
+        """Sync with the remote now and return the file like fetch() does."""
+        async with self._lock:
+            await self._sync()
+        return await self.fetch(file_path=file_path)
+
+    def snapshot_age(self, file_path: str | None = None) -> float | None:
+        """Seconds since the working tree was last synced with the remote."""
+        return None if not self._synced_at else time.monotonic() - self._synced_at
+
+    def keep_fresh(self, file_path: str, interval: float) -> None:
+        """No-op: reads come from the clone, which is synced every refresh_interval."""
+
+    async def fetch(self, retry: int = 2, file_path: str | None = None) -> Dict[str, Any]:
+        path = file_path or self.path_proxy
+        start = time.perf_counter()
+        try:
+            async with self._lock:
+                if time.monotonic() - self._synced_at >= self.refresh_interval:
+                    await self._sync()
+                raw = (self.workdir / path).read_bytes()
+            return {"sha": git_blob_sha(raw), "text": raw.decode("utf-8")}
+        except Exception as e:
+            logger.error(f"Git mirror fetch exception: {e}")
+            metrics.GITHUB_ERRORS.labels(operation="fetch").inc()
+            raise
+        finally:
+            metrics.GITHUB_FETCH_SECONDS.observe(time.perf_counter() - start)
+
+    async def fetch_many(self, file_paths: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """fetch() for several files; missing or unreadable files are left out."""
+        result: Dict[str, Dict[str, Any]] = {}
+        for path in dict.fromkeys(file_paths):
+            try:
+                result[path] = await self.fetch(file_path=path)
+            except Exception:
+                continue
+        return result
+
+    async def commit(self, new_text: str, message: str, author_name: str | None, author_email: str | None, base_sha: str, retry: int = 2, file_path: str | None = None, ops: Sequence[RuleOp] | None = None) -> Dict[str, Any]:
+        """Commit new_text and push; on a moved remote, replay ops like GitHubFileStore does."""
+        path = file_path or self.path_proxy
+        resp = await self.commit_many([FileChange(path, new_text, base_sha, ops)], message, author_name, author_email, retry=retry)
+        return {"content": resp["files"][path], "commit": resp["commit"]}
+
+    async def commit_many(self, changes: Sequence[FileChange], message: str, author_name: str | None = None, author_email: str | None = None, retry: int = 2) -> Dict[str, Any]:
+        """Commit several files as one commit and push; stale files are rebased with their ops."""
+        changes = list(changes)
+        logger.info(f"Committing {len(changes)} file(s) to git mirror: {message} (author: {author_name or 'unknown'}, retry: {2-retry})")
+        start = time.perf_counter()
+        try:
+            async with self._lock:
+                await self._sync()
+                files: Dict[str, Dict[str, str]] = {}
+                rebased = []
+                written = []
+                for change in changes:
+                    target = self.workdir / change.path
+                    current = target.read_bytes() if target.exists() else b""
+                    current_sha = git_blob_sha(current)
+                    new_text = change.new_text
+                    if current_sha != change.base_sha:
+                        if change.ops is not None:
+                            logger.warning(f"Git mirror conflict on {change.path}, rebasing {len(change.ops)} rule operation(s) onto fresh content")
+                            document = parse_document({"sha": current_sha, "text": current.decode("utf-8")})
+                            document.apply(change.ops)
+                            new_text = document.render()
+                        else:
+                            logger.warning(f"Git mirror conflict on {change.path}, base sha is stale. WARNING: changes may overwrite concurrent modifications")
+                    data = new_text.encode("utf-8")
+                    files[change.path] = {"sha": git_blob_sha(data)}
+                    rebased.append(FileChange(change.path, new_text, current_sha, change.ops))
+                    if data == current:
+                        continue
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    target.write_bytes(data)
+                    written.append(change.path)
+                if not written:
+                    logger.info(f"Nothing to commit for {', '.join(files)}")
+                    return {"commit": {}, "files": files}
+                await self._git("add", "--", *written)
+                commit_args = ["-c", f"user.name={BOT_NAME}", "-c", f"user.email={BOT_EMAIL}", "commit", "-q", "-m", message]
+                if author_name and author_email:
+                    commit_args += ["--author", f"{author_name} <{author_email}>"]
+                await self._git(*commit_args)
+                commit_sha = (await self._git("rev-parse", "HEAD")).strip()
+                try:
+                    await self._git("push", "-q", "origin", f"HEAD:{self.branch}")
+                except GitCommandError:
+                    # Remote moved between sync and push: drop the local commit and retry
+                    await self._git("reset", "-q", "--hard", f"origin/{self.branch}")
+                    self._synced_at = 0.0
+                    if retry <= 0:
+                        raise
+                    pushed = None
+                else:
+                    await self._git("update-ref", f"refs/remotes/origin/{self.branch}", commit_sha)
+                    pushed = commit_sha
+            if pushed is not None:
+                logger.info(f"Git mirror commit success: {message}")
+                commit_info: Dict[str, Any] = {"sha": pushed}
+                if self.html_base:
+                    commit_info["html_url"] = f"{self.html_base}/commit/{pushed}"
+                return {"commit": commit_info, "files": files}
+        except Exception as e:
+            logger.error(f"Git mirror commit exception: {e}")
+            metrics.GITHUB_ERRORS.labels(operation="commit").inc()
+            raise
+        finally:
+            metrics.GITHUB_COMMIT_SECONDS.observe(time.perf_counter() - start)
+        # Outside the try: errors of the nested attempt are logged and counted once
+        logger.warning("Git mirror push rejected, retrying")
+        return await self.commit_many(rebased, message, author_name, author_email, retry=retry - 1)
+
+    async def get_recent_commits(self, limit: int = 5, page: int = 1) -> list[Dict[str, Any]]:
+        """History of the rules files, synced with the remote first when older than refresh_interval."""
+        paths = list(dict.fromkeys((self.path_proxy, self.path_direct)))
+        async with self._lock:
+            if time.monotonic() - self._synced_at >= self.refresh_interval:
+                await self._sync()
+            out = await self._git(
+                "log", f"--skip={(page - 1) * limit}", f"-n{limit}", "-p", "--unified=0", "--no-color", "--no-ext-diff",
+                "--format=%x1e%H%x1f%an%x1f%aI%x1f%cI%x1f%s%x1f", f"origin/{self.branch}", "--", *paths,
+            )
+        commits = []
+        for record in out.split("\x1e"):
+            if not record.strip():
+                continue
+            sha, name, date, committed, subject, patch = record.split("\x1f", 5)
+            files = []
+            added: list[str] = []
+            removed: list[str] = []
+            for diff in patch.split("diff --git ")[1:]:
+                header, _, hunks = diff.partition("\n@@")
+                # "a/<path> b/<path>\n..." - the b/ side is the path after the commit
+                file_path = header.splitlines()[0].split(" b/", 1)[-1]
+                files.append(file_path)
+                if file_path in paths:
+                    plus, minus = rule_changes("@@" + hunks if hunks else "")
+                    added += plus
+                    removed += minus
+            commits.append({
+                "sha": sha,
+                "html_url": f"{self.html_base}/commit/{sha}" if self.html_base else "",
+                "commit": {"message": subject, "author": {"name": name, "date": date}, "committer": {"name": name, "date": committed}},
+                "files": files,
+                "rules": {"added": added, "removed": removed},
+            })
+        return commits
+
+    async def _sync(self) -> None:
+        """Reset the working tree to the remote branch head (caller holds the lock)."""
+        await self._git("fetch", "-q", "origin", f"+{self.branch}:refs/remotes/origin/{self.branch}")
+        await self._git("reset", "-q", "--hard", f"origin/{self.branch}")
+        self._synced_at = time.monotonic()
+
+    async def _git(self, *args: str, cwd: Path | None = None) -> str:
+        env = dict(os.environ, GIT_TERMINAL_PROMPT="0", **self._auth_env)
+        proc = await asyncio.create_subprocess_exec(
+            "git", *args,
+            cwd=str(cwd or self.workdir),
+            env=env,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            out, err = await asyncio.wait_for(proc.communicate(), timeout=GIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            proc.kill()
+            raise GitCommandError(f"git {args[0]} timed out")
+        if proc.returncode != 0:
+            # Never leak the token, should git echo it back
+            detail = err.decode("utf-8", "replace").replace(self.token, "***") if self.token else err.decode("utf-8", "replace")
+            raise GitCommandError(f"git {args[0]} failed: {detail.strip()}")
+        return out.decode("utf-8", "replace")
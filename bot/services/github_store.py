@@ -3,9 +3,12 @@ from __future__ import annotations
 import asyncio
 import base64
 import datetime as dt
+import hashlib
 import os
 import time
-from typing import Any, Dict
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Sequence, Tuple
 
 import logging
 
@@ -13,22 +16,175 @@ import aiohttp
 
 from bot.config import Settings
 from bot import metrics
+from bot.services.circuit_breaker import CircuitBreaker, CircuitOpen
+from bot.services.disk_cache import SnapshotDiskCache
+from bot.services.retry import RateLimitExceeded, RateLimitTracker, RetryPolicy, is_rate_limited
+from bot.services.store import FileChange
+from bot.services.rules_file import RuleOp, parse_document, parse_snapshot, remember_parse, rule_changes
 
-GITHUB_API = "https://api.github.com"
+# Raw file bytes instead of JSON with base64 content (works up to 100 MB)
+RAW_MEDIA_TYPE = "application/vnd.github.raw+json"
 REQUEST_TIMEOUT = 30
+# Per-operation budgets within REQUEST_TIMEOUT: a dead connection is detected
+# after `connect` (includes waiting for a pooled connection) or `sock_read`
+# seconds of silence instead of only when the whole request times out.
+FETCH_TIMEOUT = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT, connect=5, sock_read=10)
+COMMIT_TIMEOUT = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT, connect=5, sock_read=20)
+LIST_TIMEOUT = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT, connect=5, sock_read=10)
+# Hedged reads: the hedge delay is this quantile of recent fetch latencies
+HEDGE_WINDOW = 100
+HEDGE_MIN_SAMPLES = 20
+HEDGE_DEFAULT_DELAY = 1.0  # until HEDGE_MIN_SAMPLES latencies are known
+# Connection pool tuning for the shared session: keep TLS connections to
+# api.github.com alive between handler calls and cache DNS lookups.
+CONNECTION_LIMIT_PER_HOST = 8
+KEEPALIVE_TIMEOUT = 60
+DNS_CACHE_TTL = 300
+# /recent: deeper commit listings are read in pages of this size (GitHub's per_page
+# limit); commit details (files and rule diffs) are immutable and kept for this many commits
+LIST_PAGE_SIZE = 100
+COMMIT_DETAILS_CACHE_SIZE = 512
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class FileSnapshot:
+    """Last known content of a file on a branch, as served by GitHub."""
+
+    sha: str
+    text: str
+    etag: str | None = None
+    checked_at: float = 0.0  # time.monotonic() of the last successful validation
+    validated_at: float = field(default_factory=time.time)  # same moment, wall clock (for "stale since")
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"sha": self.sha, "text": self.text}
+
+
 class GitHubFileStore:
     def __init__(self, settings: Settings) -> None:
+        self.api_url = settings.github_api_url.rstrip("/")
+        # GitHub Enterprise serves REST under /api/v3 and GraphQL at /api/graphql
+        self.graphql_url = self.api_url[: -len("/v3")] + "/graphql" if self.api_url.endswith("/api/v3") else self.api_url + "/graphql"
         self.owner = settings.github_owner
         self.repo = settings.github_repo
         self.path_proxy = settings.github_path_proxy
         self.path_direct = settings.github_path_direct
-        self.branch = settings.github_branch
+        # Staging mode: reads and edits go to the staging branch, BranchPublisher promotes it
+        self.branch = settings.staging_branch or settings.github_branch
         self.token = settings.github_token
-    
+        self.cache_ttl = settings.github_cache_ttl
+        # Paths a background refresher revalidates, with its interval (see keep_fresh)
+        self._kept_fresh: Dict[str, float] = {}
+        self._session: aiohttp.ClientSession | None = None
+        self._cache: Dict[Tuple[str, str], FileSnapshot] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Future[FileSnapshot]] = {}
+        # Bumped whenever a key's content is known to change (invalidate, write-through);
+        # a fetch only caches its answer if the generation it started with is still current
+        self._generations: Dict[Tuple[str, str], int] = {}
+        # Held around every write request to the branch; BranchPublisher takes
+        # it while it rewrites the staging ref so no commit lands in between
+        self.write_lock = asyncio.Lock()
+        self.retry_policy = RetryPolicy()
+        self.rate_limit = RateLimitTracker()
+        self.breaker = CircuitBreaker(settings.circuit_failure_threshold, settings.circuit_reset_seconds)
+        self.hedge_quantile = settings.github_hedge_quantile
+        self._fetch_latencies: Deque[float] = deque(maxlen=HEDGE_WINDOW)
+        self.disk_cache = (
+            SnapshotDiskCache(settings.cache_dir, f"{self.owner}/{self.repo}", self.branch) if settings.cache_dir else None
+        )
+        self._disk_loaded = False
+        self._pending_saves: set[asyncio.Task] = set()
+        self._background_refreshes: set[asyncio.Task] = set()
+        self._commit_lists: Dict[Tuple[str, str, int, int], Tuple[str, list]] = {}
+        self._commit_details: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    async def open(self) -> None:
+        """Create the shared HTTP session (idempotent)."""
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit_per_host=CONNECTION_LIMIT_PER_HOST,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=DNS_CACHE_TTL,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+            trace_configs=[_connection_trace_config()],
+        )
+        if self.disk_cache is not None and not self._disk_loaded:
+            self._disk_loaded = True
+            await self._load_disk_cache()
+
+    async def close(self) -> None:
+        inflight = list(self._inflight.values())
+        for task in (*self._background_refreshes, *inflight):
+            task.cancel()
+        # Let in-progress snapshot writes finish so the next start has them
+        await asyncio.gather(*self._background_refreshes, *inflight, *self._pending_saves, return_exceptions=True)
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # Lazily open so the store also works outside bot.main (tests, scripts)
+        if self._session is None or self._session.closed:
+            await self.open()
+        assert self._session is not None
+        return self._session
+
+    async def _load_disk_cache(self) -> None:
+        """Serve the rules files from the on-disk snapshots right away and revalidate them in the background."""
+        assert self.disk_cache is not None
+        for path in (self.path_proxy, self.path_direct):
+            key = (path, self.branch)
+            if key in self._cache:
+                continue
+            try:
+                persisted = await asyncio.to_thread(self.disk_cache.load, path)
+            except Exception as e:
+                logger.warning(f"Snapshot cache load for {path} failed: {e}")
+                continue
+            if persisted is None:
+                continue
+            if git_blob_sha(persisted.text.encode("utf-8")) != persisted.sha:
+                logger.warning(f"Ignoring snapshot cache for {path}: content does not match sha {persisted.sha[:7]}")
+                continue
+            self._cache[key] = FileSnapshot(
+                sha=persisted.sha, text=persisted.text, etag=persisted.etag,
+                checked_at=time.monotonic(), validated_at=persisted.saved_at,
+            )
+            if persisted.lines is not None:
+                remember_parse(persisted.sha, persisted.text, persisted.lines)
+            logger.info(f"Loaded {path}@{persisted.sha[:7]} from snapshot cache, saved {time.time() - persisted.saved_at:.0f}s ago")
+            task = asyncio.create_task(self._background_refresh(path))
+            self._background_refreshes.add(task)
+            task.add_done_callback(self._background_refreshes.discard)
+
+    async def _background_refresh(self, path: str) -> None:
+        try:
+            await self.refresh(path)
+        except Exception as e:
+            logger.warning(f"Revalidation of cached {path} failed, serving the stored snapshot: {e}")
+
+    def _persist(self, path: str, snapshot: FileSnapshot) -> None:
+        """Write a rules file snapshot to the disk cache without blocking the event loop."""
+        if self.disk_cache is None or path not in (self.path_proxy, self.path_direct):
+            return
+        lines = parse_snapshot(snapshot.as_dict())
+        task = asyncio.create_task(self._save_snapshot(path, snapshot, lines))
+        self._pending_saves.add(task)
+        task.add_done_callback(self._pending_saves.discard)
+
+    async def _save_snapshot(self, path: str, snapshot: FileSnapshot, lines: list) -> None:
+        assert self.disk_cache is not None
+        try:
+            await asyncio.to_thread(self.disk_cache.save, path, snapshot.sha, snapshot.text, snapshot.etag, lines)
+        except Exception as e:
+            logger.warning(f"Snapshot cache write for {path} failed: {e}")
+
     def get_path_for_policy(self, policy: str) -> str:
         """Get file path based on policy (PROXY -> proxy path, DIRECT -> direct path)"""
         from bot.models.enums import Policy
@@ -36,6 +192,45 @@ class GitHubFileStore:
             return self.path_direct
         return self.path_proxy
 
+    def invalidate(self, file_path: str | None = None) -> None:
+        """Drop the cached snapshot so the next fetch goes to GitHub.
+
+        A fetch already in flight may carry the old content: it is neither
+        cached nor joined by later fetches, which send a new request.
+        """
+        key = (file_path or self.path_proxy, self.branch)
+        self._supersede(key)
+        self._cache.pop(key, None)
+
+    def _supersede(self, key: Tuple[str, str]) -> None:
+        """Make fetches of key that are already in flight stale: not cached, not joined."""
+        self._generations[key] = self._generations.get(key, 0) + 1
+        self._inflight.pop(key, None)
+
+    def _store_fetched(self, key: Tuple[str, str], generation: int, snapshot: FileSnapshot) -> bool:
+        """Cache a fetched snapshot unless the key was invalidated or written through since the fetch began."""
+        if self._generations.get(key, 0) != generation:
+            logger.info(f"Not caching {key[0]}@{snapshot.sha[:7]}: it changed while the fetch was in flight")
+            return False
+        self._cache[key] = snapshot
+        return True
+
+    def _write_through(self, path: str, text: str, resp: Dict[str, Any]) -> None:
+        """Store the text we just committed so the next read needs no network."""
+        new_sha = git_blob_sha(text.encode("utf-8"))
+        reported = (resp.get("content") or {}).get("sha")
+        if reported and reported != new_sha:
+            # GitHub stored something other than what we sent: do not cache our version
+            logger.warning(f"GitHub reports {path}@{reported[:7]}, expected {new_sha[:7]}")
+            self.invalidate(path)
+            return
+        snapshot = FileSnapshot(sha=new_sha, text=text, checked_at=time.monotonic())
+        key = (path, self.branch)
+        # A read sent before this commit must not replace the committed text when it lands
+        self._supersede(key)
+        self._cache[key] = snapshot
+        self._persist(path, snapshot)
+
     async def _headers(self) -> Dict[str, str]:
         return {
             "Authorization": f"Bearer {self.token}",
@@ -45,40 +240,293 @@ class GitHubFileStore:
 
     async def fetch(self, retry: int = 2, file_path: str | None = None) -> Dict[str, Any]:
         path = file_path or self.path_proxy
-        url = f"{GITHUB_API}/repos/{self.owner}/{self.repo}/contents/{path}"
+        key = (path, self.branch)
+        cached = self._cache.get(key)
+        if cached is not None and time.monotonic() - cached.checked_at < self._ttl(path):
+            metrics.GITHUB_CACHE.labels(result="hit").inc()
+            return cached.as_dict()
+        try:
+            return (await self._revalidate(path, retry)).as_dict()
+        except Exception as e:
+            # Only an unreachable GitHub is papered over; a 404 or 401 is a real answer
+            if cached is None or not _is_unavailable(e):
+                raise
+            # GitHub unavailable: a stale read beats no read
+            logger.warning(f"Serving stale snapshot of {path}@{cached.sha[:7]}: {e}")
+            metrics.GITHUB_CACHE.labels(result="stale").inc()
+            result = cached.as_dict()
+            result["stale_since"] = cached.validated_at
+            return result
+
+    async def refresh(self, file_path: str | None = None) -> Dict[str, Any]:
+        """Revalidate the snapshot with GitHub now, regardless of cache_ttl (304 when unchanged)."""
+        path = file_path or self.path_proxy
+        return (await self._revalidate(path, 2)).as_dict()
+
+    def snapshot_age(self, file_path: str | None = None) -> float | None:
+        """Seconds since the cached snapshot was last confirmed current by GitHub."""
+        cached = self._cache.get((file_path or self.path_proxy, self.branch))
+        return None if cached is None else time.monotonic() - cached.checked_at
+
+    def keep_fresh(self, file_path: str, interval: float) -> None:
+        """Declare that file_path is revalidated every interval seconds in the background.
+
+        fetch() then serves it from memory for interval + cache_ttl seconds
+        instead of cache_ttl; the extra cache_ttl covers the refresh itself.
+        If the refresher stalls, the entry expires and reads revalidate again.
+        """
+        self._kept_fresh[file_path] = interval
+
+    def _ttl(self, path: str) -> float:
+        interval = self._kept_fresh.get(path)
+        return self.cache_ttl if interval is None else max(self.cache_ttl, interval + self.cache_ttl)
+
+    async def _revalidate(self, path: str, retry: int) -> FileSnapshot:
+        key = (path, self.branch)
+        # Single-flight: concurrent callers for the same (path, ref) share one request
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            metrics.GITHUB_FETCH_COALESCED.inc()
+        else:
+            inflight = asyncio.ensure_future(self._hedged_fetch(path, retry))
+            self._inflight[key] = inflight
+            # invalidate() may already have replaced it with a newer request
+            inflight.add_done_callback(lambda f: self._inflight.pop(key) if self._inflight.get(key) is f else None)
+        # shield: a cancelled waiter must not cancel the request others wait on
+        return await asyncio.shield(inflight)
+
+    async def fetch_many(self, file_paths: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch several files in one GraphQL request and load them into the snapshot cache.
+
+        Returns {path: {"sha", "text"}}; files that do not exist are left out.
+        Files GraphQL cannot return as text (binary or truncated) and any
+        GraphQL failure fall back to the REST fetch() per file.
+        """
+        paths = list(dict.fromkeys(file_paths))
+        result: Dict[str, Dict[str, Any]] = {}
+        generations = {path: self._generations.get((path, self.branch), 0) for path in paths}
+        start = time.perf_counter()
+        try:
+            blobs = await self._graphql_blobs(paths)
+        except Exception as e:
+            # REST fetch() has retries, ETags and the stale-snapshot fallback
+            logger.warning(f"GitHub GraphQL fetch failed, falling back to REST: {e}")
+            if _is_outage(e):
+                self.breaker.record_failure()
+            if not isinstance(e, CircuitOpen):
+                metrics.GITHUB_ERRORS.labels(operation="graphql").inc()
+            blobs = {}
+        finally:
+            metrics.GITHUB_FETCH_SECONDS.observe(time.perf_counter() - start)
+
+        fallback = []
+        for path in paths:
+            if path not in blobs:
+                fallback.append(path)
+                continue
+            blob = blobs[path]
+            if blob is None:
+                continue  # no such file on the branch
+            key = (path, self.branch)
+            cached = self._cache.get(key)
+            # Keep the REST ETag when the content is unchanged so revalidation stays a 304
+            etag = cached.etag if cached is not None and cached.sha == blob["oid"] else None
+            snapshot = FileSnapshot(sha=blob["oid"], text=blob["text"], etag=etag, checked_at=time.monotonic())
+            if self._store_fetched(key, generations[path], snapshot) and (cached is None or cached.sha != snapshot.sha):
+                self._persist(path, snapshot)
+            result[path] = snapshot.as_dict()
+        if fallback:
+            fetched = await asyncio.gather(*(self.fetch(file_path=p) for p in fallback), return_exceptions=True)
+            for path, item in zip(fallback, fetched):
+                if isinstance(item, BaseException):
+                    logger.warning(f"GitHub fetch of {path} failed: {item}")
+                else:
+                    result[path] = item
+        return result
+
+    async def _graphql_blobs(self, paths: Sequence[str]) -> Dict[str, Dict[str, Any] | None]:
+        """{path: {"oid", "text"} or None if missing}; paths without usable text are omitted."""
+        variables: Dict[str, Any] = {"owner": self.owner, "name": self.repo}
+        for i, path in enumerate(paths):
+            variables[f"e{i}"] = f"{self.branch}:{path}"
+        data = await self._graphql(_blobs_query(len(paths)), variables, FETCH_TIMEOUT)
+        repository = data.get("repository")
+        if repository is None:
+            raise GraphQLError([{"message": "repository not found"}])
+        blobs: Dict[str, Dict[str, Any] | None] = {}
+        for i, path in enumerate(paths):
+            obj = repository.get(f"f{i}")
+            if obj is None:
+                blobs[path] = None
+            elif obj.get("text") is not None and not obj.get("isBinary") and not obj.get("isTruncated"):
+                blobs[path] = {"oid": obj["oid"], "text": obj["text"]}
+        return blobs
+
+    async def _graphql(self, query: str, variables: Dict[str, Any], timeout: aiohttp.ClientTimeout) -> Dict[str, Any]:
+        """POST a GraphQL document; returns "data", raises GraphQLError if GitHub reported errors."""
+        self.breaker.allow()
+        s = await self._get_session()
+        async with s.post(self.graphql_url, headers=await self._headers(), json={"query": query, "variables": variables}, timeout=timeout) as r:
+            self.breaker.record(r.status)
+            r.raise_for_status()
+            body = await r.json()
+        if body.get("errors"):
+            raise GraphQLError(body["errors"])
+        return body.get("data") or {}
+
+    def hedge_delay(self) -> float:
+        """hedge_quantile of recent fetch latencies (HEDGE_DEFAULT_DELAY until enough are known)."""
+        if len(self._fetch_latencies) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        ordered = sorted(self._fetch_latencies)
+        return ordered[min(len(ordered) - 1, int(self.hedge_quantile * len(ordered)))]
+
+    async def _hedged_fetch(self, path: str, retry: int) -> FileSnapshot:
+        """_fetch_remote, plus a second identical request if the first is slower than hedge_delay().
+
+        Whichever answers first wins and the other is cancelled. Disabled when
+        hedge_quantile is 0. Reads are idempotent and revalidations answered
+        with 304 do not count against the rate limit, so the extra request
+        for the slowest few percent is cheap.
+        """
+        start = time.perf_counter()
+        if not self.hedge_quantile:
+            snapshot = await self._fetch_remote(path, retry)
+            self._fetch_latencies.append(time.perf_counter() - start)
+            return snapshot
+        primary = asyncio.ensure_future(self._fetch_remote(path, retry))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay())
+            if not done:
+                metrics.GITHUB_FETCH_HEDGED.inc()
+                tasks.append(asyncio.ensure_future(self._fetch_remote(path, 0)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((t for t in done if t.exception() is None), None)
+                if winner is not None:
+                    snapshot = winner.result()
+                    break
+            else:
+                # Every request failed: report the primary's error (it had the retries)
+                snapshot = primary.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+        self._fetch_latencies.append(time.perf_counter() - start)
+        return snapshot
+
+    async def _fetch_remote(self, path: str, retry: int) -> FileSnapshot:
+        key = (path, self.branch)
+        generation = self._generations.get(key, 0)
+        cached = self._cache.get(key)
+        url = f"{self.api_url}/repos/{self.owner}/{self.repo}/contents/{path}"
         params = {"ref": self.branch}
+        headers = await self._headers()
+        headers["Accept"] = RAW_MEDIA_TYPE
+        if cached is not None and cached.etag:
+            headers["If-None-Match"] = cached.etag
+        attempt = max(0, 2 - retry)
         start = time.perf_counter()
         try:
-            timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
-            async with aiohttp.ClientSession(timeout=timeout) as s:
-                async with s.get(url, headers=await self._headers(), params=params) as r:
-                    if r.status >= 500 and retry > 0:
-                        logger.warning(f"GitHub fetch server error ({r.status}), retrying")
-                        metrics.GITHUB_ERRORS.labels(operation="fetch").inc()
-                        await asyncio.sleep(0.5)
-                        return await self.fetch(retry=retry - 1, file_path=file_path)
+            self.rate_limit.check()
+            self.breaker.allow()
+            s = await self._get_session()
+            async with s.get(url, headers=headers, params=params, timeout=FETCH_TIMEOUT) as r:
+                self.rate_limit.update(r.headers)
+                self.breaker.record(r.status)
+                if r.status == 304 and cached is not None:
+                    # Not modified: not charged against the rate limit, nothing to decode
+                    metrics.GITHUB_CACHE.labels(result="not_modified").inc()
+                    cached.checked_at = time.monotonic()
+                    cached.validated_at = time.time()
+                    return cached
+                if is_rate_limited(r.status, r.headers):
+                    logger.warning(f"GitHub fetch rate limited ({r.status})")
+                    metrics.GITHUB_ERRORS.labels(operation="fetch").inc()
+                    if retry <= 0:
+                        raise self.rate_limit.exceeded()
+                    delay = self.retry_policy.delay(attempt, r.headers)
+                elif r.status >= 500 and retry > 0:
+                    logger.warning(f"GitHub fetch server error ({r.status}), retrying")
+                    metrics.GITHUB_ERRORS.labels(operation="fetch").inc()
+                    delay = self.retry_policy.delay(attempt, r.headers)
+                else:
                     if r.status >= 400:
                         logger.error(f"GitHub fetch failed: {r.status} {await r.text()}")
                         metrics.GITHUB_ERRORS.labels(operation="fetch").inc()
                     r.raise_for_status()
-                    data = await r.json()
-                    content = base64.b64decode(data["content"]).decode("utf-8")
-                    return {"sha": data["sha"], "text": content}
+                    if r.content_type == "application/json":
+                        # JSON object representation (raw media type not honoured)
+                        data = await r.json()
+                        sha = data["sha"]
+                        if data.get("encoding") == "none":
+                            # Above the 1 MB contents limit the JSON carries no content
+                            content = (await self._fetch_blob(sha)).decode("utf-8")
+                        else:
+                            content = base64.b64decode(data["content"]).decode("utf-8")
+                    else:
+                        raw = await r.read()
+                        sha = git_blob_sha(raw)
+                        content = raw.decode("utf-8")
+                    metrics.GITHUB_CACHE.labels(result="miss").inc()
+                    snapshot = FileSnapshot(
+                        sha=sha,
+                        text=content,
+                        etag=r.headers.get("ETag"),
+                        checked_at=time.monotonic(),
+                    )
+                    if self._store_fetched(key, generation, snapshot):
+                        self._persist(path, snapshot)
+                    return snapshot
+        except (RateLimitExceeded, CircuitOpen) as e:
+            logger.error(f"GitHub fetch refused: {e}")
+            raise
         except Exception as e:
-            if retry > 0:
-                logger.warning(f"GitHub fetch exception: {e}, retrying")
+            if _is_outage(e):
+                self.breaker.record_failure()
+            if retry <= 0:
+                logger.error(f"GitHub fetch exception: {e}")
                 metrics.GITHUB_ERRORS.labels(operation="fetch").inc()
-                await asyncio.sleep(0.5)
-                return await self.fetch(retry=retry - 1, file_path=file_path)
-            logger.error(f"GitHub fetch exception: {e}")
+                raise
+            logger.warning(f"GitHub fetch exception: {e}, retrying")
             metrics.GITHUB_ERRORS.labels(operation="fetch").inc()
-            raise
+            delay = self.retry_policy.backoff(attempt)
         finally:
             metrics.GITHUB_FETCH_SECONDS.observe(time.perf_counter() - start)
+        # Retried outside the try: an error from the nested attempt propagates
+        # instead of being counted and retried again here
+        await asyncio.sleep(delay)
+        return await self._fetch_remote(path, retry - 1)
 
-    async def commit(self, new_text: str, message: str, author_name: str | None, author_email: str | None, base_sha: str, retry: int = 2, file_path: str | None = None) -> Dict[str, Any]:
+    async def _fetch_blob(self, sha: str) -> bytes:
+        """Download a blob via the Git Blobs API (used for files over the contents limit)."""
+        url = f"{self.api_url}/repos/{self.owner}/{self.repo}/git/blobs/{sha}"
+        headers = await self._headers()
+        headers["Accept"] = RAW_MEDIA_TYPE
+        s = await self._get_session()
+        async with s.get(url, headers=headers, timeout=FETCH_TIMEOUT) as r:
+            self.rate_limit.update(r.headers)
+            r.raise_for_status()
+            if r.content_type == "application/json":
+                data = await r.json()
+                return base64.b64decode(data["content"])
+            return await r.read()
+
+    async def commit(self, new_text: str, message: str, author_name: str | None, author_email: str | None, base_sha: str, retry: int = 2, file_path: str | None = None, ops: Sequence[RuleOp] | None = None) -> Dict[str, Any]:
+        """Write new_text over base_sha.
+
+        ops are the rule-level edits that produced new_text. On a conflict they
+        are replayed on the freshly fetched content instead of overwriting it
+        (an empty list re-renders the fresh content, as /normalize does).
+        """
         path = file_path or self.path_proxy
-        url = f"{GITHUB_API}/repos/{self.owner}/{self.repo}/contents/{path}"
+        intended_sha = git_blob_sha(new_text.encode("utf-8"))
+        if intended_sha == base_sha:
+            logger.info(f"{path}@{base_sha[:7]} already has the intended content, nothing to commit")
+            return {"content": {"sha": base_sha}, "commit": {}}
+        url = f"{self.api_url}/repos/{self.owner}/{self.repo}/contents/{path}"
         payload = {
             "message": message,
             "content": base64.b64encode(new_text.encode("utf-8")).decode("ascii"),
@@ -90,34 +538,196 @@ class GitHubFileStore:
             payload["author"] = {"name": author_name, "email": author_email}
         
         logger.info(f"Committing to GitHub: {message} (author: {author_name or 'unknown'}, sha: {base_sha[:7]}, retry: {2-retry})")
+        attempt = max(0, 2 - retry)
         start = time.perf_counter()
+        # Retries are made after the try block: an error raised by a nested
+        # attempt must propagate, not be counted and retried again here
+        same_base = False
         try:
-            timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
-            async with aiohttp.ClientSession(timeout=timeout) as s:
-                async with s.put(url, headers=await self._headers(), json=payload) as r:
-                    if r.status == 409 and retry > 0:
+            self.rate_limit.check()
+            self.breaker.allow()
+            s = await self._get_session()
+            async with self.write_lock, s.put(url, headers=await self._headers(), json=payload, timeout=COMMIT_TIMEOUT) as r:
+                self.rate_limit.update(r.headers)
+                self.breaker.record(r.status)
+                if is_rate_limited(r.status, r.headers):
+                    logger.warning(f"GitHub commit rate limited ({r.status})")
+                    metrics.GITHUB_ERRORS.labels(operation="commit").inc()
+                    if retry <= 0:
+                        raise self.rate_limit.exceeded()
+                    delay, same_base = self.retry_policy.delay(attempt, r.headers), True
+                elif r.status == 409 and retry > 0:
+                    if ops is not None:
+                        logger.warning(f"GitHub commit conflict (409), rebasing {len(ops)} rule operation(s) onto fresh content")
+                    else:
                         logger.warning(f"GitHub commit conflict (409), retrying with fresh sha. WARNING: changes may overwrite concurrent modifications")
-                        await asyncio.sleep(0.5)
-                        latest = await self.fetch(file_path=path)
-                        return await self.commit(new_text, message, author_name, author_email, latest["sha"], retry=retry - 1, file_path=path)
-                    if r.status >= 500 and retry > 0:
-                        logger.warning(f"GitHub server error ({r.status}), retrying")
-                        metrics.GITHUB_ERRORS.labels(operation="commit").inc()
-                        await asyncio.sleep(0.5)
-                        latest = await self.fetch(file_path=path)
-                        return await self.commit(new_text, message, author_name, author_email, latest["sha"], retry=retry - 1, file_path=path)
+                    delay = self.retry_policy.delay(attempt, r.headers)
+                elif r.status >= 500 and retry > 0:
+                    logger.warning(f"GitHub server error ({r.status}), retrying")
+                    metrics.GITHUB_ERRORS.labels(operation="commit").inc()
+                    delay = self.retry_policy.delay(attempt, r.headers)
+                else:
                     if r.status >= 400:
                         logger.error(f"GitHub commit failed: {r.status} {await r.text()}")
                         metrics.GITHUB_ERRORS.labels(operation="commit").inc()
                     r.raise_for_status()
                     logger.info(f"GitHub commit success: {message}")
-                    return await r.json()
+                    resp = await r.json()
+                    self._write_through(path, new_text, resp)
+                    return resp
+        except (RateLimitExceeded, CircuitOpen) as e:
+            logger.error(f"GitHub commit refused: {e}")
+            raise
         except Exception as e:
+            if _is_outage(e):
+                self.breaker.record_failure()
             logger.error(f"GitHub commit exception: {e}")
             metrics.GITHUB_ERRORS.labels(operation="commit").inc()
+            # The remote state is unknown after a failed write
+            self.invalidate(path)
+            if not (_is_outage(e) and retry > 0):
+                raise
+            # The PUT may have been applied before the connection failed: the retry
+            # compares the remote sha with intended_sha instead of committing twice
+            delay = self.retry_policy.backoff(attempt)
+        finally:
+            metrics.GITHUB_COMMIT_SECONDS.observe(time.perf_counter() - start)
+        await asyncio.sleep(delay)
+        if same_base:
+            return await self.commit(new_text, message, author_name, author_email, base_sha, retry=retry - 1, file_path=path, ops=ops)
+        return await self._retry_on_latest(new_text, message, author_name, author_email, retry - 1, path, ops)
+
+    async def _retry_on_latest(self, new_text: str, message: str, author_name: str | None, author_email: str | None, retry: int, path: str, ops: Sequence[RuleOp] | None) -> Dict[str, Any]:
+        self.invalidate(path)
+        latest = await self.fetch(file_path=path)
+        if latest["sha"] == git_blob_sha(new_text.encode("utf-8")):
+            logger.info(f"{path}@{latest['sha'][:7]} already has the intended content (an earlier attempt landed), not committing again")
+            return {"content": {"sha": latest["sha"]}, "commit": await self._last_commit(path)}
+        if ops is not None:
+            document = parse_document(latest)
+            document.apply(ops)
+            new_text = document.render()
+            if new_text == latest["text"]:
+                logger.info(f"Rule operations already present in {path}@{latest['sha'][:7]}, nothing to commit")
+                return {"content": {"sha": latest["sha"]}, "commit": {}}
+        return await self.commit(new_text, message, author_name, author_email, latest["sha"], retry=retry, file_path=path, ops=ops)
+
+    async def _last_commit(self, path: str) -> Dict[str, Any]:
+        """{"sha", "html_url"} of the latest commit touching path, or {} if it cannot be listed."""
+        try:
+            _, commits = await self.api_request("GET", "commits", params={"path": path, "sha": self.branch, "per_page": 1})
+        except Exception as e:
+            logger.warning(f"Could not look up the commit for {path}: {e}")
+            return {}
+        return {"sha": commits[0]["sha"], "html_url": commits[0].get("html_url")} if commits else {}
+
+    async def commit_many(self, changes: Sequence[FileChange], message: str, author_name: str | None = None, author_email: str | None = None, retry: int = 2) -> Dict[str, Any]:
+        """Write several files in a single commit (GraphQL createCommitOnBranch).
+
+        The commit is made against the branch head read in the same call
+        (expectedHeadOid), so either every change lands or none does. A file
+        whose blob no longer matches its base_sha is rebased with its ops, as
+        in commit(); if the head moves before the write, the whole batch is
+        retried. Commits are authored by the token's user, so author_name and
+        author_email are only logged.
+
+        Returns {"commit": {"sha", "html_url"}, "files": {path: {"sha": blob sha}}};
+        "commit" is empty when no file actually changed.
+        """
+        changes = list(changes)
+        paths = [c.path for c in changes]
+        logger.info(f"Committing {len(changes)} file(s) to GitHub: {message} (author: {author_name or 'unknown'}, retry: {2-retry})")
+        attempt = max(0, 2 - retry)
+        start = time.perf_counter()
+        try:
+            head, current = await self._head_and_blob_shas(paths)
+            files: Dict[str, Dict[str, str]] = {}
+            additions = []
+            for change in changes:
+                text = change.new_text
+                current_sha = current.get(change.path)
+                # Already equal to the intended content (e.g. an earlier attempt landed): nothing to rebase
+                if current_sha is not None and current_sha not in (change.base_sha, git_blob_sha(text.encode("utf-8"))):
+                    if change.ops is not None:
+                        logger.warning(f"{change.path} changed since it was read, rebasing {len(change.ops)} rule operation(s) onto fresh content")
+                        self.invalidate(change.path)
+                        latest = await self.fetch(file_path=change.path)
+                        document = parse_document(latest)
+                        document.apply(change.ops)
+                        text = document.render()
+                    else:
+                        logger.warning(f"{change.path} changed since it was read. WARNING: changes may overwrite concurrent modifications")
+                new_sha = git_blob_sha(text.encode("utf-8"))
+                files[change.path] = {"sha": new_sha}
+                if new_sha != current_sha:
+                    additions.append((change.path, text))
+            if not additions:
+                logger.info(f"Nothing to commit for {', '.join(paths)}")
+                return {"commit": {}, "files": files}
+
+            variables = {
+                "input": {
+                    "branch": {"repositoryNameWithOwner": f"{self.owner}/{self.repo}", "branchName": self.branch},
+                    "expectedHeadOid": head,
+                    "message": _commit_message(message),
+                    "fileChanges": {
+                        "additions": [
+                            {"path": path, "contents": base64.b64encode(text.encode("utf-8")).decode("ascii")}
+                            for path, text in additions
+                        ]
+                    },
+                }
+            }
+            try:
+                async with self.write_lock:
+                    data = await self._graphql(CREATE_COMMIT_MUTATION, variables, COMMIT_TIMEOUT)
+            except GraphQLError as e:
+                if not e.stale_head or retry <= 0:
+                    raise
+                logger.warning(f"Branch {self.branch} moved during multi-file commit, retrying")
+                delay = self.retry_policy.delay(attempt)
+            else:
+                commit = ((data.get("createCommitOnBranch") or {}).get("commit")) or {}
+                logger.info(f"GitHub multi-file commit success: {message}")
+                for path, text in additions:
+                    self._write_through(path, text, {"content": files[path]})
+                return {"commit": {"sha": commit.get("oid"), "html_url": commit.get("url")}, "files": files}
+        except (RateLimitExceeded, CircuitOpen) as e:
+            logger.error(f"GitHub commit refused: {e}")
             raise
+        except Exception as e:
+            if _is_outage(e):
+                self.breaker.record_failure()
+            logger.error(f"GitHub multi-file commit exception: {e}")
+            metrics.GITHUB_ERRORS.labels(operation="commit").inc()
+            for path in paths:
+                self.invalidate(path)
+            if not (_is_outage(e) and retry > 0):
+                raise
+            # Safe to resend: files whose remote blob already equals the new content are skipped
+            delay = self.retry_policy.backoff(attempt)
         finally:
             metrics.GITHUB_COMMIT_SECONDS.observe(time.perf_counter() - start)
+        # Outside the try, as in commit(): a failed nested attempt is not retried again
+        await asyncio.sleep(delay)
+        return await self.commit_many(changes, message, author_name, author_email, retry=retry - 1)
+
+    async def _head_and_blob_shas(self, paths: Sequence[str]) -> Tuple[str, Dict[str, str]]:
+        """Branch head commit oid and the current blob sha of each existing path, in one query."""
+        variables: Dict[str, Any] = {"owner": self.owner, "name": self.repo, "qualifiedName": f"refs/heads/{self.branch}"}
+        for i, path in enumerate(paths):
+            variables[f"e{i}"] = f"{self.branch}:{path}"
+        data = await self._graphql(_head_query(len(paths)), variables, FETCH_TIMEOUT)
+        repository = data.get("repository") or {}
+        head = ((repository.get("ref") or {}).get("target") or {}).get("oid")
+        if not head:
+            raise GraphQLError([{"message": f"branch {self.branch} not found"}])
+        shas = {}
+        for i, path in enumerate(paths):
+            obj = repository.get(f"f{i}")
+            if obj is not None:
+                shas[path] = obj["oid"]
+        return head, shas
 
     @staticmethod
     def commit_message_add(rule_line: str, username: str | None) -> str:
@@ -145,15 +755,199 @@ class GitHubFileStore:
         ts = now.strftime("%Y-%m-%d %H:%M:%S UTC")
         return f"# Removed: {ts} | User: {uname}"
 
-    async def get_recent_commits(self, limit: int = 5) -> list[Dict[str, Any]]:
-        url = f"{GITHUB_API}/repos/{self.owner}/{self.repo}/commits"
-        params = {"path": self.path_proxy, "sha": self.branch, "per_page": limit}
+    async def api_request(self, method: str, path: str, json: Any = None, allow: Sequence[int] = (), params: Dict[str, Any] | None = None) -> Tuple[int, Any]:
+        """JSON request to /repos/{owner}/{repo}/{path} through the shared session, rate limit and breaker.
+
+        Returns (status, body); body is None for empty answers. Error
+        statuses raise aiohttp.ClientResponseError unless listed in allow.
+        """
+        url = f"{self.api_url}/repos/{self.owner}/{self.repo}/{path.lstrip('/')}"
+        self.rate_limit.check()
+        self.breaker.allow()
+        s = await self._get_session()
         try:
-            timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
-            async with aiohttp.ClientSession(timeout=timeout) as s:
-                async with s.get(url, headers=await self._headers(), params=params) as r:
+            async with s.request(method, url, headers=await self._headers(), json=json, params=params, timeout=FETCH_TIMEOUT if method == "GET" else COMMIT_TIMEOUT) as r:
+                self.rate_limit.update(r.headers)
+                self.breaker.record(r.status)
+                if is_rate_limited(r.status, r.headers):
+                    raise self.rate_limit.exceeded()
+                if r.status >= 400 and r.status not in allow:
                     r.raise_for_status()
-                    return await r.json()
+                body = await r.json() if r.content_type == "application/json" else None
+                return r.status, body
+        except (RateLimitExceeded, CircuitOpen):
+            raise
+        except Exception as e:
+            if _is_outage(e):
+                self.breaker.record_failure()
+            raise
+
+    async def get_recent_commits(self, limit: int = 5, page: int = 1) -> list[Dict[str, Any]]:
+        """Commits touching either rules file, newest first, `limit` per page.
+
+        Each commit dict (GitHub list shape) also carries "files" (paths it
+        changed) and "rules" ({"added": [...], "removed": [...]} rule lines).
+        Listings are revalidated with ETags, commit details are fetched
+        concurrently and cached by sha. Errors are raised.
+        """
+        depth = limit * page
+        paths = list(dict.fromkeys((self.path_proxy, self.path_direct)))
+        listings = await asyncio.gather(*(self._list_commits(path, depth) for path in paths))
+        merged: Dict[str, Dict[str, Any]] = {}
+        for commits in listings:
+            for c in commits:
+                merged.setdefault(c["sha"], c)
+        ordered = sorted(merged.values(), key=_commit_date, reverse=True)
+        chunk = ordered[(page - 1) * limit: page * limit]
+        details = await asyncio.gather(*(self._commit_detail(c["sha"]) for c in chunk))
+        return [dict(c, **detail) for c, detail in zip(chunk, details)]
+
+    async def _list_commits(self, path: str, depth: int) -> list:
+        """The newest `depth` commits touching path (fewer if the history is shorter)."""
+        per_page = min(depth, LIST_PAGE_SIZE)
+        commits: list = []
+        page = 1
+        while len(commits) < depth:
+            chunk = await self._list_commits_page(path, per_page, page)
+            commits += chunk
+            if len(chunk) < per_page:
+                break
+            page += 1
+        return commits[:depth]
+
+    async def _list_commits_page(self, path: str, per_page: int, page: int) -> list:
+        key = (path, self.branch, per_page, page)
+        cached = self._commit_lists.get(key)
+        url = f"{self.api_url}/repos/{self.owner}/{self.repo}/commits"
+        params = {"path": path, "sha": self.branch, "per_page": per_page, "page": page}
+        headers = await self._headers()
+        if cached is not None:
+            headers["If-None-Match"] = cached[0]
+        try:
+            self.rate_limit.check()
+            self.breaker.allow()
+            s = await self._get_session()
+            async with s.get(url, headers=headers, params=params, timeout=LIST_TIMEOUT) as r:
+                self.rate_limit.update(r.headers)
+                self.breaker.record(r.status)
+                if r.status == 304 and cached is not None:
+                    return cached[1]
+                if is_rate_limited(r.status, r.headers):
+                    raise self.rate_limit.exceeded()
+                r.raise_for_status()
+                commits = await r.json()
+                etag = r.headers.get("ETag")
+        except (RateLimitExceeded, CircuitOpen):
+            raise
         except Exception as e:
-            logger.error(f"GitHub get_recent_commits exception: {e}")
-            return []
+            if _is_outage(e):
+                self.breaker.record_failure()
+            logger.error(f"GitHub commit listing for {path} failed: {e}")
+            metrics.GITHUB_ERRORS.labels(operation="list").inc()
+            raise
+        if etag:
+            self._commit_lists[key] = (etag, commits)
+        return commits
+
+    async def _commit_detail(self, sha: str) -> Dict[str, Any]:
+        """{"files", "rules"} of a commit; commits are immutable, so entries never go stale."""
+        detail = self._commit_details.get(sha)
+        if detail is not None:
+            self._commit_details.move_to_end(sha)
+            return detail
+        _, commit = await self.api_request("GET", f"commits/{sha}")
+        added: list[str] = []
+        removed: list[str] = []
+        files = []
+        for f in commit.get("files", []):
+            files.append(f["filename"])
+            if f["filename"] in (self.path_proxy, self.path_direct) and f.get("patch"):
+                plus, minus = rule_changes(f["patch"])
+                added += plus
+                removed += minus
+        detail = {"files": files, "rules": {"added": added, "removed": removed}}
+        self._commit_details[sha] = detail
+        while len(self._commit_details) > COMMIT_DETAILS_CACHE_SIZE:
+            self._commit_details.popitem(last=False)
+        return detail
+
+
+def git_blob_sha(data: bytes) -> str:
+    """Git object id of a blob with this content (what GitHub reports as the file sha)."""
+    h = hashlib.sha1(b"blob %d\0" % len(data))
+    h.update(data)
+    return h.hexdigest()
+
+
+CREATE_COMMIT_MUTATION = """mutation($input: CreateCommitOnBranchInput!) {
+  createCommitOnBranch(input: $input) { commit { oid url } }
+}"""
+
+
+class GraphQLError(RuntimeError):
+    def __init__(self, errors: list) -> None:
+        self.errors = errors
+        super().__init__("GraphQL error: " + "; ".join(str(e.get("message", e)) for e in errors))
+
+    @property
+    def stale_head(self) -> bool:
+        """createCommitOnBranch refused because expectedHeadOid is no longer the branch head."""
+        return any(e.get("type") == "STALE_DATA" or "Expected branch to point to" in str(e.get("message", "")) for e in self.errors)
+
+
+def _commit_message(message: str) -> Dict[str, str]:
+    """createCommitOnBranch CommitMessage: first line as headline, the rest as body."""
+    headline, _, body = message.partition("\n")
+    return {"headline": headline, "body": body.strip()} if body.strip() else {"headline": headline}
+
+
+def _head_query(n: int) -> str:
+    """GraphQL query for the branch head oid and the blob oids of n "<branch>:<path>" expressions."""
+    params = "".join(f", $e{i}: String!" for i in range(n))
+    fields = "\n".join(f"    f{i}: object(expression: $e{i}) {{ ... on Blob {{ oid }} }}" for i in range(n))
+    return (
+        f"query($owner: String!, $name: String!, $qualifiedName: String!{params}) {{\n"
+        f"  repository(owner: $owner, name: $name) {{\n"
+        f"    ref(qualifiedName: $qualifiedName) {{ target {{ oid }} }}\n{fields}\n  }}\n}}"
+    )
+
+
+def _blobs_query(n: int) -> str:
+    """GraphQL query reading n blobs by "<branch>:<path>" expression, aliased f0..f{n-1}."""
+    params = "".join(f", $e{i}: String!" for i in range(n))
+    fields = "\n".join(
+        f"    f{i}: object(expression: $e{i}) {{ ... on Blob {{ oid text isBinary isTruncated }} }}" for i in range(n)
+    )
+    return f"query($owner: String!, $name: String!{params}) {{\n  repository(owner: $owner, name: $name) {{\n{fields}\n  }}\n}}"
+
+
+def _commit_date(commit: Dict[str, Any]) -> str:
+    info = commit.get("commit", {})
+    return (info.get("committer") or info.get("author") or {}).get("date", "")
+
+
+def _is_outage(e: BaseException) -> bool:
+    """Errors that mean GitHub is unreachable or failing, as opposed to rejecting the request."""
+    return isinstance(e, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError))
+
+
+def _is_unavailable(e: BaseException) -> bool:
+    """Errors after which a stale snapshot may be served: outages, 5xx, an open circuit or an exhausted quota."""
+    if isinstance(e, (CircuitOpen, RateLimitExceeded)) or _is_outage(e):
+        return True
+    return isinstance(e, aiohttp.ClientResponseError) and e.status >= 500
+
+
+def _connection_trace_config() -> aiohttp.TraceConfig:
+    """Count new vs reused pooled connections so keep-alive can be verified."""
+    trace = aiohttp.TraceConfig()
+
+    async def on_connection_create_end(session, ctx, params) -> None:
+        metrics.GITHUB_CONNECTIONS.labels(state="new").inc()
+
+    async def on_connection_reuseconn(session, ctx, params) -> None:
+        metrics.GITHUB_CONNECTIONS.labels(state="reused").inc()
+
+    trace.on_connection_create_end.append(on_connection_create_end)
+    trace.on_connection_reuseconn.append(on_connection_reuseconn)
+    return trace
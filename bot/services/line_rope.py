@@ -0,0 +1,192 @@
+"""Persistent sequence for the lines of a rules file.
+
+LineRope is an immutable Sequence stored as a shallow B-tree: leaves hold
+up to LEAF_SIZE items, internal nodes up to BRANCHING children plus the
+offset of each child. set()/insert()/delete()/append() return a new rope
+that copies only the path from the root to the edited leaf (O(log n)) and
+shares every other node with the original, so keeping old versions
+around is free and edits never copy the whole file. Iteration walks the
+leaves in place.
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+from itertools import chain
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple, overload
+
+LEAF_SIZE = 64
+BRANCHING = 32
+
+
+class _Node:
+    __slots__ = ("items", "children", "offsets", "size")
+
+    def __init__(self, items: Tuple[Any, ...] = (), children: Tuple["_Node", ...] = ()) -> None:
+        self.items = items
+        self.children = children
+        if children:
+            offsets = []
+            size = 0
+            for child in children:
+                offsets.append(size)
+                size += child.size
+            self.offsets: Tuple[int, ...] = tuple(offsets)
+            self.size = size
+        else:
+            self.offsets = ()
+            self.size = len(items)
+
+
+_EMPTY = _Node()
+
+
+def _build(items: List[Any]) -> _Node:
+    if not items:
+        return _EMPTY
+    level = [_Node(items=tuple(items[i:i + LEAF_SIZE])) for i in range(0, len(items), LEAF_SIZE)]
+    while len(level) > 1:
+        level = [_Node(children=tuple(level[i:i + BRANCHING])) for i in range(0, len(level), BRANCHING)]
+    return level[0]
+
+
+def _child_at(node: _Node, i: int) -> int:
+    return bisect_right(node.offsets, i) - 1
+
+
+def _split(node: _Node) -> Tuple[_Node, ...]:
+    """node, or its two halves when it has outgrown its size limit."""
+    if node.children:
+        if len(node.children) <= BRANCHING:
+            return (node,)
+        half = len(node.children) // 2
+        return _Node(children=node.children[:half]), _Node(children=node.children[half:])
+    if len(node.items) <= LEAF_SIZE:
+        return (node,)
+    half = len(node.items) // 2
+    return _Node(items=node.items[:half]), _Node(items=node.items[half:])
+
+
+def _set(node: _Node, i: int, item: Any) -> _Node:
+    if not node.children:
+        return _Node(items=node.items[:i] + (item,) + node.items[i + 1:])
+    k = _child_at(node, i)
+    child = _set(node.children[k], i - node.offsets[k], item)
+    return _Node(children=node.children[:k] + (child,) + node.children[k + 1:])
+
+
+def _insert(node: _Node, i: int, item: Any) -> Tuple[_Node, ...]:
+    if not node.children:
+        return _split(_Node(items=node.items[:i] + (item,) + node.items[i:]))
+    k = _child_at(node, i)
+    parts = _insert(node.children[k], i - node.offsets[k], item)
+    return _split(_Node(children=node.children[:k] + parts + node.children[k + 1:]))
+
+
+def _delete(node: _Node, i: int) -> Optional[_Node]:
+    """node without item i; None once it is empty."""
+    if not node.children:
+        items = node.items[:i] + node.items[i + 1:]
+        return _Node(items=items) if items else None
+    k = _child_at(node, i)
+    child = _delete(node.children[k], i - node.offsets[k])
+    children = node.children[:k] + ((child,) if child is not None else ()) + node.children[k + 1:]
+    return _Node(children=children) if children else None
+
+
+def _leaves(node: _Node) -> Iterator[Tuple[Any, ...]]:
+    if not node.children:
+        yield node.items
+        return
+    for child in node.children:
+        yield from _leaves(child)
+
+
+class LineRope(Sequence):
+    """Immutable sequence with O(log n) persistent edits (see module docstring)."""
+
+    __slots__ = ("_root",)
+
+    def __init__(self, items: Iterable[Any] = ()) -> None:
+        self._root = _build(list(items))
+
+    @classmethod
+    def _wrap(cls, root: Optional[_Node]) -> LineRope:
+        rope = cls.__new__(cls)
+        rope._root = root if root is not None else _EMPTY
+        return rope
+
+    def share(self) -> LineRope:
+        """A distinct rope object over the same nodes (O(1))."""
+        return self._wrap(self._root)
+
+    def __len__(self) -> int:
+        return self._root.size
+
+    @overload
+    def __getitem__(self, i: int) -> Any: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> List[Any]: ...
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[n] for n in range(*i.indices(len(self)))]
+        i = self._index(i)
+        node = self._root
+        while node.children:
+            k = _child_at(node, i)
+            i -= node.offsets[k]
+            node = node.children[k]
+        return node.items[i]
+
+    def __iter__(self) -> Iterator[Any]:
+        return chain.from_iterable(_leaves(self._root))
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, LineRope) and other._root is self._root:
+            return True
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"LineRope({list(self)!r})"
+
+    def set(self, i: int, item: Any) -> LineRope:
+        """Copy with item i replaced."""
+        return self._wrap(_set(self._root, self._index(i), item))
+
+    def insert(self, i: int, item: Any) -> LineRope:
+        """Copy with item inserted before index i (at the end for i == len)."""
+        if not 0 <= i <= len(self):
+            raise IndexError("LineRope index out of range")
+        if not self._root.size:
+            return self._wrap(_Node(items=(item,)))
+        parts = _insert(self._root, i, item)
+        return self._wrap(parts[0] if len(parts) == 1 else _Node(children=parts))
+
+    def append(self, item: Any) -> LineRope:
+        return self.insert(len(self), item)
+
+    def delete(self, i: int) -> LineRope:
+        """Copy without item i."""
+        root = _delete(self._root, self._index(i))
+        # Collapse single-child roots left behind by deletes
+        while root is not None and len(root.children) == 1:
+            root = root.children[0]
+        return self._wrap(root)
+
+    def _index(self, i: int) -> int:
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("LineRope index out of range")
+        return i
+
+
+def as_rope(items: Sequence[Any]) -> LineRope:
+    """items as a LineRope, without copying if it already is one."""
+    return items if isinstance(items, LineRope) else LineRope(items)
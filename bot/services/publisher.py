@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from bot import metrics
+from bot.services.github_store import GitHubFileStore
+
+SQUASH = "squash"
+FAST_FORWARD = "ff"
+
+logger = logging.getLogger(__name__)
+
+
+class PublishConflict(Exception):
+    """The published branch changed in a way that cannot be merged into staging automatically."""
+
+
+class BranchPublisher:
+    """Promotes the staging branch the bot commits to into the published branch.
+
+    Every edit lands on the store's branch (staging); devices read
+    target_branch, which moves only when publish() runs: every `interval`
+    seconds (0 = only on /publish). In "squash" mode the staged edits become
+    one commit on target_branch and staging is reset onto it; in "ff" mode
+    target_branch is fast-forwarded to staging, keeping the individual
+    commits but still moving the branch once. Commits made directly on
+    target_branch are merged into staging first, so they are never
+    overwritten.
+    """
+
+    def __init__(self, store: GitHubFileStore, target_branch: str, interval: float = 0.0, mode: str = SQUASH) -> None:
+        if mode not in (SQUASH, FAST_FORWARD):
+            raise ValueError(f"Unknown publish mode: {mode}")
+        self.store = store
+        self.staging = store.branch
+        self.target = target_branch
+        self.interval = interval
+        self.mode = mode
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._staging_ready = False
+
+    async def ensure_staging(self) -> None:
+        """Create the staging branch from target_branch if it does not exist yet.
+
+        Called at startup; if GitHub is unreachable then, publish() calls it
+        again before its first run.
+        """
+        status, _ = await self.store.api_request("GET", f"git/ref/heads/{self.staging}", allow=(404,))
+        if status == 404:
+            _, ref = await self.store.api_request("GET", f"git/ref/heads/{self.target}")
+            await self.store.api_request("POST", "git/refs", {"ref": f"refs/heads/{self.staging}", "sha": ref["object"]["sha"]}, allow=(422,))
+            logger.info(f"Created staging branch {self.staging} from {self.target}")
+        self._staging_ready = True
+
+    def start(self) -> None:
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def publish(self) -> Dict[str, Any]:
+        """Publish staged edits; returns {"published": <edit commits>, "commit": {"sha", "html_url"}}.
+
+        "published" is 0 (and "commit" empty) when staging has nothing new.
+        """
+        async with self._lock:
+            try:
+                result = await self._publish()
+            except PublishConflict:
+                metrics.BRANCH_PUBLISHES.labels(result="conflict").inc()
+                raise
+            except Exception:
+                metrics.BRANCH_PUBLISHES.labels(result="error").inc()
+                raise
+            metrics.BRANCH_PUBLISHES.labels(result="published" if result["published"] else "empty").inc()
+            return result
+
+    async def _publish(self) -> Dict[str, Any]:
+        if not self._staging_ready:
+            await self.ensure_staging()
+        compare = await self._compare()
+        if compare["behind_by"]:
+            # Someone committed to the published branch directly: bring it into staging first
+            await self._merge_into_staging(f"Merge {self.target} into {self.staging}")
+            compare = await self._compare()
+        edits = [c for c in compare["commits"] if len(c.get("parents", [])) <= 1]
+        if not compare["ahead_by"] or not edits:
+            return {"published": 0, "commit": {}}
+        staged_head = compare["commits"][-1]["sha"]
+        message = publish_message(self.staging, edits)
+
+        if self.mode == FAST_FORWARD:
+            await self.store.api_request("PATCH", f"git/refs/heads/{self.target}", {"sha": staged_head, "force": False})
+            published = compare["commits"][-1]
+            logger.info(f"Fast-forwarded {self.target} to {staged_head[:7]} ({len(edits)} edit(s))")
+            return {"published": len(edits), "commit": {"sha": staged_head, "html_url": published.get("html_url")}}
+
+        _, head_commit = await self.store.api_request("GET", f"git/commits/{staged_head}")
+        _, squashed = await self.store.api_request(
+            "POST",
+            "git/commits",
+            {"message": message, "tree": head_commit["tree"]["sha"], "parents": [compare["base_commit"]["sha"]]},
+        )
+        # Not forced: if the published branch moved meanwhile this fails and the next publish merges it
+        await self.store.api_request("PATCH", f"git/refs/heads/{self.target}", {"sha": squashed["sha"], "force": False})
+        logger.info(f"Published {len(edits)} edit(s) from {self.staging} to {self.target} as {squashed['sha'][:7]}")
+        await self._reset_staging(staged_head, squashed["sha"])
+        return {"published": len(edits), "commit": {"sha": squashed["sha"], "html_url": squashed.get("html_url")}}
+
+    async def _reset_staging(self, staged_head: str, published: str) -> None:
+        """Force staging onto the published commit (same tree, so nothing is lost).
+
+        Edits that landed on staging while publishing are replayed on top of
+        the published commit first, so staging stays a linear continuation
+        of target_branch instead of accumulating merge commits. The store's
+        write lock is held from reading the ref to the forced update, so a
+        commit cannot land in between and be overwritten.
+        """
+        async with self.store.write_lock:
+            _, ref = await self.store.api_request("GET", f"git/ref/heads/{self.staging}")
+            head = published
+            if ref["object"]["sha"] != staged_head:
+                _, late = await self.store.api_request("GET", f"compare/{staged_head}...{ref['object']['sha']}")
+                for commit in late["commits"]:
+                    _, original = await self.store.api_request("GET", f"git/commits/{commit['sha']}")
+                    _, replayed = await self.store.api_request(
+                        "POST", "git/commits", {"message": original["message"], "tree": original["tree"]["sha"], "parents": [head]}
+                    )
+                    head = replayed["sha"]
+                logger.info(f"Replayed {len(late['commits'])} edit(s) made during the publish onto {published[:7]}")
+            await self.store.api_request("PATCH", f"git/refs/heads/{self.staging}", {"sha": head, "force": True})
+
+    async def _merge_into_staging(self, message: str) -> None:
+        status, _ = await self.store.api_request(
+            "POST", "merges", {"base": self.staging, "head": self.target, "commit_message": message}, allow=(409,)
+        )
+        if status == 409:
+            raise PublishConflict(f"{self.target} conflicts with {self.staging}")
+        if status == 201:
+            # Merged content differs from the cached staging snapshots
+            self.store.invalidate(self.store.path_proxy)
+            self.store.invalidate(self.store.path_direct)
+
+    async def _compare(self) -> Dict[str, Any]:
+        _, compare = await self.store.api_request("GET", f"compare/{self.target}...{self.staging}")
+        return compare
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                result = await self.publish()
+            except Exception as e:
+                logger.error(f"Scheduled publish failed: {e}")
+                continue
+            if result["published"]:
+                logger.info(f"Scheduled publish: {result['published']} edit(s)")
+
+
+def publish_message(staging: str, edits: list) -> str:
+    """Commit message for a squash publish: a headline plus the first line of every staged commit."""
+    lines = [f"- {c['commit']['message'].splitlines()[0]}" for c in edits if c["commit"]["message"]]
+    return f"Publish {len(edits)} change(s) from {staging}\n\n" + "\n".join(lines)
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Optional, Sequence
+
+from bot import metrics
+from bot.services.rules_file import parse_snapshot
+from bot.services.store import RuleStore
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotRefresher:
+    """Keeps the store's snapshots of frequently read files warm.
+
+    Fetches every path at startup in one batched read (rules files are
+    parsed too, so the first /view does no parsing), then revalidates them
+    every `interval` seconds with store.refresh(), which costs a 304 when
+    nothing changed. The store is told (keep_fresh) so that reads of these
+    paths use the snapshot between refreshes rather than revalidating.
+    An interval of 0 only does the warm-up.
+    """
+
+    def __init__(self, store: RuleStore, paths: Sequence[str], interval: float) -> None:
+        self.store = store
+        self.paths = list(dict.fromkeys(paths))
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        for path in self.paths:
+            metrics.RULES_SNAPSHOT_AGE.labels(path=path).set_function(lambda path=path: self._age(path))
+            if self.interval > 0:
+                # Readers take the warm snapshot instead of revalidating it themselves
+                self.store.keep_fresh(path, self.interval)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def refresh_all(self) -> None:
+        await asyncio.gather(*(self._refresh(path) for path in self.paths))
+
+    async def warm_up(self) -> None:
+        """Load every path in one batched read (a single GraphQL request on GitHubFileStore)."""
+        try:
+            fetched = await self.store.fetch_many(self.paths)
+        except Exception as e:
+            logger.warning(f"Snapshot warm-up failed: {e}")
+            return
+        for path in (self.store.path_proxy, self.store.path_direct):
+            if path in fetched:
+                parse_snapshot(fetched[path])
+
+    async def _run(self) -> None:
+        await self.warm_up()
+        logger.info(f"Snapshot cache warmed: {', '.join(self.paths)}")
+        while self.interval > 0:
+            await asyncio.sleep(self.interval)
+            await self.refresh_all()
+
+    async def _refresh(self, path: str) -> None:
+        try:
+            fetched = await self.store.refresh(path)
+            if path in (self.store.path_proxy, self.store.path_direct):
+                parse_snapshot(fetched)
+        except Exception as e:
+            # Readers fall back to fetching on demand
+            logger.warning(f"Background refresh of {path} failed: {e}")
+
+    def _age(self, path: str) -> float:
+        age = self.store.snapshot_age(path)
+        return float("nan") if age is None else age
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import datetime as dt
+import random
+import time
+from dataclasses import dataclass
+from typing import Mapping, Optional
+
+from bot import metrics
+
+
+class RateLimitExceeded(Exception):
+    """GitHub quota is exhausted; requests are refused until reset_at (epoch seconds)."""
+
+    def __init__(self, reset_at: float) -> None:
+        self.reset_at = reset_at
+        super().__init__(f"GitHub API rate limit exhausted until {self.reset_time} UTC")
+
+    @property
+    def reset_time(self) -> str:
+        return dt.datetime.fromtimestamp(self.reset_at, dt.timezone.utc).strftime("%H:%M:%S")
+
+
+def header_wait(headers: Optional[Mapping[str, str]], now: float | None = None) -> Optional[float]:
+    """Seconds GitHub asked us to wait via Retry-After or an exhausted X-RateLimit budget."""
+    if not headers:
+        return None
+    now = time.time() if now is None else now
+    retry_after = headers.get("Retry-After")
+    if retry_after is not None:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+    if headers.get("X-RateLimit-Remaining") == "0":
+        try:
+            return max(0.0, float(headers.get("X-RateLimit-Reset", "")) - now)
+        except ValueError:
+            pass
+    return None
+
+
+def is_rate_limited(status: int, headers: Optional[Mapping[str, str]]) -> bool:
+    """Primary or secondary rate limit response (403/429 with limit headers)."""
+    if status not in (403, 429) or not headers:
+        return False
+    return "Retry-After" in headers or headers.get("X-RateLimit-Remaining") == "0"
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Capped exponential backoff with jitter, honouring GitHub wait headers.
+
+    Header-requested waits longer than max_header_wait are not slept through:
+    RateLimitExceeded is raised so the handler can answer immediately.
+    """
+
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    max_header_wait: float = 10.0
+
+    def backoff(self, attempt: int) -> float:
+        ceiling = min(self.max_delay, self.base_delay * (2 ** max(0, attempt)))
+        # Equal jitter: keeps a floor while de-synchronising concurrent retries
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+    def delay(self, attempt: int, headers: Optional[Mapping[str, str]] = None) -> float:
+        wait = header_wait(headers)
+        if wait is None:
+            return self.backoff(attempt)
+        if wait > self.max_header_wait:
+            raise RateLimitExceeded(time.time() + wait)
+        return wait + random.uniform(0, self.base_delay)
+
+
+class RateLimitTracker:
+    """Tracks the REST quota reported by GitHub and exports it as gauges."""
+
+    def __init__(self) -> None:
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+        self.blocked_until: float = 0.0
+
+    def update(self, headers: Optional[Mapping[str, str]]) -> None:
+        if not headers:
+            return
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        try:
+            if remaining is not None:
+                self.remaining = int(remaining)
+                metrics.GITHUB_RATELIMIT_REMAINING.set(self.remaining)
+            if reset is not None:
+                self.reset_at = float(reset)
+                metrics.GITHUB_RATELIMIT_RESET.set(self.reset_at)
+        except ValueError:
+            return
+        retry_after = header_wait({"Retry-After": headers["Retry-After"]}) if "Retry-After" in headers else None
+        if retry_after is not None:
+            self.blocked_until = max(self.blocked_until, time.time() + retry_after)
+
+    def check(self) -> None:
+        """Fail fast instead of sending a request GitHub will reject."""
+        now = time.time()
+        if self.blocked_until > now:
+            raise RateLimitExceeded(self.blocked_until)
+        if self.remaining == 0 and self.reset_at is not None and self.reset_at > now:
+            raise RateLimitExceeded(self.reset_at)
+
+    def exceeded(self) -> RateLimitExceeded:
+        candidates = [t for t in (self.blocked_until, self.reset_at or 0.0) if t > time.time()]
+        return RateLimitExceeded(max(candidates) if candidates else time.time())
@@ -1,58 +1,282 @@
 from __future__ import annotations
 
 import re
-from dataclasses import dataclass, replace
-from typing import List, Optional, Tuple
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
 
 from bot.models.enums import Policy, RuleType
+from bot.services.line_rope import LineRope, as_rope
 
 
-@dataclass
-class Rule:
+# Immutable tuple records: a parsed 100k-line file holds one Line per line
+# (and a Rule per rule), shared between cached snapshots and document
+# versions. No per-instance __dict__, and cheaper to build than a frozen
+# dataclass.
+class Rule(NamedTuple):
     type: RuleType
-    value: str
+    value: str  # interned by the parser
     policy: Optional[Policy]  # some repos may omit policy (2 columns)
+    options: Tuple[str, ...] = ()  # trailing flags such as "no-resolve", kept when rendering
 
 
-@dataclass
-class Line:
+class Line(NamedTuple):
     kind: str  # "comment" | "rule" | "other"
-    text: str
+    text: str  # raw text of comment/other lines; rule lines render from `rule` and keep ""
     rule: Optional[Rule] = None
 
 
-RULE_RE = re.compile(r"^\s*([A-Z\-]+)\s*,\s*([^,#]+?)\s*(?:,\s*([A-Z]+)\s*)?$")
+# Flags Shadowrocket accepts after the value/policy columns
+RULE_OPTIONS = frozenset({"no-resolve", "extended-matching", "pre-matching"})
+# Values of these types may contain commas (regexes, user agents, nested
+# logical rules); only known trailing policy/option columns are split off
+FREEFORM_TYPES = frozenset({RuleType.URL_REGEX, RuleType.USER_AGENT, RuleType.AND, RuleType.OR, RuleType.NOT})
+# Types the bot writes. Their plain rules render without the policy column,
+# as they always have; every other rule keeps it, so re-rendering a file
+# does not change lines the bot did not touch
+POLICY_FREE_TYPES = frozenset({RuleType.DOMAIN_SUFFIX, RuleType.DOMAIN, RuleType.DOMAIN_KEYWORD, RuleType.IP_CIDR})
+_RULE_TYPES = {t.value: t for t in RuleType}
+_POLICIES = {p.value: p for p in Policy}
+# Only for lines the tokenizer rejects, e.g. whitespace around the type column
+RULE_HEAD_RE = re.compile(r"^\s*([A-Z0-9\-]+)\s*,(.*)$")
 
 
 def parse_text(text: str) -> List[Line]:
+    """Tokenize a rules file: split on commas and dispatch on the type column.
+
+    Plain "TYPE,value[,POLICY][,option...]" lines never touch a regex; lines
+    with unusual spacing go through RULE_HEAD_RE. Anything that is not a
+    comment or a rule of a known type is kept verbatim as kind="other".
+    """
+    return _tokenize(text.splitlines())
+
+
+def _tokenize(raws: Sequence[str]) -> List[Line]:
     lines: List[Line] = []
-    for raw in text.splitlines():
-        s = raw.rstrip("\n")
-        if not s or s.lstrip().startswith("#"):
-            lines.append(Line(kind="comment", text=raw))
+    append = lines.append
+    intern = sys.intern
+    types = _RULE_TYPES
+    for raw in raws:
+        if not raw or raw[0] == "#":
+            append(Line("comment", raw))
             continue
-        m = RULE_RE.match(s)
-        if not m:
-            lines.append(Line(kind="other", text=raw))
+        head, _, rest = raw.partition(",")
+        rtype = types.get(head)
+        if rtype is None:
+            rule = None
+        elif rest and rest[0] > " " and rest[-1] > " " and "," not in rest and "#" not in rest:
+            # "TYPE,value": the bulk of every file
+            append(Line("rule", "", Rule(rtype, intern(rest), None)))
             continue
-        t_raw, v_raw, p_raw = m.group(1), m.group(2), m.group(3)
-        try:
-            rtype = RuleType(t_raw)
-        except Exception:
-            lines.append(Line(kind="other", text=raw))
+        else:
+            rule = _rule_from_columns(rtype, rest)
+        if rule is None:
+            rule = _parse_odd_line(raw)
+            if rule is None:
+                append(Line("comment" if raw.lstrip()[:1] == "#" else "other", raw))
+                continue
+        append(Line("rule", "", rule))
+    return lines
+
+
+def _rule_from_columns(rtype: RuleType, rest: str) -> Optional[Rule]:
+    """Rule for the columns after the type, or None if they do not form one."""
+    cols = rest.split(",")
+    policy = None
+    options: Tuple[str, ...] = ()
+    if len(cols) > 1:
+        # Peel option flags, then at most one policy column, off the end
+        while len(cols) > 1 and cols[-1].strip() in RULE_OPTIONS:
+            options = (cols.pop().strip(),) + options
+        last = cols[-1].strip()
+        if len(cols) > 1 and last.isupper() and last.replace("-", "").isalpha():
+            policy = _POLICIES.get(last)
+            if policy is None:
+                # Unknown policy (REJECT-DROP, a proxy group): keep the line verbatim
+                return None
+            cols.pop()
+    if len(cols) == 1:
+        value = cols[0].strip()
+    elif rtype in FREEFORM_TYPES:
+        value = ",".join(cols).strip()
+    else:
+        return None
+    if not value or ("#" in value and rtype not in FREEFORM_TYPES):
+        return None
+    return Rule(rtype, sys.intern(value), policy, options)
+
+
+def _parse_odd_line(raw: str) -> Optional[Rule]:
+    m = RULE_HEAD_RE.match(raw)
+    if m is None:
+        return None
+    rtype = _RULE_TYPES.get(m.group(1))
+    return _rule_from_columns(rtype, m.group(2)) if rtype is not None else None
+
+
+def reparse(old_text: str, old_lines: Sequence[Line], text: str) -> List[Line]:
+    """parse_text(text), given old_lines = parse_text(old_text) of an earlier version.
+
+    Unchanged lines keep their Line objects from old_lines; only edited
+    lines go through the tokenizer. Runs of equal lines are skipped with
+    slice comparisons, so the Python-level work is proportional to the
+    number of edits, not the size of the file.
+    """
+    old_raws = old_text.splitlines()
+    raws = text.splitlines()
+    if len(old_raws) != len(old_lines):
+        return parse_text(text)
+    old = old_lines if isinstance(old_lines, list) else list(old_lines)
+    tail = _common_suffix(old_raws, raws)
+    old_end, end = len(old_raws) - tail, len(raws) - tail
+    lines: List[Line] = []
+    i = j = 0
+    while i < old_end and j < end:
+        k = _common_prefix(old_raws, raws, i, j, min(old_end - i, end - j))
+        if k:
+            lines += old[i:i + k]
+            i += k
+            j += k
             continue
-        policy = None
-        if p_raw:
-            try:
-                policy = Policy(p_raw)
-            except Exception:
-                policy = None
-        rule = Rule(type=rtype, value=v_raw.strip(), policy=policy)
-        lines.append(Line(kind="rule", text=raw, rule=rule))
+        synced = _resync(old_raws, raws, i, j, old_end, end)
+        if synced is None:
+            # Rewritten rather than edited: reuse whatever lines still occur
+            known = dict(zip(old_raws[i:old_end], old[i:old_end]))
+            fresh = [raw for raw in dict.fromkeys(raws[j:end]) if raw not in known]
+            known.update(zip(fresh, _tokenize(fresh)))
+            lines += map(known.__getitem__, raws[j:end])
+            j = end
+            break
+        i, next_j = synced
+        lines += _tokenize(raws[j:next_j])
+        j = next_j
+    lines += _tokenize(raws[j:end])
+    lines += old[len(old) - tail:]
     return lines
 
 
-def render_lines(lines: List[Line]) -> str:
+RESYNC_WINDOW = 16
+RESYNC_LIMIT = 4096
+
+
+def _common_prefix(a: Sequence[str], b: Sequence[str], i: int = 0, j: int = 0, limit: Optional[int] = None) -> int:
+    """Length of the common run of a[i:] and b[j:], in O(log n) slice comparisons."""
+    hi = min(len(a) - i, len(b) - j) if limit is None else limit
+    # Gallop to bracket the mismatch, then bisect; each probe compares only
+    # the untested window
+    lo, step = 0, 1
+    while lo < hi:
+        mid = min(lo + step, hi)
+        if a[i + lo:i + mid] != b[j + lo:j + mid]:
+            hi = mid - 1
+            break
+        lo, step = mid, step * 2
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[i + lo:i + mid] == b[j + lo:j + mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a: Sequence[str], b: Sequence[str]) -> int:
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:len(a) - lo] == b[len(b) - mid:len(b) - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _resync(a: Sequence[str], b: Sequence[str], i: int, j: int, a_end: int, b_end: int) -> Optional[Tuple[int, int]]:
+    """Positions (i2, j2) past a mismatch at a[i] != b[j] where a[i2] == b[j2].
+
+    Looks for the first line of b that occurs in a, within a window that
+    doubles up to RESYNC_LIMIT lines; this lands right after an inserted,
+    deleted or replaced block.
+    """
+    window = RESYNC_WINDOW
+    while True:
+        seen: Dict[str, int] = {}
+        for pos in range(min(i + window, a_end) - 1, i - 1, -1):
+            seen[a[pos]] = pos
+        for pos in range(j, min(j + window, b_end)):
+            hit = seen.get(b[pos])
+            if hit is not None:
+                return hit, pos
+        if window >= RESYNC_LIMIT or (i + window >= a_end and j + window >= b_end):
+            return None
+        window *= 2
+
+
+# Parsed form of recently fetched snapshots, keyed by blob sha
+PARSE_CACHE_SIZE = 8
+_parse_cache: "OrderedDict[str, Tuple[str, RulesDocument]]" = OrderedDict()
+
+
+def parse_snapshot(fetched: Mapping[str, Any]) -> LineRope:
+    """parse_text() for a store.fetch() result, reusing the parse of an unchanged snapshot.
+
+    Returns a new LineRope over the cached parse in O(1); ropes are
+    immutable and rules_file operations never mutate Line objects in
+    place, so they can be shared between callers.
+    """
+    return _cached_document(fetched).lines.share()
+
+
+def parse_document(fetched: Mapping[str, Any]) -> RulesDocument:
+    """RulesDocument for a store.fetch() result; its rule index is built once per snapshot.
+
+    Returns a copy-on-write copy, so callers may edit it freely.
+    """
+    return _cached_document(fetched).copy()
+
+
+def _cached_document(fetched: Mapping[str, Any]) -> RulesDocument:
+    sha, text = fetched.get("sha"), fetched["text"]
+    if sha:
+        cached = _parse_cache.get(sha)
+        if cached is not None and (cached[0] is text or cached[0] == text):
+            _parse_cache.move_to_end(sha)
+            return cached[1]
+    base = _closest_cached(text)
+    lines = reparse(base[0], base[1].lines, text) if base is not None else parse_text(text)
+    if sha:
+        remember_parse(sha, text, lines)
+        return _parse_cache[sha][1]
+    return RulesDocument(lines)
+
+
+def _closest_cached(text: str) -> Optional[Tuple[str, RulesDocument]]:
+    """The cached snapshot sharing the most leading and trailing text with text.
+
+    A new sha is usually the previous version of the same file plus an edit
+    (a bot commit, or a push picked up by the refresher), so re-parsing
+    against it only tokenizes the edit. None when no cached text shares at
+    least half of text, e.g. on a cold cache or for a different file.
+    """
+    best, best_shared = None, len(text) // 2
+    for entry in reversed(_parse_cache.values()):
+        old = entry[0]
+        shared = _common_prefix(old, text) + _common_suffix(old, text)
+        if shared > best_shared:
+            best, best_shared = entry, shared
+    return best
+
+
+def remember_parse(sha: str, text: str, lines: Sequence[Line]) -> None:
+    """Seed parse_snapshot() with an already parsed snapshot (e.g. loaded from disk)."""
+    _parse_cache[sha] = (text, RulesDocument(lines))
+    _parse_cache.move_to_end(sha)
+    while len(_parse_cache) > PARSE_CACHE_SIZE:
+        _parse_cache.popitem(last=False)
+
+
+def render_lines(lines: Sequence[Line]) -> str:
     if not lines:
         return ""
     return "\n".join(_render_line(l) for l in lines) + "\n"
@@ -61,56 +285,48 @@ def render_lines(lines: List[Line]) -> str:
 def _render_line(line: Line) -> str:
     if line.kind != "rule" or not line.rule:
         return line.text
-    r = line.rule
-    # Всегда рендерим без третьей колонки (policy)
-    return f"{r.type.value},{r.value}"
+    return rule_line(line.rule)
 
 
-def list_rules(lines: List[Line]) -> List[Tuple[int, Rule]]:
+def list_rules(lines: Sequence[Line]) -> List[Tuple[int, Rule]]:
     return [(idx, l.rule) for idx, l in enumerate(lines) if l.kind == "rule" and l.rule is not None]
 
 
-def find_rule_index(lines: List[Line], rtype: RuleType, value: str) -> Optional[int]:
+def find_rule_index(lines: Sequence[Line], rtype: RuleType, value: str) -> Optional[int]:
+    """Linear scan for a plain line list; RulesDocument.find() is the indexed lookup."""
     for idx, l in enumerate(lines):
         if l.kind == "rule" and l.rule and l.rule.type == rtype and l.rule.value == value:
             return idx
     return None
 
 
-def add_rule(lines: List[Line], rule: Rule, added_comment: str) -> List[Line]:
-    new_lines = list(lines)
+# Edits return a new LineRope sharing everything but the edited path with
+# `lines` (O(log n)); a plain list is converted first (O(n)).
+
+
+def add_rule(lines: Sequence[Line], rule: Rule, added_comment: str) -> LineRope:
     # Append comment and rule at file end
-    new_lines.append(Line(kind="comment", text=added_comment))
-    new_lines.append(Line(kind="rule", text="", rule=rule))
-    return new_lines
-
-
-def replace_policy(lines: List[Line], idx: int, new_policy: Policy) -> List[Line]:
-    new_lines = []
-    for i, l in enumerate(lines):
-        if i == idx:
-            assert l.kind == "rule" and l.rule
-            new_rule = Rule(type=l.rule.type, value=l.rule.value, policy=new_policy)
-            new_lines.append(Line(kind=l.kind, text=l.text, rule=new_rule))
-        else:
-            new_lines.append(l)
-    return new_lines
+    return as_rope(lines).append(Line(kind="comment", text=added_comment)).append(Line(kind="rule", text="", rule=rule))
+
 
+def replace_policy(lines: Sequence[Line], idx: int, new_policy: Optional[Policy]) -> LineRope:
+    rope = as_rope(lines)
+    if not 0 <= idx < len(rope):
+        return rope
+    return rope.set(idx, _with_policy(rope[idx], new_policy))
 
-def clear_policy(lines: List[Line], idx: int) -> List[Line]:
+
+def clear_policy(lines: Sequence[Line], idx: int) -> LineRope:
     """Remove policy (third column) for the given rule."""
-    new_lines = []
-    for i, l in enumerate(lines):
-        if i == idx:
-            assert l.kind == "rule" and l.rule
-            new_rule = Rule(type=l.rule.type, value=l.rule.value, policy=None)
-            new_lines.append(Line(kind=l.kind, text=l.text, rule=new_rule))
-        else:
-            new_lines.append(l)
-    return new_lines
+    return replace_policy(lines, idx, None)
 
 
-def delete_rule(lines: List[Line], idx: int, removed_comment: str | None = None) -> List[Line]:
+def _with_policy(line: Line, policy: Optional[Policy]) -> Line:
+    assert line.kind == "rule" and line.rule
+    return Line(kind=line.kind, text=line.text, rule=Rule(line.rule.type, line.rule.value, policy, line.rule.options))
+
+
+def delete_rule(lines: Sequence[Line], idx: int, removed_comment: str | None = None) -> LineRope:
     """Soft-delete a rule: keep it as a commented line and add a Removed marker.
 
     Behaviour:
@@ -121,39 +337,295 @@ def delete_rule(lines: List[Line], idx: int, removed_comment: str | None = None)
     - If there is no preceding Added marker and removed_comment is provided, the
       removed_comment is inserted directly above the commented rule.
     """
-    new_lines = list(lines)
-    if idx < 0 or idx >= len(new_lines):
-        return new_lines
+    rope = as_rope(lines)
+    for action, i, line in _delete_edits(rope, idx, removed_comment):
+        if action == "set":
+            rope = rope.set(i, line)
+        elif action == "insert":
+            rope = rope.insert(i, line)
+        else:
+            rope = rope.delete(i)
+    return rope
+
 
-    l = new_lines[idx]
+# (action, index, line): "set" replaces, "insert" inserts before, "del" removes the line at index
+_Edit = Tuple[str, int, Optional[Line]]
+
+
+def _delete_edits(lines: Sequence[Line], idx: int, removed_comment: str | None) -> List[_Edit]:
+    """Edits performing delete_rule(), in application order."""
+    if idx < 0 or idx >= len(lines):
+        return []
+    l = lines[idx]
     if not (l.kind == "rule" and l.rule):
-        return new_lines
+        return []
 
     # Prepare commented rule text in two-column canonical form
-    commented_text = f"# {rule_line(l.rule)}"
+    commented = Line(kind="comment", text=f"# {rule_line(l.rule)}")
 
     prev = idx - 1
-    if prev >= 0 and new_lines[prev].kind == "comment" and new_lines[prev].text.strip().startswith("# Added:"):
-        # Replace the Added marker with Removed (if provided)
+    if prev >= 0 and lines[prev].kind == "comment" and lines[prev].text.strip().startswith("# Added:"):
+        # Replace the Added marker with Removed (if provided), or drop it (our line shifts one up)
         if removed_comment:
-            new_lines[prev] = Line(kind="comment", text=removed_comment)
+            return [("set", prev, Line(kind="comment", text=removed_comment)), ("set", idx, commented)]
+        return [("del", prev, None), ("set", idx - 1, commented)]
+    # No Added marker above: insert Removed (if provided) and comment out the rule
+    edits: List[_Edit] = [("set", idx, commented)]
+    if removed_comment:
+        edits.append(("insert", idx, Line(kind="comment", text=removed_comment)))
+    return edits
+
+
+# (type string, value): RuleType members hash in Python code, their values in C
+RuleKey = Tuple[str, str]
+# Positions logged before the index is rewritten (see RulesDocument._shift)
+SHIFT_LOG_LIMIT = 64
+
+
+def _rule_key(line: Line) -> Optional[RuleKey]:
+    if line.kind == "rule" and line.rule:
+        return line.rule.type.value, line.rule.value
+    return None
+
+
+class RulesDocument:
+    """Parsed rules file with a (type, value) -> line index hash index.
+
+    find() answers what find_rule_index() answers, in O(1). The index is
+    built on first use and kept up to date by add()/delete()/clear_policy()/
+    replace_policy(), which edit the document in place. Inserting or
+    removing a line moves every later rule; instead of rewriting their
+    entries the move is appended to a shift log that lookups replay, and the
+    index is rewritten once the log reaches SHIFT_LOG_LIMIT entries.
+
+    Lines are kept in a LineRope, so edits are O(log n) and copy() is
+    O(1): both documents share the rope, and the index until one of them
+    is edited.
+    """
+
+    def __init__(self, lines: Sequence[Line] = ()) -> None:
+        self._lines: LineRope = as_rope(lines)
+        # key -> first line index: a plain int as of the last rewrite, or
+        # (index, len(_shifts) when stored) for entries stored since
+        self._index: Optional[Dict[RuleKey, Union[int, Tuple[int, int]]]] = None
+        self._dupes: Dict[RuleKey, int] = {}  # occurrences beyond the first
+        self._shifts: List[Tuple[int, int]] = []  # (from index, delta)
+        self._shared = False
+
+    @property
+    def lines(self) -> LineRope:
+        return self._lines
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def copy(self) -> RulesDocument:
+        self._ensure_index()
+        other = RulesDocument.__new__(RulesDocument)
+        other._lines, other._index, other._dupes, other._shifts = self._lines, self._index, self._dupes, self._shifts
+        self._shared = other._shared = True
+        return other
+
+    def render(self) -> str:
+        return render_lines(self._lines)
+
+    def find(self, rtype: RuleType, value: str) -> Optional[int]:
+        """Index of the first rule with this type and value, or None."""
+        return self._position((rtype.value, value))
+
+    def add(self, rule: Rule, added_comment: str) -> None:
+        """add_rule() in place."""
+        self._own()
+        self._insert(len(self._lines), Line(kind="comment", text=added_comment))
+        self._insert(len(self._lines), Line(kind="rule", text="", rule=rule))
+
+    def delete(self, idx: int, removed_comment: str | None = None) -> None:
+        """delete_rule() in place."""
+        self._own()
+        for action, i, line in _delete_edits(self._lines, idx, removed_comment):
+            if action == "set":
+                self._set(i, line)
+            elif action == "insert":
+                self._insert(i, line)
+            else:
+                self._delete(i)
+
+    def clear_policy(self, idx: int) -> None:
+        """clear_policy() in place."""
+        self.replace_policy(idx, None)
+
+    def replace_policy(self, idx: int, new_policy: Optional[Policy]) -> None:
+        """replace_policy() in place (None clears the policy)."""
+        line = _with_policy(self._lines[idx], new_policy)
+        self._own()
+        # Same key: the index entry stays valid
+        self._lines = self._lines.set(idx, line)
+
+    def apply(self, ops: Sequence[RuleOp]) -> None:
+        """apply_ops() in place."""
+        for op in ops:
+            idx = self.find(op.rule.type, op.rule.value)
+            if op.action == "add":
+                if idx is None:
+                    self.add(op.rule, op.comment or "")
+            elif op.action == "delete":
+                if idx is not None:
+                    self.delete(idx, removed_comment=op.comment)
+            elif op.action == "clear_policy":
+                if idx is not None:
+                    self.clear_policy(idx)
+            else:
+                raise ValueError(f"Unknown rule operation: {op.action}")
+
+    # ---- line edits keeping the index current ----------------------------
+
+    def _own(self) -> None:
+        self._ensure_index()
+        if self._shared:
+            self._index = dict(self._index)
+            self._dupes = dict(self._dupes)
+            self._shifts = list(self._shifts)
+            self._shared = False
+
+    def _set(self, i: int, line: Line) -> None:
+        old_key, new_key = _rule_key(self._lines[i]), _rule_key(line)
+        self._lines = self._lines.set(i, line)
+        if old_key != new_key:
+            if old_key is not None:
+                self._forget(old_key, i)
+            if new_key is not None:
+                self._remember(new_key, i)
+
+    def _insert(self, i: int, line: Line) -> None:
+        if i < len(self._lines):
+            self._shift(i, 1)
+        self._lines = self._lines.insert(i, line)
+        key = _rule_key(line)
+        if key is not None:
+            self._remember(key, i)
+
+    def _delete(self, i: int) -> None:
+        key = _rule_key(self._lines[i])
+        self._lines = self._lines.delete(i)
+        if i < len(self._lines):
+            self._shift(i + 1, -1)
+        if key is not None:
+            self._forget(key, i)
+
+    # ---- index -------------------------------------------------------------
+
+    def _ensure_index(self) -> None:
+        if self._index is not None:
+            return
+        index: Dict[RuleKey, Union[int, Tuple[int, int]]] = {}
+        dupes: Dict[RuleKey, int] = {}
+        for i, line in enumerate(self._lines):
+            rule = line.rule
+            if rule is None or line.kind != "rule":
+                continue
+            key = (rule.type.value, rule.value)
+            if index.setdefault(key, i) != i:
+                dupes[key] = dupes.get(key, 0) + 1
+        self._index, self._dupes = index, dupes
+
+    def _position(self, key: RuleKey) -> Optional[int]:
+        self._ensure_index()
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+        if type(entry) is int:
+            pos, since = entry, 0
         else:
-            # Drop the Added marker if no replacement provided
-            del new_lines[prev]
-            idx -= 1  # our target line shifts one up
-        # Convert the rule line into a comment (in-place, idx is valid after potential shift)
-        new_lines[idx] = Line(kind="comment", text=commented_text)
-    else:
-        # No Added marker above: insert Removed (if provided) and comment out the rule
-        new_lines[idx] = Line(kind="comment", text=commented_text)
-        if removed_comment:
-            new_lines.insert(idx, Line(kind="comment", text=removed_comment))
-    return new_lines
+            pos, since = entry
+        for start, delta in self._shifts[since:]:
+            if pos >= start:
+                pos += delta
+        return pos
+
+    def _shift(self, start: int, delta: int) -> None:
+        """Lines from `start` on move by `delta`."""
+        self._shifts.append((start, delta))
+        if len(self._shifts) >= SHIFT_LOG_LIMIT:
+            self._index = {key: self._position(key) for key in self._index}
+            self._shifts = []
+
+    def _remember(self, key: RuleKey, i: int) -> None:
+        pos = self._position(key)
+        if pos is not None:
+            self._dupes[key] = self._dupes.get(key, 0) + 1
+            if pos < i:
+                return
+        self._index[key] = (i, len(self._shifts)) if self._shifts else i
+
+    def _forget(self, key: RuleKey, i: int) -> None:
+        """The occurrence of key that was at line i is gone."""
+        dupes = self._dupes.pop(key, 0)
+        if dupes > 1:
+            self._dupes[key] = dupes - 1
+        if self._position(key) != i:
+            return
+        del self._index[key]
+        if dupes:
+            # The first occurrence went away: the next one takes its place (rare, O(n))
+            i = next(n for n, line in enumerate(self._lines) if _rule_key(line) == key)
+            self._index[key] = (i, len(self._shifts)) if self._shifts else i
+
+
+@dataclass(frozen=True)
+class RuleOp:
+    """A rule-level edit that can be replayed on a newer version of the file.
+
+    action: "add" | "delete" (soft-delete) | "clear_policy"
+    comment: the Added marker for "add", the Removed marker for "delete".
+    """
+
+    action: str
+    rule: Rule
+    comment: Optional[str] = None
+
+
+def apply_ops(lines: Sequence[Line], ops: Sequence[RuleOp]) -> LineRope:
+    """Apply rule operations, locating each rule by (type, value).
+
+    Operations whose effect is already present (rule exists for "add",
+    rule is gone for "delete"/"clear_policy") are skipped, so replaying
+    them on content edited concurrently neither duplicates nor loses rules.
+    """
+    document = RulesDocument(lines)
+    document.apply(ops)
+    return document.lines
+
+
+def rule_changes(patch: str) -> Tuple[List[str], List[str]]:
+    """Rule lines (rule_line form) added and removed by a unified diff.
+
+    A rule that appears on both sides (only its policy column changed) is
+    reported in neither list; commented-out rules count as removed.
+    """
+    plus: List[str] = []
+    minus: List[str] = []
+    for raw in patch.splitlines():
+        if raw.startswith(("+++ ", "--- ")):
+            continue
+        if raw.startswith("+"):
+            plus.append(raw[1:])
+        elif raw.startswith("-"):
+            minus.append(raw[1:])
+    added = [rule_line(l.rule) for l in parse_text("\n".join(plus)) if l.rule]
+    removed = [rule_line(l.rule) for l in parse_text("\n".join(minus)) if l.rule]
+    both = set(added) & set(removed)
+    return [r for r in added if r not in both], [r for r in removed if r not in both]
 
 
 def rule_line(rule: Rule) -> str:
-    # Для сообщений и коммитов показываем формат файла (без политики)
-    return f"{rule.type.value},{rule.value}"
+    # Для сообщений и коммитов показываем формат файла: без политики для
+    # типов бота, остальные правила — с политикой и опциями как в файле
+    if rule.type in POLICY_FREE_TYPES and not rule.options:
+        return f"{rule.type.value},{rule.value}"
+    cols = [rule.type.value, rule.value]
+    if rule.policy is not None:
+        cols.append(rule.policy.value)
+    return ",".join(cols + list(rule.options))
 
 
 def describe_rule(rule: Rule) -> str:
@@ -162,6 +634,18 @@ def describe_rule(rule: Rule) -> str:
         RuleType.DOMAIN: "точный домен",
         RuleType.DOMAIN_KEYWORD: "ключевое слово",
         RuleType.IP_CIDR: "IP-диапазон",
+        RuleType.IP_CIDR6: "IPv6-диапазон",
+        RuleType.IP_ASN: "автономная система",
+        RuleType.GEOIP: "страна",
+        RuleType.DOMAIN_SET: "список доменов",
+        RuleType.DOMAIN_WILDCARD: "домен по маске",
+        RuleType.RULE_SET: "набор правил",
+        RuleType.USER_AGENT: "User-Agent",
+        RuleType.URL_REGEX: "регулярное выражение URL",
+        RuleType.DST_PORT: "порт назначения",
+        RuleType.AND: "логическое правило",
+        RuleType.OR: "логическое правило",
+        RuleType.NOT: "логическое правило",
     }
     # Конфиг не требует третьей колонки, поэтому политику не показываем
     return f"{rule.value} ({type_map.get(rule.type)})"
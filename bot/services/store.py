@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Protocol, Sequence, runtime_checkable
+
+from bot.services.rules_file import RuleOp
+
+
+@dataclass(frozen=True)
+class FileChange:
+    """One file of a multi-file commit: new content computed from base_sha by ops."""
+
+    path: str
+    new_text: str
+    base_sha: str
+    ops: Optional[Sequence[RuleOp]] = None
+
+
+@runtime_checkable
+class RuleStore(Protocol):
+    """What handlers need from a rules storage backend.
+
+    Implemented by GitHubFileStore (Contents API) and GitMirrorStore (local
+    clone). fetch() returns {"sha": <git blob sha>, "text": <file content>};
+    commit() returns the GitHub contents PUT response shape, where
+    resp["commit"]["html_url"] is optional. commit_many() writes several
+    files in one commit and returns {"commit": {...}, "files": {path: {"sha"}}}.
+    get_recent_commits() pages through commits touching either rules file,
+    newest first; each carries "files" and "rules" ({"added", "removed"}).
+    """
+
+    path_proxy: str
+    path_direct: str
+
+    def get_path_for_policy(self, policy: str) -> str: ...
+
+    async def open(self) -> None: ...
+
+    async def close(self) -> None: ...
+
+    def invalidate(self, file_path: str | None = None) -> None: ...
+
+    async def fetch(self, retry: int = 2, file_path: str | None = None) -> Dict[str, Any]: ...
+
+    async def fetch_many(self, file_paths: Sequence[str]) -> Dict[str, Dict[str, Any]]: ...
+
+    async def refresh(self, file_path: str | None = None) -> Dict[str, Any]: ...
+
+    def snapshot_age(self, file_path: str | None = None) -> float | None: ...
+
+    def keep_fresh(self, file_path: str, interval: float) -> None: ...
+
+    async def commit(
+        self,
+        new_text: str,
+        message: str,
+        author_name: str | None,
+        author_email: str | None,
+        base_sha: str,
+        retry: int = 2,
+        file_path: str | None = None,
+        ops: Sequence[RuleOp] | None = None,
+    ) -> Dict[str, Any]: ...
+
+    async def commit_many(
+        self,
+        changes: Sequence[FileChange],
+        message: str,
+        author_name: str | None = None,
+        author_email: str | None = None,
+        retry: int = 2,
+    ) -> Dict[str, Any]: ...
+
+    async def get_recent_commits(self, limit: int = 5, page: int = 1) -> list[Dict[str, Any]]: ...
+
+    @staticmethod
+    def commit_message_add(rule_line: str, username: str | None) -> str: ...
+
+    @staticmethod
+    def commit_message_delete(rule_line: str, username: str | None) -> str: ...
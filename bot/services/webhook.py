@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+from typing import Any, Dict, Optional, Sequence, Set
+
+from aiohttp import web
+
+from bot import metrics
+
+WEBHOOK_PATH = "/github/webhook"
+
+logger = logging.getLogger(__name__)
+
+
+def verify_signature(secret: str, body: bytes, signature: Optional[str]) -> bool:
+    """Check GitHub's X-Hub-Signature-256 header ("sha256=<hex hmac of body>")."""
+    if not secret or not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature[len("sha256="):])
+
+
+def sign(secret: str, body: bytes) -> str:
+    """X-Hub-Signature-256 value GitHub would send for body (for local testing)."""
+    return "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+def touched_paths(payload: Dict[str, Any]) -> Optional[Set[str]]:
+    """Files added, modified or removed by a push; None when the payload does not say.
+
+    GitHub omits per-commit file lists for some pushes (force pushes, very
+    large pushes), in which case every cached file must be considered stale.
+    """
+    commits = payload.get("commits")
+    if not commits:
+        return None
+    paths: Set[str] = set()
+    for commit in commits:
+        for key in ("added", "modified", "removed"):
+            files = commit.get(key)
+            if files is None:
+                return None
+            paths.update(files)
+    return paths
+
+
+class PushWebhook:
+    """Receives GitHub push events and invalidates the store's cached snapshots.
+
+    Only pushes to the configured branch are considered. Tracked files (the
+    same paths the refresher keeps warm) that were touched are re-fetched in
+    the background, so the next read is served from a fresh cache entry.
+    """
+
+    def __init__(self, store: Any, secret: str, branch: str, paths: Sequence[str]) -> None:
+        self.store = store
+        self.secret = secret
+        self.branch = branch
+        self.paths = set(paths)
+        self._tasks: Set[asyncio.Task] = set()
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(WEBHOOK_PATH, self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        if not verify_signature(self.secret, body, request.headers.get("X-Hub-Signature-256")):
+            metrics.GITHUB_WEBHOOK_EVENTS.labels(result="bad_signature").inc()
+            logger.warning("Rejected GitHub webhook with invalid signature")
+            return web.Response(status=401, text="invalid signature")
+
+        event = request.headers.get("X-GitHub-Event", "")
+        if event == "ping":
+            metrics.GITHUB_WEBHOOK_EVENTS.labels(result="ping").inc()
+            return web.Response(text="pong")
+        if event != "push":
+            metrics.GITHUB_WEBHOOK_EVENTS.labels(result="ignored").inc()
+            return web.Response(status=202, text="ignored")
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            metrics.GITHUB_WEBHOOK_EVENTS.labels(result="bad_payload").inc()
+            return web.Response(status=400, text="invalid payload")
+
+        if payload.get("ref") != f"refs/heads/{self.branch}":
+            metrics.GITHUB_WEBHOOK_EVENTS.labels(result="ignored").inc()
+            return web.Response(status=202, text="ignored")
+
+        invalidated = self.apply_push(payload)
+        metrics.GITHUB_WEBHOOK_EVENTS.labels(result="invalidated" if invalidated else "ignored").inc()
+        return web.json_response({"invalidated": sorted(invalidated)})
+
+    def apply_push(self, payload: Dict[str, Any]) -> Set[str]:
+        """Invalidate touched tracked files and schedule a refresh; returns their paths."""
+        paths = touched_paths(payload)
+        stale = set(self.paths) if paths is None else self.paths & paths
+        for path in stale:
+            # Also detaches a fetch already in flight: the refresh sends a new request
+            self.store.invalidate(path)
+            task = asyncio.create_task(self._refresh(path))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if stale:
+            after = str(payload.get("after") or "")[:7]
+            logger.info(f"GitHub push {after} touched {', '.join(sorted(stale))}, cache invalidated")
+        return stale
+
+    async def _refresh(self, path: str) -> None:
+        try:
+            await self.store.fetch(file_path=path)
+        except Exception as e:
+            # The next read retries on its own; the entry is already invalidated
+            logger.warning(f"Background refresh of {path} after push failed: {e}")
+
+    async def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+async def start_webhook_server(addr: str, webhook: PushWebhook) -> web.AppRunner:
+    host, _, port_str = addr.partition(":")
+    host = host or "0.0.0.0"
+    port = int(port_str or 9124)
+    logger.info("Starting GitHub webhook server", extra={"host": host, "port": port, "path": WEBHOOK_PATH})
+    runner = web.AppRunner(webhook.app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
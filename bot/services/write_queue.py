@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from bot import metrics
+from bot.services.rules_file import RuleOp, parse_document
+from bot.services.store import FileChange, RuleStore
+
+# Called once the edit is committed (resp, None) or has failed (None, error)
+Notify = Callable[[Optional[Dict[str, Any]], Optional[BaseException]], Awaitable[None]]
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueuedEdit:
+    path: str
+    ops: Sequence[RuleOp]
+    message: str
+    author: Optional[str]
+    notify: Optional[Notify]
+
+
+class WriteBehindQueue:
+    """Coalesces rule edits made within `window` seconds into a single commit.
+
+    submit() only records the rule operations; the first edit after a flush
+    starts a timer, and when it fires every queued edit is replayed on the
+    latest content of its file and written with one store.commit_many() call
+    whose message lists all the changes. Reads do not see queued edits until
+    the flush. close() flushes whatever is still queued.
+    """
+
+    def __init__(self, store: RuleStore, window: float) -> None:
+        self.store = store
+        self.window = window
+        self._pending: Dict[str, List[QueuedEdit]] = {}
+        self._timer: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def pending(self, file_path: str | None = None) -> int:
+        """Number of queued edits (for one file, or in total)."""
+        if file_path is not None:
+            return len(self._pending.get(file_path, ()))
+        return sum(len(edits) for edits in self._pending.values())
+
+    def submit(self, file_path: str, ops: Sequence[RuleOp], message: str, author: str | None = None, notify: Notify | None = None) -> None:
+        """Queue an edit; raises CircuitOpen while the store is in read-only mode."""
+        breaker = getattr(self.store, "breaker", None)
+        if breaker is not None:
+            breaker.check()
+        self._pending.setdefault(file_path, []).append(QueuedEdit(file_path, list(ops), message, author, notify))
+        metrics.WRITE_QUEUE_PENDING.set(self.pending())
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def close(self) -> None:
+        timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+            await asyncio.gather(timer, return_exceptions=True)
+        await self.flush()
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.window)
+        # A flush in progress must not be cancelled by close(); it waits on the lock instead
+        self._timer = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Commit every queued edit now."""
+        async with self._flush_lock:
+            batch, self._pending = self._pending, {}
+            metrics.WRITE_QUEUE_PENDING.set(0)
+            edits = [edit for queued in batch.values() for edit in queued]
+            if not edits:
+                return
+            logger.info(f"Flushing {len(edits)} queued edit(s) to {', '.join(batch)}")
+            try:
+                fetched = await self.store.fetch_many(list(batch))
+                changes = []
+                for path, queued in batch.items():
+                    if path not in fetched:
+                        raise RuntimeError(f"{path} not found")
+                    ops = [op for edit in queued for op in edit.ops]
+                    document = parse_document(fetched[path])
+                    document.apply(ops)
+                    new_text = document.render()
+                    changes.append(FileChange(path, new_text, fetched[path]["sha"], ops))
+                authors = {edit.author for edit in edits}
+                author = authors.pop() if len(authors) == 1 else None
+                resp = await self.store.commit_many(changes, batch_message(edits), author, None)
+            except Exception as e:
+                logger.error(f"Write-behind flush of {len(edits)} edit(s) failed: {e}")
+                await self._notify(edits, None, e)
+                return
+            metrics.WRITE_QUEUE_BATCH_SIZE.observe(len(edits))
+            await self._notify(edits, resp, None)
+
+    async def _notify(self, edits: List[QueuedEdit], resp: Optional[Dict[str, Any]], error: Optional[BaseException]) -> None:
+        for edit in edits:
+            if edit.notify is None:
+                continue
+            try:
+                await edit.notify(resp, error)
+            except Exception as e:
+                logger.warning(f"Write-behind notification failed: {e}")
+
+
+def batch_message(edits: Sequence[QueuedEdit]) -> str:
+    """Commit message for a batch: the edit's own message, or a headline plus one line per edit."""
+    if len(edits) == 1:
+        return edits[0].message
+    return f"Batch: {len(edits)} rule changes\n\n" + "\n".join(f"- {edit.message}" for edit in edits)
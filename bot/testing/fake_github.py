@@ -0,0 +1,485 @@
+"""In-process stand-in for the GitHub REST endpoints used by GitHubFileStore.
+
+Serves contents (GET/PUT, raw and JSON media types, ETag/304, sha/409
+semantics), commit listing (ETag/304) and commit details with patches, git blobs, the GraphQL blob lookups sent by
+GitHubFileStore.fetch_many(), the createCommitOnBranch mutation used by
+GitHubFileStore.commit_many() and the refs/commits/compare/merges endpoints
+used by BranchPublisher over a real aiohttp server on
+127.0.0.1, with configurable latency and error injection. Used by the
+integration tests and by benchmarks/ to exercise whole user flows without
+touching the network.
+
+    fake = FakeGitHub(latency=lambda: random.lognormvariate(-2.5, 0.5))
+    fake.put_file("rules/private.list", "DOMAIN,a.com\\n")
+    base_url = await fake.start()   # -> GITHUB_API_URL
+    ...
+    await fake.close()
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import datetime as dt
+import difflib
+import hashlib
+import json
+import random
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from aiohttp import web
+
+from bot.services.github_store import git_blob_sha
+
+Latency = Union[float, Callable[[], float]]
+
+# `alias: object(expression: $var)` selections; enough GraphQL for fetch_many()
+GRAPHQL_OBJECT_RE = re.compile(r"(\w+)\s*:\s*object\(\s*expression\s*:\s*\$(\w+)\s*\)")
+GRAPHQL_REF_RE = re.compile(r"ref\(\s*qualifiedName\s*:\s*\$(\w+)\s*\)")
+
+
+@dataclass
+class FakeCommit:
+    sha: str
+    message: str
+    author: str
+    date: str
+    branch: str  # branch it was made on ("" for commits created through the Git Data API)
+    paths: List[str] = field(default_factory=list)
+    parents: List[str] = field(default_factory=list)
+    tree: str = ""
+
+
+class FakeGitHub:
+    def __init__(
+        self,
+        owner: str = "o",
+        repo: str = "r",
+        branch: str = "main",
+        latency: Latency = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 502,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.owner = owner
+        self.repo = repo
+        self.branch = branch
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit = 5000
+        self.requests: Counter[str] = Counter()
+        self.files: Dict[tuple[str, str], bytes] = {}
+        self.commits: List[FakeCommit] = []
+        self.refs: Dict[str, str] = {}  # branch -> commit sha
+        self.trees: Dict[str, Dict[str, bytes]] = {}
+        self._forced_errors: List[int] = []
+        self._dropped_responses = 0
+        self._last_date: Optional[dt.datetime] = None
+        self._rnd = random.Random(seed)
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    # ---- state helpers -------------------------------------------------
+
+    def put_file(self, path: str, text: str, branch: str | None = None, message: str = "external edit", author: str = "someone") -> str:
+        """Write a file as if pushed by someone else; returns the new blob sha."""
+        branch = branch or self.branch
+        data = text.encode("utf-8")
+        self.files[(branch, path)] = data
+        self._record_commit(message, author, branch, [path])
+        return git_blob_sha(data)
+
+    def read_file(self, path: str, branch: str | None = None) -> str:
+        return self.files[(branch or self.branch, path)].decode("utf-8")
+
+    def fail_next(self, status: int = 502, count: int = 1) -> None:
+        """Answer the next `count` requests with `status`."""
+        self._forced_errors.extend([status] * count)
+
+    def drop_next_response(self, count: int = 1) -> None:
+        """Apply the next `count` writes (not GETs or GraphQL queries) but close the connection instead of answering."""
+        self._dropped_responses += count
+
+    def _record_commit(self, message: str, author: str, branch: str, paths: List[str]) -> FakeCommit:
+        """Commit the current files of branch on top of its head and move the branch."""
+        parent = self.refs.get(branch)
+        commit = self._new_commit(message, author, self._store_tree(self._branch_files(branch)), [parent] if parent else [], branch, paths)
+        self.refs[branch] = commit.sha
+        return commit
+
+    def _new_commit(self, message: str, author: str, tree: str, parents: List[str], branch: str = "", paths: Optional[List[str]] = None) -> FakeCommit:
+        n = len(self.commits)
+        sha = hashlib.sha1(f"{n}:{branch}:{message}".encode("utf-8")).hexdigest()
+        if paths is None:
+            before = self.trees[self._commit(parents[0]).tree] if parents else {}
+            after = self.trees[tree]
+            paths = sorted(p for p in set(before) | set(after) if before.get(p) != after.get(p))
+        # Distinct second-resolution dates, so listings merged by date keep commit order
+        now = dt.datetime.now(dt.timezone.utc).replace(microsecond=0)
+        if self._last_date is not None and now <= self._last_date:
+            now = self._last_date + dt.timedelta(seconds=1)
+        self._last_date = now
+        commit = FakeCommit(
+            sha=sha,
+            message=message,
+            author=author,
+            date=now.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            branch=branch,
+            paths=paths,
+            parents=parents,
+            tree=tree,
+        )
+        self.commits.append(commit)
+        return commit
+
+    def _branch_files(self, branch: str) -> Dict[str, bytes]:
+        return {path: data for (b, path), data in self.files.items() if b == branch}
+
+    def _store_tree(self, files: Dict[str, bytes]) -> str:
+        tree = hashlib.sha1(repr(sorted((p, git_blob_sha(d)) for p, d in files.items())).encode("utf-8")).hexdigest()
+        self.trees[tree] = dict(files)
+        return tree
+
+    def _commit(self, sha: str) -> FakeCommit:
+        for c in self.commits:
+            if c.sha == sha:
+                return c
+        raise KeyError(sha)
+
+    def _resolve(self, rev: str) -> Optional[str]:
+        if rev in self.refs:
+            return self.refs[rev]
+        return rev if any(c.sha == rev for c in self.commits) else None
+
+    def _ancestors(self, sha: Optional[str]) -> set:
+        seen: set = set()
+        stack = [sha] if sha else []
+        while stack:
+            current = stack.pop()
+            if current not in seen:
+                seen.add(current)
+                stack.extend(self._commit(current).parents)
+        return seen
+
+    def _set_ref(self, branch: str, sha: str) -> None:
+        """Point branch at sha and check its tree out as the branch's files."""
+        self.refs[branch] = sha
+        for key in [k for k in self.files if k[0] == branch]:
+            del self.files[key]
+        for path, data in self.trees[self._commit(sha).tree].items():
+            self.files[(branch, path)] = data
+
+    def head(self, branch: str | None = None) -> Optional[str]:
+        """Sha of the latest commit on branch (None before the first commit)."""
+        return self.refs.get(branch or self.branch)
+
+    def _html_url(self, sha: str) -> str:
+        return f"https://github.com/{self.owner}/{self.repo}/commit/{sha}"
+
+    # ---- server lifecycle ----------------------------------------------
+
+    async def start(self) -> str:
+        app = web.Application(middlewares=[self._middleware])
+        prefix = f"/repos/{self.owner}/{self.repo}"
+        app.router.add_get(prefix + "/contents/{path:.+}", self._get_contents)
+        app.router.add_put(prefix + "/contents/{path:.+}", self._put_contents)
+        app.router.add_get(prefix + "/commits", self._list_commits)
+        app.router.add_get(prefix + "/commits/{sha}", self._get_commit)
+        app.router.add_get(prefix + "/git/blobs/{sha}", self._get_blob)
+        app.router.add_get(prefix + "/git/ref/heads/{branch:.+}", self._get_ref)
+        app.router.add_post(prefix + "/git/refs", self._create_ref)
+        app.router.add_patch(prefix + "/git/refs/heads/{branch:.+}", self._update_ref)
+        app.router.add_get(prefix + "/git/commits/{sha}", self._get_git_commit)
+        app.router.add_post(prefix + "/git/commits", self._create_git_commit)
+        app.router.add_get(prefix + "/compare/{basehead:.+}", self._compare)
+        app.router.add_post(prefix + "/merges", self._merge)
+        app.router.add_post("/graphql", self._graphql)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        resource = request.match_info.route.resource
+        self.requests[f"{request.method} {resource.canonical if resource else request.path}"] += 1
+        delay = self.latency() if callable(self.latency) else self.latency
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self._forced_errors:
+            return web.Response(status=self._forced_errors.pop(0), text="injected error")
+        if self.error_rate and self._rnd.random() < self.error_rate:
+            return web.Response(status=self.error_status, text="injected error")
+        response = await handler(request)
+        if self._dropped_responses and await self._is_write(request):
+            self._dropped_responses -= 1
+            # Applied, but the client never sees the answer (like a timeout after GitHub committed)
+            request.transport.close()
+        if response.status != 304:
+            self.rate_limit = max(0, self.rate_limit - 1)
+        response.headers["X-RateLimit-Remaining"] = str(self.rate_limit)
+        response.headers["X-RateLimit-Reset"] = str(int(time.time()) + 3600)
+        return response
+
+    @staticmethod
+    async def _is_write(request: web.Request) -> bool:
+        if request.method == "GET":
+            return False
+        if request.path == "/graphql":
+            return "mutation" in (await request.json()).get("query", "")
+        return True
+
+    # ---- endpoints -----------------------------------------------------
+
+    async def _get_contents(self, request: web.Request) -> web.StreamResponse:
+        path = request.match_info["path"]
+        branch = request.query.get("ref", self.branch)
+        data = self.files.get((branch, path))
+        if data is None:
+            return web.json_response({"message": "Not Found"}, status=404)
+        sha = git_blob_sha(data)
+        raw = "raw" in request.headers.get("Accept", "")
+        etag = f'"{sha}{"-raw" if raw else ""}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        if raw:
+            return web.Response(body=data, content_type="application/vnd.github.raw", headers={"ETag": etag})
+        payload = {
+            "type": "file",
+            "path": path,
+            "sha": sha,
+            "size": len(data),
+            "encoding": "base64",
+            "content": base64.encodebytes(data).decode("ascii"),
+        }
+        return web.json_response(payload, headers={"ETag": etag})
+
+    async def _put_contents(self, request: web.Request) -> web.Response:
+        path = request.match_info["path"]
+        body = await request.json()
+        branch = body.get("branch", self.branch)
+        current = self.files.get((branch, path))
+        if current is not None:
+            if "sha" not in body:
+                return web.json_response({"message": "\"sha\" wasn't supplied."}, status=422)
+            if body["sha"] != git_blob_sha(current):
+                return web.json_response({"message": f"{path} does not match {body['sha']}"}, status=409)
+        data = base64.b64decode(body["content"])
+        self.files[(branch, path)] = data
+        author = (body.get("author") or {}).get("name") or "TG Shadowrocket Bot"
+        commit = self._record_commit(body.get("message", ""), author, branch, [path])
+        return web.json_response(
+            {
+                "content": {"path": path, "sha": git_blob_sha(data)},
+                "commit": {"sha": commit.sha, "html_url": self._html_url(commit.sha)},
+            },
+            status=200 if current is not None else 201,
+        )
+
+    async def _list_commits(self, request: web.Request) -> web.Response:
+        path = request.query.get("path")
+        branch = request.query.get("sha", self.branch)
+        per_page = int(request.query.get("per_page", 30))
+        page = int(request.query.get("page", 1))
+        reachable = self._ancestors(self.refs.get(branch))
+        matching = [c for c in reversed(self.commits) if c.sha in reachable and (path is None or path in c.paths)]
+        chunk = matching[(page - 1) * per_page: page * per_page]
+        payload = [self._commit_json(c) for c in chunk]
+        etag = '"%s"' % hashlib.sha1(json.dumps(payload).encode("utf-8")).hexdigest()
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.json_response(payload, headers={"ETag": etag})
+
+    async def _get_commit(self, request: web.Request) -> web.Response:
+        sha = self._resolve(request.match_info["sha"])
+        if sha is None:
+            return web.json_response({"message": "No commit found"}, status=422)
+        c = self._commit(sha)
+        before = self.trees[self._commit(c.parents[0]).tree] if c.parents else {}
+        after = self.trees[c.tree]
+        files = []
+        for path in c.paths:
+            old, new = before.get(path), after.get(path)
+            status = "added" if old is None else "removed" if new is None else "modified"
+            diff = difflib.unified_diff(
+                (old or b"").decode("utf-8").splitlines(), (new or b"").decode("utf-8").splitlines(), n=0, lineterm=""
+            )
+            # GitHub's patch starts at the first hunk, without the ---/+++ header
+            patch = "\n".join(line for line in diff if not line.startswith(("--- ", "+++ ")))
+            files.append({"filename": path, "status": status, "patch": patch})
+        return web.json_response(dict(self._commit_json(c), files=files))
+
+    async def _get_blob(self, request: web.Request) -> web.Response:
+        sha = request.match_info["sha"]
+        for data in self.files.values():
+            if git_blob_sha(data) == sha:
+                if "raw" in request.headers.get("Accept", ""):
+                    return web.Response(body=data, content_type="application/vnd.github.raw")
+                return web.json_response({"sha": sha, "encoding": "base64", "content": base64.b64encode(data).decode("ascii")})
+        return web.json_response({"message": "Not Found"}, status=404)
+
+    async def _graphql(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        variables = body.get("variables") or {}
+        if "createCommitOnBranch" in body.get("query", ""):
+            return self._create_commit_on_branch(variables["input"])
+        if variables.get("owner") != self.owner or variables.get("name") != self.repo:
+            return web.json_response({"data": {"repository": None}, "errors": [{"type": "NOT_FOUND"}]})
+        repository: Dict[str, Any] = {}
+        for alias, var in GRAPHQL_OBJECT_RE.findall(body.get("query", "")):
+            branch, _, path = str(variables.get(var, "")).partition(":")
+            data = self.files.get((branch, path))
+            if data is None:
+                repository[alias] = None
+                continue
+            try:
+                text: Optional[str] = data.decode("utf-8")
+            except UnicodeDecodeError:
+                text = None
+            repository[alias] = {"oid": git_blob_sha(data), "text": text, "isBinary": text is None, "isTruncated": False}
+        ref = GRAPHQL_REF_RE.search(body.get("query", ""))
+        if ref:
+            head = self.head(str(variables.get(ref.group(1), "")).removeprefix("refs/heads/"))
+            repository["ref"] = {"target": {"oid": head}} if head else None
+        return web.json_response({"data": {"repository": repository}})
+
+    def _create_commit_on_branch(self, payload: Dict[str, Any]) -> web.Response:
+        branch = payload["branch"]["branchName"]
+        if payload["branch"].get("repositoryNameWithOwner") != f"{self.owner}/{self.repo}":
+            return web.json_response({"data": None, "errors": [{"type": "NOT_FOUND", "message": "Could not resolve to a Repository"}]})
+        head = self.head(branch)
+        if payload.get("expectedHeadOid") != head:
+            message = f"Expected branch to point to \"{payload.get('expectedHeadOid')}\" but it did not. Pull and try again."
+            return web.json_response({"data": {"createCommitOnBranch": None}, "errors": [{"type": "STALE_DATA", "message": message}]})
+        changes = payload.get("fileChanges") or {}
+        paths = []
+        for addition in changes.get("additions") or []:
+            self.files[(branch, addition["path"])] = base64.b64decode(addition["contents"])
+            paths.append(addition["path"])
+        for deletion in changes.get("deletions") or []:
+            self.files.pop((branch, deletion["path"]), None)
+            paths.append(deletion["path"])
+        headline = payload["message"]["headline"]
+        body = payload["message"].get("body")
+        commit = self._record_commit(f"{headline}\n\n{body}" if body else headline, "TG Shadowrocket Bot", branch, paths)
+        return web.json_response({"data": {"createCommitOnBranch": {"commit": {"oid": commit.sha, "url": self._html_url(commit.sha)}}}})
+
+    async def _get_ref(self, request: web.Request) -> web.Response:
+        branch = request.match_info["branch"]
+        if branch not in self.refs:
+            return web.json_response({"message": "Not Found"}, status=404)
+        return web.json_response({"ref": f"refs/heads/{branch}", "object": {"sha": self.refs[branch], "type": "commit"}})
+
+    async def _create_ref(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        branch = body["ref"].removeprefix("refs/heads/")
+        if branch in self.refs:
+            return web.json_response({"message": "Reference already exists"}, status=422)
+        if self._resolve(body["sha"]) is None:
+            return web.json_response({"message": "Object does not exist"}, status=422)
+        self._set_ref(branch, body["sha"])
+        return web.json_response({"ref": body["ref"], "object": {"sha": body["sha"], "type": "commit"}}, status=201)
+
+    async def _update_ref(self, request: web.Request) -> web.Response:
+        branch = request.match_info["branch"]
+        body = await request.json()
+        if branch not in self.refs:
+            return web.json_response({"message": "Reference does not exist"}, status=422)
+        if self._resolve(body["sha"]) is None:
+            return web.json_response({"message": "Object does not exist"}, status=422)
+        if not body.get("force") and self.refs[branch] not in self._ancestors(body["sha"]):
+            return web.json_response({"message": "Update is not a fast forward"}, status=422)
+        self._set_ref(branch, body["sha"])
+        return web.json_response({"ref": f"refs/heads/{branch}", "object": {"sha": body["sha"], "type": "commit"}})
+
+    async def _get_git_commit(self, request: web.Request) -> web.Response:
+        try:
+            c = self._commit(request.match_info["sha"])
+        except KeyError:
+            return web.json_response({"message": "Not Found"}, status=404)
+        return web.json_response(self._git_commit_json(c))
+
+    async def _create_git_commit(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        if body["tree"] not in self.trees or any(self._resolve(p) is None for p in body.get("parents", [])):
+            return web.json_response({"message": "Tree or parent does not exist"}, status=422)
+        c = self._new_commit(body["message"], "TG Shadowrocket Bot", body["tree"], list(body.get("parents", [])))
+        return web.json_response(self._git_commit_json(c), status=201)
+
+    async def _compare(self, request: web.Request) -> web.Response:
+        base_rev, _, head_rev = request.match_info["basehead"].partition("...")
+        base, head = self._resolve(base_rev), self._resolve(head_rev)
+        if base is None or head is None:
+            return web.json_response({"message": "Not Found"}, status=404)
+        base_anc, head_anc = self._ancestors(base), self._ancestors(head)
+        ahead = [c for c in self.commits if c.sha in head_anc - base_anc]
+        behind = base_anc - head_anc
+        status = "identical" if base == head else "ahead" if not behind else "behind" if not ahead else "diverged"
+        return web.json_response({
+            "status": status,
+            "ahead_by": len(ahead),
+            "behind_by": len(behind),
+            "base_commit": self._commit_json(self._commit(base)),
+            "commits": [self._commit_json(c) for c in ahead],
+        })
+
+    async def _merge(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        branch = body["base"]
+        base, head = self.refs.get(branch), self._resolve(body["head"])
+        if base is None or head is None:
+            return web.json_response({"message": "Not Found"}, status=404)
+        if head in self._ancestors(base):
+            return web.Response(status=204)
+        common = self._ancestors(base) & self._ancestors(head)
+        merge_base = max(common, key=lambda sha: self.commits.index(self._commit(sha))) if common else None
+        ancestor = self.trees[self._commit(merge_base).tree] if merge_base else {}
+        ours, theirs = self.trees[self._commit(base).tree], self.trees[self._commit(head).tree]
+        merged: Dict[str, bytes] = {}
+        for path in set(ancestor) | set(ours) | set(theirs):
+            a, o, t = ancestor.get(path), ours.get(path), theirs.get(path)
+            if o == t or t == a:
+                result = o
+            elif o == a:
+                result = t
+            else:
+                return web.json_response({"message": "Merge conflict"}, status=409)
+            if result is not None:
+                merged[path] = result
+        message = body.get("commit_message") or f"Merge {body['head']} into {branch}"
+        c = self._new_commit(message, "TG Shadowrocket Bot", self._store_tree(merged), [base, head], branch)
+        self._set_ref(branch, c.sha)
+        return web.json_response(self._commit_json(c), status=201)
+
+    def _commit_json(self, c: FakeCommit) -> Dict[str, Any]:
+        return {
+            "sha": c.sha,
+            "html_url": self._html_url(c.sha),
+            "commit": {
+                "message": c.message,
+                "author": {"name": c.author, "date": c.date},
+                "committer": {"name": c.author, "date": c.date},
+            },
+            "parents": [{"sha": p} for p in c.parents],
+        }
+
+    def _git_commit_json(self, c: FakeCommit) -> Dict[str, Any]:
+        return {
+            "sha": c.sha,
+            "html_url": self._html_url(c.sha),
+            "message": c.message,
+            "tree": {"sha": c.tree},
+            "parents": [{"sha": p} for p in c.parents],
+        }
@@ -1,7 +1,25 @@
 import os
 import sys
 
+import pytest
+
 # Ensure project root is importable as package (so `import bot` works in tests)
 ROOT = os.path.dirname(os.path.dirname(__file__))
 if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def github_env(monkeypatch):
+    """Minimal GitHub settings for a store under test; call the result to set extra variables."""
+    monkeypatch.setenv("BOT_TOKEN", "x")
+    monkeypatch.setenv("GITHUB_TOKEN", "t")
+    monkeypatch.setenv("GITHUB_OWNER", "o")
+    monkeypatch.setenv("GITHUB_REPO", "r")
+    monkeypatch.setenv("GITHUB_BRANCH", "main")
+
+    def setenv(**env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, str(value))
+
+    return setenv
@@ -0,0 +1,57 @@
+"""Shared fake GitHub server and GitHubFileStore fixtures.
+
+Modules override ``fake_files`` to seed different content, ``store_env`` to
+add settings, or ``store`` to tweak attributes through ``make_store``.
+"""
+import pytest
+
+from bot.config import Settings
+from bot.services.github_store import GitHubFileStore
+from bot.services.retry import RetryPolicy
+from bot.testing.fake_github import FakeGitHub
+
+PROXY = "rules/private.list"
+DIRECT = "rules/private.direct.list"
+
+
+@pytest.fixture
+def fake_files():
+    return {PROXY: "DOMAIN,a.com\n", DIRECT: "DOMAIN,d.com\n"}
+
+
+@pytest.fixture
+async def fake(fake_files):
+    fake = FakeGitHub()
+    for path, text in fake_files.items():
+        fake.put_file(path, text)
+    await fake.start()
+    yield fake
+    await fake.close()
+
+
+@pytest.fixture
+def store_env():
+    return {}
+
+
+@pytest.fixture
+async def make_store(fake, github_env, store_env):
+    github_env(GITHUB_API_URL=fake.base_url, **store_env)
+    stores = []
+
+    def make(**attrs):
+        store = GitHubFileStore(Settings())
+        store.retry_policy = RetryPolicy(base_delay=0.001)
+        for name, value in attrs.items():
+            setattr(store, name, value)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        await store.close()
+
+
+@pytest.fixture
+def store(make_store):
+    return make_store()
@@ -0,0 +1,108 @@
+"""On-disk snapshot cache: fast restarts and stale reads during an outage."""
+import asyncio
+
+import aiohttp
+import pytest
+
+from bot.services import rules_file
+from bot.services.disk_cache import SnapshotDiskCache
+from bot.services.rules_file import parse_snapshot, parse_text
+
+pytestmark = pytest.mark.integration
+
+PROXY = "rules/private.list"
+GET = "GET /repos/o/r/contents/{path}"
+
+
+@pytest.fixture
+def fake_files():
+    return {PROXY: "# header\nDOMAIN,a.com\nDOMAIN-SUFFIX,b.com,PROXY\n"}
+
+
+@pytest.fixture
+def store_env(tmp_path):
+    return {"CACHE_DIR": tmp_path / "cache"}
+
+
+async def _stopped_run(make_store):
+    first = make_store()
+    await first.open()
+    await first.fetch()
+    await first.close()  # waits for the snapshot write
+
+
+async def _restart(make_store):
+    await _stopped_run(make_store)
+    second = make_store()
+    await second.open()
+    return second
+
+
+async def test_restart_serves_from_disk_and_revalidates_once(fake, make_store):
+    await _stopped_run(make_store)
+    # Counted before open(): the background revalidation may finish inside it
+    gets, quota = fake.requests[GET], fake.rate_limit
+    second = make_store()
+    await second.open()
+    fetched = await second.fetch()
+    assert fetched["text"].startswith("# header")
+    await asyncio.gather(*second._background_refreshes)
+    # The background revalidation is the only request; the read needed none
+    assert fake.requests[GET] == gets + 1
+    assert fake.rate_limit == quota  # 304, not charged
+
+
+async def test_restart_picks_up_remote_change(fake, make_store):
+    second = await _restart(make_store)
+    fake.put_file(PROXY, "DOMAIN,new.com\n")
+    second.cache_ttl = 0
+    assert (await second.fetch())["text"] == "DOMAIN,new.com\n"
+    await second.close()
+
+
+async def test_stale_reads_during_outage(fake, make_store):
+    second = await _restart(make_store)
+    await second.close()
+    fake.error_rate = 1.0
+    second.cache_ttl = 0
+    fetched = await second.fetch()
+    assert fetched["text"].startswith("# header")
+    await second.close()
+
+
+@pytest.mark.parametrize("status", [401, 404])
+async def test_client_errors_are_not_hidden_behind_a_stale_read(fake, make_store, status):
+    store = await _restart(make_store)
+    await asyncio.gather(*store._background_refreshes)
+    store.cache_ttl = 0
+    fake.fail_next(status, count=3)  # one per attempt
+    with pytest.raises(aiohttp.ClientResponseError) as e:
+        await store.fetch()
+    assert e.value.status == status
+
+
+async def test_parsed_form_is_reused(fake, make_store, monkeypatch):
+    first = make_store()
+    await first.fetch()
+    await first.close()
+    rules_file._parse_cache.clear()
+
+    second = make_store()
+    await second.open()
+    monkeypatch.setattr(rules_file, "parse_text", lambda text: pytest.fail("parsed again"))
+    lines = parse_snapshot(await second.fetch())
+    assert [l.rule.value for l in lines if l.rule] == ["a.com", "b.com"]
+    await second.close()
+
+
+def test_disk_cache_roundtrip_and_isolation(tmp_path):
+    text = "# c\nDOMAIN,a.com\nIP-CIDR,10.0.0.0/8,DIRECT\ngarbage\n"
+    cache = SnapshotDiskCache(str(tmp_path), "o/r", "main")
+    cache.save("p.list", "sha1", text, '"etag"', parse_text(text))
+    loaded = cache.load("p.list")
+    assert (loaded.sha, loaded.text, loaded.etag) == ("sha1", text, '"etag"')
+    assert loaded.lines == parse_text(text)
+
+    assert SnapshotDiskCache(str(tmp_path), "o/r", "dev").load("p.list") is None
+    cache._file("p.list").write_text("{not json")
+    assert cache.load("p.list") is None
@@ -0,0 +1,117 @@
+"""GitHubFileStore end-to-end against the in-process fake GitHub server."""
+import pytest
+
+from bot.config import Settings
+from bot.services.github_store import GitHubFileStore
+from bot.services.git_mirror_store import GitMirrorStore
+from bot.services.rules_file import Rule, RuleOp, RuleType
+from bot.services.store import RuleStore
+
+PATH = "rules/private.list"
+
+
+@pytest.fixture
+def fake_files():
+    return {PATH: "DOMAIN,a.com\n"}
+
+
+@pytest.fixture
+def store(make_store):
+    return make_store(cache_ttl=0)
+
+
+def test_stores_implement_protocol(monkeypatch):
+    monkeypatch.setenv("BOT_TOKEN", "x")
+    monkeypatch.setenv("GITHUB_TOKEN", "t")
+    settings = Settings()
+    assert isinstance(GitHubFileStore(settings), RuleStore)
+    assert isinstance(GitMirrorStore(settings), RuleStore)
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_fetch_commit_and_revalidate(store, fake):
+    fetched = await store.fetch()
+    assert fetched["text"] == "DOMAIN,a.com\n"
+
+    resp = await store.commit("DOMAIN,a.com\nDOMAIN,b.com\n", "Add rule: DOMAIN,b.com", None, None, fetched["sha"])
+    assert resp["commit"]["html_url"]
+    assert fake.read_file(PATH) == "DOMAIN,a.com\nDOMAIN,b.com\n"
+
+    # Second revalidation of unchanged content is a 304
+    await store.fetch()
+    await store.fetch()
+    assert fake.rate_limit == 5000 - 3
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_conflict_rebases_onto_concurrent_edit(store, fake):
+    fetched = await store.fetch()
+    fake.put_file(PATH, "DOMAIN,a.com\nDOMAIN,other.com\n")
+
+    op = RuleOp("add", Rule(type=RuleType.DOMAIN, value="mine.com", policy=None), "# Added: mine")
+    await store.commit("DOMAIN,a.com\n# Added: mine\nDOMAIN,mine.com\n", "msg", None, None, fetched["sha"], ops=[op])
+
+    assert fake.read_file(PATH) == "DOMAIN,a.com\nDOMAIN,other.com\n# Added: mine\nDOMAIN,mine.com\n"
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_injected_server_error_is_retried(store, fake):
+    fake.fail_next(502)
+    fetched = await store.fetch()
+    assert fetched["text"] == "DOMAIN,a.com\n"
+    assert fake.requests["GET /repos/o/r/contents/{path}"] == 2
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_recent_commits_listing(store, fake):
+    fetched = await store.fetch()
+    await store.commit("DOMAIN,b.com\n", "Replace", None, None, fetched["sha"])
+    commits = await store.get_recent_commits(limit=5)
+    assert [c["commit"]["message"] for c in commits] == ["Replace", "external edit"]
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_read_answered_before_a_commit_does_not_replace_it(make_store, fake):
+    store = make_store(cache_ttl=60)
+    store.invalidate()
+    update = store.rate_limit.update
+    committed = "DOMAIN,a.com\nDOMAIN,b.com\n"
+
+    def commit_while_answering(headers):
+        # GitHub answered the read with the old text; the commit lands before the store caches it
+        update(headers)
+        if fake.read_file(PATH) != committed:
+            fake.put_file(PATH, committed)
+            store._write_through(PATH, committed, {})
+
+    store.rate_limit.update = commit_while_answering
+    assert (await store.fetch())["text"] == "DOMAIN,a.com\n"
+    store.rate_limit.update = update
+    assert (await store.fetch())["text"] == committed
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_batched_read_answered_before_a_commit_does_not_replace_it(make_store, fake):
+    store = make_store(cache_ttl=60)
+    fetched = await store.fetch()
+    graphql_blobs = store._graphql_blobs
+
+    async def commit_after_answer(paths):
+        blobs = await graphql_blobs(paths)
+        await store.commit("DOMAIN,a.com\nDOMAIN,b.com\n", "Add rule: DOMAIN,b.com", None, None, fetched["sha"])
+        return blobs
+
+    store._graphql_blobs = commit_after_answer
+    assert (await store.fetch_many([PATH]))[PATH]["text"] == "DOMAIN,a.com\n"
+
+    latest = await store.fetch()
+    assert latest["text"] == "DOMAIN,a.com\nDOMAIN,b.com\n"
+    # Based on the committed sha, so the next edit does not hit a 409
+    await store.commit(latest["text"] + "DOMAIN,c.com\n", "Add rule: DOMAIN,c.com", None, None, latest["sha"])
+    assert fake.read_file(PATH) == "DOMAIN,a.com\nDOMAIN,b.com\nDOMAIN,c.com\n"
@@ -0,0 +1,147 @@
+"""Test GitMirrorStore against a local bare repository (no network)."""
+import subprocess
+
+import pytest
+
+from bot.config import Settings
+from bot.services.git_mirror_store import GitMirrorStore
+from bot.services.github_store import git_blob_sha
+from bot.services.rules_file import Rule, RuleOp, RuleType
+from bot.services.store import FileChange
+
+INITIAL = "# header\nDOMAIN,a.com\n"
+
+
+def _git(*args, cwd):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+
+def _push_change(bare, tmp_path, text):
+    """Simulate someone else editing the file on the remote."""
+    other = tmp_path / "other"
+    if not other.exists():
+        _git("clone", "-q", str(bare), str(other), cwd=tmp_path)
+    _git("pull", "-q", cwd=other)
+    (other / "rules" / "private.list").write_text(text)
+    _git("-c", "user.name=o", "-c", "user.email=o@x", "commit", "-qam", "other edit", cwd=other)
+    _git("push", "-q", "origin", "HEAD:main", cwd=other)
+
+
+@pytest.fixture
+def bare(tmp_path):
+    bare = tmp_path / "remote.git"
+    _git("init", "-q", "--bare", "-b", "main", str(bare), cwd=tmp_path)
+    seed = tmp_path / "seed"
+    _git("clone", "-q", str(bare), str(seed), cwd=tmp_path)
+    (seed / "rules").mkdir()
+    (seed / "rules" / "private.list").write_text(INITIAL)
+    _git("checkout", "-q", "-b", "main", cwd=seed)
+    _git("add", ".", cwd=seed)
+    _git("-c", "user.name=s", "-c", "user.email=s@x", "commit", "-qm", "seed", cwd=seed)
+    _git("push", "-q", "origin", "main", cwd=seed)
+    return bare
+
+
+@pytest.fixture
+async def store(bare, tmp_path, monkeypatch):
+    monkeypatch.setenv("BOT_TOKEN", "x")
+    monkeypatch.setenv("GITHUB_TOKEN", "t")
+    monkeypatch.setenv("GITHUB_BRANCH", "main")
+    monkeypatch.setenv("GIT_MIRROR_URL", str(bare))
+    monkeypatch.setenv("GIT_MIRROR_DIR", str(tmp_path / "mirror"))
+    monkeypatch.setenv("GIT_MIRROR_REFRESH_SECONDS", "3600")
+    store = GitMirrorStore(Settings())
+    await store.open()
+    yield store
+    await store.close()
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_fetch_reads_working_tree_with_blob_sha(store):
+    result = await store.fetch()
+    assert result == {"sha": git_blob_sha(INITIAL.encode()), "text": INITIAL}
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_commit_pushes_to_remote(store, bare):
+    fetched = await store.fetch()
+    new_text = INITIAL + "DOMAIN,b.com\n"
+    resp = await store.commit(new_text, "Add rule: DOMAIN,b.com", "alice", None, fetched["sha"])
+
+    assert _git("show", "main:rules/private.list", cwd=bare) == new_text
+    assert resp["content"]["sha"] == git_blob_sha(new_text.encode())
+    assert resp["commit"]["sha"] == _git("rev-parse", "main", cwd=bare).strip()
+    assert (await store.fetch())["text"] == new_text
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_commit_rebases_ops_when_remote_moved(store, bare, tmp_path):
+    fetched = await store.fetch()
+    _push_change(bare, tmp_path, INITIAL + "DOMAIN,other.com\n")
+
+    op = RuleOp("add", Rule(type=RuleType.DOMAIN, value="mine.com", policy=None), "# Added: mine")
+    await store.commit(INITIAL + "# Added: mine\nDOMAIN,mine.com\n", "msg", None, None, fetched["sha"], ops=[op])
+
+    remote = _git("show", "main:rules/private.list", cwd=bare)
+    assert remote == INITIAL + "DOMAIN,other.com\n# Added: mine\nDOMAIN,mine.com\n"
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_commit_many_is_one_commit(store, bare):
+    fetched = await store.fetch()
+    changes = [
+        FileChange("rules/private.list", INITIAL + "DOMAIN,b.com\n", fetched["sha"]),
+        FileChange("rules/private.direct.list", "DOMAIN,d.com\n", git_blob_sha(b"")),
+    ]
+    resp = await store.commit_many(changes, "Add rules", None, None)
+
+    assert _git("rev-list", "--count", "main", cwd=bare).strip() == "2"
+    assert _git("show", "--name-only", "--format=", "main", cwd=bare).split() == ["rules/private.direct.list", "rules/private.list"]
+    assert resp["files"]["rules/private.direct.list"]["sha"] == git_blob_sha(b"DOMAIN,d.com\n")
+    assert (await store.commit_many(changes, "Again", None, None))["commit"] == {}
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_recent_commits_shape(store):
+    fetched = await store.fetch()
+    await store.commit(INITIAL + "DOMAIN,c.com\n", "Add rule: DOMAIN,c.com", None, None, fetched["sha"])
+    commits = await store.get_recent_commits(limit=5)
+    assert commits[0]["commit"]["message"] == "Add rule: DOMAIN,c.com"
+    assert commits[0]["commit"]["author"]["name"] == "TG Shadowrocket Bot"
+    assert len(commits) == 2
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_recent_commits_pages_with_rule_diffs(store):
+    fetched = await store.fetch()
+    await store.commit("# header\nDOMAIN,c.com\n", "Swap a for c", None, None, fetched["sha"])
+    first = await store.get_recent_commits(limit=1)
+    assert first[0]["files"] == ["rules/private.list"]
+    assert first[0]["rules"] == {"added": ["DOMAIN,c.com"], "removed": ["DOMAIN,a.com"]}
+    second = await store.get_recent_commits(limit=1, page=2)
+    assert second[0]["commit"]["message"] == "seed"
+    assert await store.get_recent_commits(limit=1, page=3) == []
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_recent_commits_sync_when_stale(store, bare, tmp_path):
+    _push_change(bare, tmp_path, INITIAL + "DOMAIN,z.com\n")
+    assert (await store.get_recent_commits(limit=1))[0]["commit"]["message"] == "seed"
+    store.invalidate()
+    assert (await store.get_recent_commits(limit=1))[0]["commit"]["message"] == "other edit"
+
+
+def test_token_is_sent_per_command_not_stored_in_remote_url(github_env, tmp_path):
+    github_env(GITHUB_TOKEN="s3cret-token", GIT_MIRROR_DIR=tmp_path / "mirror")
+    store = GitMirrorStore(Settings())
+    assert store.remote_url == "https://github.com/o/r.git"
+    assert "s3cret-token" not in store.remote_url
+    assert store._auth_env["GIT_CONFIG_KEY_0"] == "http.https://github.com/.extraHeader"
+    assert store._auth_env["GIT_CONFIG_VALUE_0"].startswith("Authorization: Basic ")
@@ -0,0 +1,133 @@
+"""Test ETag snapshot cache in GitHubFileStore.fetch."""
+import base64
+import pytest
+from aioresponses import aioresponses, CallbackResult
+
+from bot.services.github_store import GitHubFileStore, git_blob_sha
+from bot.config import Settings
+
+URL = "https://api.github.com/repos/o/r/contents/p.txt"
+GET_URL = f"{URL}?ref=main"
+
+
+@pytest.fixture
+async def store(github_env):
+    github_env(GITHUB_PATH_PROXY="p.txt")
+    store = GitHubFileStore(Settings())
+    yield store
+    await store.close()
+
+
+def _payload(text: str, sha: str) -> dict:
+    return {"content": base64.b64encode(text.encode()).decode("ascii"), "sha": sha}
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_fetch_within_ttl_served_from_memory(store):
+    store.cache_ttl = 60
+    with aioresponses() as m:
+        m.get(GET_URL, payload=_payload("DOMAIN,a.com\n", "s1"), headers={"ETag": '"e1"'})
+        first = await store.fetch()
+        # No second mock registered: a network call would raise
+        second = await store.fetch()
+    assert first == second == {"sha": "s1", "text": "DOMAIN,a.com\n"}
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_fetch_revalidates_with_etag_and_handles_304(store):
+    store.cache_ttl = 0
+    seen = {}
+
+    def _not_modified(url, **kwargs):
+        seen["if_none_match"] = kwargs["headers"].get("If-None-Match")
+        return CallbackResult(status=304)
+
+    with aioresponses() as m:
+        m.get(GET_URL, payload=_payload("DOMAIN,a.com\n", "s1"), headers={"ETag": '"e1"'})
+        m.get(GET_URL, callback=_not_modified)
+        await store.fetch()
+        result = await store.fetch()
+
+    assert seen["if_none_match"] == '"e1"'
+    assert result == {"sha": "s1", "text": "DOMAIN,a.com\n"}
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_invalidate_forces_full_fetch(store):
+    store.cache_ttl = 60
+    with aioresponses() as m:
+        m.get(GET_URL, payload=_payload("old\n", "s1"), headers={"ETag": '"e1"'})
+        m.get(GET_URL, payload=_payload("new\n", "s2"), headers={"ETag": '"e2"'})
+        await store.fetch()
+        store.invalidate()
+        result = await store.fetch()
+    assert result == {"sha": "s2", "text": "new\n"}
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_commit_writes_through_to_cache(store):
+    store.cache_ttl = 60
+    with aioresponses() as m:
+        sha = git_blob_sha(b"DOMAIN,b.com\n")
+        m.put(URL, payload={"content": {"sha": sha}, "commit": {"html_url": "https://example.com/c/1"}})
+        await store.commit("DOMAIN,b.com\n", "msg", None, None, base_sha="s1")
+        # Served from the write-through snapshot, no GET registered
+        result = await store.fetch()
+    assert result == {"sha": sha, "text": "DOMAIN,b.com\n"}
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_write_through_rejects_unexpected_sha(store):
+    store.cache_ttl = 60
+    with aioresponses() as m:
+        m.put(URL, payload={"content": {"sha": "s2"}, "commit": {}})
+        await store.commit("DOMAIN,b.com\n", "msg", None, None, base_sha="s1")
+        m.get(GET_URL, payload=_payload("DOMAIN,b.com\r\n", "s2"))
+        result = await store.fetch()
+    assert result == {"sha": "s2", "text": "DOMAIN,b.com\r\n"}
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_noop_commit_makes_no_request(store):
+    with aioresponses():
+        # No mock registered: any request would fail
+        resp = await store.commit("DOMAIN,a.com\n", "msg", None, None, base_sha=git_blob_sha(b"DOMAIN,a.com\n"))
+    assert resp == {"content": {"sha": git_blob_sha(b"DOMAIN,a.com\n")}, "commit": {}}
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_failed_commit_invalidates_cache(store):
+    store.cache_ttl = 60
+    with aioresponses() as m:
+        m.get(GET_URL, payload=_payload("old\n", "s1"))
+        await store.fetch()
+        m.put(URL, status=400, body="Bad Request")
+        with pytest.raises(Exception):
+            await store.commit("new\n", "msg", None, None, base_sha="s1")
+        m.get(GET_URL, payload=_payload("remote\n", "s3"))
+        result = await store.fetch()
+    assert result == {"sha": "s3", "text": "remote\n"}
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_concurrent_fetches_are_coalesced(store):
+    import asyncio
+    from bot.metrics import GITHUB_FETCH_COALESCED
+
+    before = GITHUB_FETCH_COALESCED._value.get()
+    with aioresponses() as m:
+        # Only one response registered: a second request would fail
+        m.get(GET_URL, payload=_payload("DOMAIN,a.com\n", "s1"))
+        results = await asyncio.gather(*(store.fetch() for _ in range(3)))
+
+    assert all(r == {"sha": "s1", "text": "DOMAIN,a.com\n"} for r in results)
+    assert GITHUB_FETCH_COALESCED._value.get() - before == 2
+    assert not store._inflight
@@ -0,0 +1,105 @@
+"""Atomic multi-file commits through createCommitOnBranch (against the fake server)."""
+import pytest
+
+from bot.services.github_store import GraphQLError, git_blob_sha
+from bot.services.rules_file import Rule, RuleOp, RuleType
+from bot.services.store import FileChange
+
+pytestmark = pytest.mark.integration
+
+PROXY = "rules/private.list"
+DIRECT = "rules/private.direct.list"
+GET = "GET /repos/o/r/contents/{path}"
+PUT = "PUT /repos/o/r/contents/{path}"
+
+
+@pytest.fixture
+def store(make_store):
+    return make_store(cache_ttl=60)
+
+
+async def _changes(store, proxy_text, direct_text):
+    fetched = await store.fetch_many([PROXY, DIRECT])
+    return [
+        FileChange(PROXY, proxy_text, fetched[PROXY]["sha"]),
+        FileChange(DIRECT, direct_text, fetched[DIRECT]["sha"]),
+    ]
+
+
+async def test_two_files_in_one_commit(fake, store):
+    commits = len(fake.commits)
+    changes = await _changes(store, "DOMAIN,a.com\nDOMAIN,b.com\n", "DOMAIN,d.com\nDOMAIN,e.com\n")
+    resp = await store.commit_many(changes, "Move rules", "alice", None)
+
+    assert len(fake.commits) == commits + 1
+    assert sorted(fake.commits[-1].paths) == [DIRECT, PROXY]
+    assert resp["commit"]["sha"] == fake.head()
+    assert resp["commit"]["html_url"].endswith(fake.head())
+    assert fake.read_file(DIRECT) == "DOMAIN,d.com\nDOMAIN,e.com\n"
+    assert resp["files"][PROXY]["sha"] == git_blob_sha(b"DOMAIN,a.com\nDOMAIN,b.com\n")
+    assert fake.requests[PUT] == 0
+
+    # Written through to the cache
+    gets = fake.requests[GET]
+    assert (await store.fetch(file_path=PROXY))["text"] == "DOMAIN,a.com\nDOMAIN,b.com\n"
+    assert fake.requests[GET] == gets
+
+
+async def test_moved_head_is_retried(fake, store, monkeypatch):
+    changes = await _changes(store, "DOMAIN,a.com\nDOMAIN,b.com\n", "DOMAIN,d.com\n")
+    original = store._head_and_blob_shas
+
+    async def racing(paths):
+        head, shas = await original(paths)
+        if len(fake.commits) == 2:
+            fake.put_file("README.md", "unrelated\n")  # someone pushes in between
+        return head, shas
+
+    monkeypatch.setattr(store, "_head_and_blob_shas", racing)
+    resp = await store.commit_many(changes, "Add rule", None, None)
+    assert resp["commit"]["sha"] == fake.head()
+    assert fake.read_file(PROXY) == "DOMAIN,a.com\nDOMAIN,b.com\n"
+    assert fake.read_file("README.md") == "unrelated\n"
+
+
+async def test_stale_head_gives_up_after_retries(fake, store, monkeypatch):
+    changes = await _changes(store, "DOMAIN,x.com\n", "DOMAIN,d.com\n")
+    original = store._head_and_blob_shas
+
+    async def always_racing(paths):
+        result = await original(paths)
+        fake.put_file("README.md", f"{len(fake.commits)}\n")
+        return result
+
+    monkeypatch.setattr(store, "_head_and_blob_shas", always_racing)
+    with pytest.raises(GraphQLError) as e:
+        await store.commit_many(changes, "Add rule", None, None, retry=1)
+    assert e.value.stale_head
+    assert fake.read_file(PROXY) == "DOMAIN,a.com\n"
+
+
+async def test_stale_file_is_rebased_with_ops(fake, store):
+    fetched = await store.fetch_many([PROXY, DIRECT])
+    fake.put_file(PROXY, "DOMAIN,a.com\nDOMAIN,other.com\n")
+    ops = [RuleOp("add", Rule(type=RuleType.DOMAIN, value="b.com", policy=None))]
+    changes = [
+        FileChange(PROXY, "DOMAIN,a.com\nDOMAIN,b.com\n", fetched[PROXY]["sha"], ops),
+        FileChange(DIRECT, "DOMAIN,d.com\nDOMAIN,e.com\n", fetched[DIRECT]["sha"], []),
+    ]
+    await store.commit_many(changes, "Add rules", None, None)
+    assert fake.read_file(PROXY) == "DOMAIN,a.com\nDOMAIN,other.com\n\nDOMAIN,b.com\n"
+    assert fake.read_file(DIRECT) == "DOMAIN,d.com\nDOMAIN,e.com\n"
+
+
+async def test_unchanged_files_make_no_commit(fake, store):
+    commits = len(fake.commits)
+    changes = await _changes(store, "DOMAIN,a.com\n", "DOMAIN,d.com\n")
+    resp = await store.commit_many(changes, "Nothing", None, None)
+    assert resp["commit"] == {}
+    assert resp["files"][PROXY]["sha"] == git_blob_sha(b"DOMAIN,a.com\n")
+    assert len(fake.commits) == commits
+
+    # Only the changed file is sent
+    changes = await _changes(store, "DOMAIN,a.com\n", "DOMAIN,z.com\n")
+    await store.commit_many(changes, "One file", None, None)
+    assert fake.commits[-1].paths == [DIRECT]
@@ -0,0 +1,61 @@
+"""Read-only degraded mode: circuit breaker around GitHubFileStore."""
+import pytest
+
+from bot.services.circuit_breaker import CLOSED, OPEN, CircuitOpen
+
+pytestmark = pytest.mark.integration
+
+PATH = "rules/private.list"
+
+
+@pytest.fixture
+def fake_files():
+    return {PATH: "DOMAIN,a.com\n"}
+
+
+@pytest.fixture
+def store_env():
+    return {"CIRCUIT_FAILURE_THRESHOLD": "3"}
+
+
+@pytest.fixture
+def store(make_store):
+    return make_store(cache_ttl=0)
+
+
+async def test_outage_opens_circuit_and_serves_stale(fake, store):
+    good = await store.fetch()
+    fake.error_rate = 1.0
+
+    stale = await store.fetch()  # three failed attempts open the circuit
+    assert store.breaker.state == OPEN
+    assert stale["text"] == good["text"]
+    assert stale["stale_since"] > 0
+
+    requests = sum(fake.requests.values())
+    assert (await store.fetch())["text"] == good["text"]
+    with pytest.raises(CircuitOpen):
+        await store.commit("DOMAIN,b.com\n", "m", None, None, good["sha"])
+    assert sum(fake.requests.values()) == requests  # nothing was sent
+
+
+async def test_probe_restores_normal_mode(fake, store):
+    await store.fetch()
+    fake.error_rate = 1.0
+    await store.fetch()
+    assert store.breaker.state == OPEN
+
+    fake.error_rate = 0.0
+    store.breaker.opened_at -= store.breaker.reset_timeout
+    fetched = await store.fetch()
+    assert "stale_since" not in fetched
+    assert store.breaker.state == CLOSED
+    resp = await store.commit("DOMAIN,b.com\n", "m", None, None, fetched["sha"])
+    assert resp["content"]["sha"]
+
+
+async def test_client_errors_keep_circuit_closed(fake, store):
+    for _ in range(5):
+        with pytest.raises(Exception):
+            await store.fetch(file_path="missing.list")
+    assert store.breaker.state == CLOSED
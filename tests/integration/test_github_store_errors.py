@@ -103,3 +103,103 @@ async def test_github_commit_400_no_retry(monkeypatch):
         m.put(url, status=400, body="Bad Request")
         with pytest.raises(aiohttp.ClientResponseError):
             await store.commit("text", "msg", None, None, base_sha="sha")
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_github_commit_409_rebases_rule_ops(monkeypatch):
+    """Test that a 409 replays rule operations on the fresh content instead of overwriting it."""
+    import base64
+    from aioresponses import CallbackResult
+    from bot.services.rules_file import Rule, RuleOp, RuleType
+
+    monkeypatch.setenv("BOT_TOKEN", "x")
+    monkeypatch.setenv("GITHUB_TOKEN", "t")
+    monkeypatch.setenv("GITHUB_OWNER", "o")
+    monkeypatch.setenv("GITHUB_REPO", "r")
+    monkeypatch.setenv("GITHUB_PATH_PROXY", "p.txt")
+    monkeypatch.setenv("GITHUB_BRANCH", "main")
+    settings = Settings()
+    store = GitHubFileStore(settings)
+
+    url = f"https://api.github.com/repos/{settings.github_owner}/{settings.github_repo}/contents/{settings.github_path_proxy}"
+    get_url = f"{url}?ref=main"
+    remote = "DOMAIN,a.com\nDOMAIN,other.com\n"
+    pushed = {}
+
+    def _capture(url, **kwargs):
+        pushed.update(kwargs["json"])
+        return CallbackResult(status=200, payload={"content": {"sha": "s3"}, "commit": {"html_url": "https://example.com/commit/1"}})
+
+    op = RuleOp("add", Rule(type=RuleType.DOMAIN, value="mine.com", policy=None), "# Added: mine")
+    with aioresponses() as m:
+        m.put(url, status=409)
+        m.get(get_url, payload={"content": base64.b64encode(remote.encode()).decode(), "sha": "s2"}, status=200)
+        m.put(url, callback=_capture)
+        await store.commit("DOMAIN,a.com\n# Added: mine\nDOMAIN,mine.com\n", "msg", None, None, base_sha="s1", ops=[op])
+
+    committed = base64.b64decode(pushed["content"]).decode()
+    assert pushed["sha"] == "s2"
+    assert committed == "DOMAIN,a.com\nDOMAIN,other.com\n# Added: mine\nDOMAIN,mine.com\n"
+    await store.close()
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_github_fetch_fails_fast_when_quota_exhausted(monkeypatch):
+    """Test that an exhausted quota raises RateLimitExceeded without further requests."""
+    import time
+    from bot.services.retry import RateLimitExceeded
+
+    monkeypatch.setenv("BOT_TOKEN", "x")
+    monkeypatch.setenv("GITHUB_TOKEN", "t")
+    monkeypatch.setenv("GITHUB_OWNER", "o")
+    monkeypatch.setenv("GITHUB_REPO", "r")
+    monkeypatch.setenv("GITHUB_PATH_PROXY", "p.txt")
+    monkeypatch.setenv("GITHUB_BRANCH", "main")
+    settings = Settings()
+    store = GitHubFileStore(settings)
+
+    url = f"https://api.github.com/repos/{settings.github_owner}/{settings.github_repo}/contents/{settings.github_path_proxy}"
+    reset = str(int(time.time()) + 900)
+
+    with aioresponses() as m:
+        m.get(f"{url}?ref=main", status=403, body="rate limited", headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset})
+        with pytest.raises(RateLimitExceeded):
+            await store.fetch()
+        # Next call is refused locally: no mock registered for it
+        with pytest.raises(RateLimitExceeded):
+            await store.fetch(file_path="other.txt")
+    await store.close()
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_github_commit_retries_are_capped_after_conflict(monkeypatch):
+    """Test that a nested retry that times out is not retried again by the outer attempt."""
+    import asyncio
+    from bot.services.retry import RetryPolicy
+
+    monkeypatch.setenv("BOT_TOKEN", "x")
+    monkeypatch.setenv("GITHUB_TOKEN", "t")
+    monkeypatch.setenv("GITHUB_OWNER", "o")
+    monkeypatch.setenv("GITHUB_REPO", "r")
+    monkeypatch.setenv("GITHUB_PATH_PROXY", "p.txt")
+    monkeypatch.setenv("GITHUB_BRANCH", "main")
+    settings = Settings()
+    store = GitHubFileStore(settings)
+    store.retry_policy = RetryPolicy(base_delay=0.001)
+
+    url = f"https://api.github.com/repos/{settings.github_owner}/{settings.github_repo}/contents/{settings.github_path_proxy}"
+    get_url = f"{url}?ref=main"
+
+    with aioresponses() as m:
+        m.put(url, status=409)
+        m.put(url, exception=asyncio.TimeoutError(), repeat=True)
+        m.get(get_url, payload={"content": "aGVsbG8=", "sha": "new_sha"}, status=200, repeat=True)
+        with pytest.raises(asyncio.TimeoutError):
+            await store.commit("text", "msg", None, None, base_sha="old_sha", retry=2)
+        puts = sum(len(calls) for (method, _), calls in m.requests.items() if method == "PUT")
+
+    assert puts == 3
+    await store.close()
@@ -0,0 +1,57 @@
+"""Batched multi-file reads through the GraphQL API (against the fake server)."""
+import pytest
+
+from bot.config import Settings
+from bot.services.github_store import GitHubFileStore
+
+pytestmark = pytest.mark.integration
+
+PROXY = "rules/private.list"
+DIRECT = "rules/private.direct.list"
+LOG = "url_check.log"
+GET = "GET /repos/o/r/contents/{path}"
+GRAPHQL = "POST /graphql"
+
+
+@pytest.fixture
+def fake_files():
+    return {PROXY: "DOMAIN,a.com\n", DIRECT: "DOMAIN,d.com\n", LOG: "ok\n"}
+
+
+@pytest.fixture
+def store(make_store):
+    return make_store(cache_ttl=60)
+
+
+async def test_one_request_populates_cache(fake, store):
+    result = await store.fetch_many([PROXY, DIRECT, LOG, "missing.txt"])
+    assert fake.requests[GRAPHQL] == 1
+    assert {p: r["text"] for p, r in result.items()} == {PROXY: "DOMAIN,a.com\n", DIRECT: "DOMAIN,d.com\n", LOG: "ok\n"}
+
+    # Same blob shas as the REST path, and later reads are cache hits
+    assert (await store.fetch(file_path=DIRECT))["sha"] == result[DIRECT]["sha"]
+    assert fake.requests[GET] == 0
+
+
+async def test_binary_files_fall_back_to_rest(fake, store):
+    fake.files[("main", LOG)] = b"\xff\xfe binary"
+    result = await store.fetch_many([PROXY, LOG])
+    assert PROXY in result
+    assert LOG not in result  # REST fetch of undecodable content fails too
+    assert fake.requests[GET] >= 1
+
+
+async def test_graphql_failure_falls_back_to_rest(fake, store):
+    fake.fail_next(502)
+    result = await store.fetch_many([PROXY, DIRECT])
+    assert set(result) == {PROXY, DIRECT}
+    assert fake.requests[GET] == 2
+
+
+def test_enterprise_graphql_url(monkeypatch):
+    monkeypatch.setenv("BOT_TOKEN", "x")
+    monkeypatch.setenv("GITHUB_TOKEN", "t")
+    monkeypatch.setenv("GITHUB_API_URL", "https://ghe.example.com/api/v3/")
+    assert GitHubFileStore(Settings()).graphql_url == "https://ghe.example.com/api/graphql"
+    monkeypatch.setenv("GITHUB_API_URL", "https://api.github.com")
+    assert GitHubFileStore(Settings()).graphql_url == "https://api.github.com/graphql"
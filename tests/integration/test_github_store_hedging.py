@@ -0,0 +1,62 @@
+"""Hedged reads: a slow first request is raced by a second one."""
+import time
+
+import pytest
+
+from bot.services.github_store import HEDGE_DEFAULT_DELAY, HEDGE_MIN_SAMPLES
+
+pytestmark = pytest.mark.integration
+
+PATH = "rules/private.list"
+GET = "GET /repos/o/r/contents/{path}"
+
+
+@pytest.fixture
+def fake_files():
+    return {PATH: "DOMAIN,a.com\n"}
+
+
+@pytest.fixture
+def store_env():
+    return {"GITHUB_HEDGE_QUANTILE": "0.9"}
+
+
+@pytest.fixture
+def store(make_store):
+    return make_store(cache_ttl=0)
+
+
+def test_hedge_delay_tracks_recent_latencies(store):
+    assert store.hedge_delay() == HEDGE_DEFAULT_DELAY
+    store._fetch_latencies.extend(i / 100 for i in range(1, HEDGE_MIN_SAMPLES * 5 + 1))
+    assert store.hedge_delay() == pytest.approx(0.91)
+
+
+async def test_slow_first_request_is_hedged(fake, store):
+    store._fetch_latencies.extend([0.01] * HEDGE_MIN_SAMPLES)
+    delays = iter([2.0])
+    fake.latency = lambda: next(delays, 0.0)
+
+    start = time.perf_counter()
+    fetched = await store.fetch()
+    assert time.perf_counter() - start < 1.0
+    assert fetched["text"] == "DOMAIN,a.com\n"
+    assert fake.requests[GET] == 2
+
+
+async def test_fast_requests_are_not_hedged(fake, store):
+    store._fetch_latencies.extend([0.5] * HEDGE_MIN_SAMPLES)
+    for _ in range(3):
+        await store.fetch()
+    assert fake.requests[GET] == 3
+
+
+async def test_hedge_failure_waits_for_primary(fake, store):
+    store._fetch_latencies.extend([0.01] * HEDGE_MIN_SAMPLES)
+    delays = iter([0.2])
+    fake.latency = lambda: next(delays, 0.0)
+    # Errors are injected after the latency, so the fast hedge gets the 404
+    fake.fail_next(404)
+    fetched = await store.fetch()
+    assert fetched["text"] == "DOMAIN,a.com\n"
+    assert fake.requests[GET] == 2
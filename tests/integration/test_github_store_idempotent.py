@@ -0,0 +1,65 @@
+"""Commit retries after a lost response do not commit twice (against the fake server)."""
+import pytest
+
+from bot.services.github_store import git_blob_sha
+from bot.services.rules_file import Rule, RuleOp, RuleType
+from bot.services.store import FileChange
+
+pytestmark = pytest.mark.integration
+
+PATH = "rules/private.list"
+DIRECT = "rules/private.direct.list"
+
+
+def test_git_blob_sha_matches_git():
+    # `printf 'hello\n' | git hash-object --stdin`
+    assert git_blob_sha(b"hello\n") == "ce013625030ba8dba906f756967f9e9ca394464a"
+    assert git_blob_sha(b"") == "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391"
+
+
+@pytest.mark.parametrize("ops", [None, [RuleOp("add", Rule(type=RuleType.DOMAIN, value="b.com", policy=None))]])
+async def test_lost_response_is_not_committed_twice(fake, store, ops):
+    fetched = await store.fetch()
+    commits = len(fake.commits)
+    fake.drop_next_response()
+    new_text = "DOMAIN,a.com\n\nDOMAIN,b.com\n"
+    resp = await store.commit(new_text, "Add rule: DOMAIN,b.com", None, None, fetched["sha"], ops=ops)
+
+    assert len(fake.commits) == commits + 1
+    assert resp["content"]["sha"] == git_blob_sha(new_text.encode())
+    # The commit that landed is still linked
+    assert resp["commit"]["html_url"].endswith(fake.commits[-1].sha)
+
+
+async def test_noop_commit_skips_network(fake, store):
+    fetched = await store.fetch()
+    requests = sum(fake.requests.values())
+    resp = await store.commit(fetched["text"], "Normalize", None, None, fetched["sha"])
+    assert resp == {"content": {"sha": fetched["sha"]}, "commit": {}}
+    assert sum(fake.requests.values()) == requests
+
+
+async def test_commit_many_lost_response_is_not_committed_twice(fake, store):
+    fetched = await store.fetch_many([PATH, DIRECT])
+    commits = len(fake.commits)
+    fake.drop_next_response()
+    ops = [RuleOp("add", Rule(type=RuleType.DOMAIN, value="b.com", policy=None))]
+    changes = [
+        FileChange(PATH, "DOMAIN,a.com\n\nDOMAIN,b.com\n", fetched[PATH]["sha"], ops),
+        FileChange(DIRECT, "DOMAIN,e.com\n", fetched[DIRECT]["sha"]),
+    ]
+    resp = await store.commit_many(changes, "Two files", None, None)
+    assert len(fake.commits) == commits + 1
+    assert resp["commit"] == {}
+    assert resp["files"][DIRECT]["sha"] == git_blob_sha(b"DOMAIN,e.com\n")
+    assert fake.read_file(PATH) == "DOMAIN,a.com\n\nDOMAIN,b.com\n"
+
+
+async def test_disk_snapshot_with_wrong_sha_is_ignored(fake, make_store, monkeypatch, tmp_path):
+    monkeypatch.setenv("CACHE_DIR", str(tmp_path))
+    store = make_store()
+    store.disk_cache.save(PATH, git_blob_sha(b"DOMAIN,a.com\n"), "DOMAIN,tampered.com\n", None)
+    await store.open()
+    assert (PATH, "main") not in store._cache
+    assert (await store.fetch())["text"] == "DOMAIN,a.com\n"
+    await store.close()
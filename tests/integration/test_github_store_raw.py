@@ -0,0 +1,53 @@
+"""Test raw media type fetch and Git Blobs fallback."""
+import pytest
+from aioresponses import aioresponses, CallbackResult
+
+from bot.services.github_store import GitHubFileStore, git_blob_sha
+from bot.config import Settings
+
+URL = "https://api.github.com/repos/o/r/contents/p.txt"
+GET_URL = f"{URL}?ref=main"
+
+
+@pytest.fixture
+async def store(github_env):
+    github_env(GITHUB_PATH_PROXY="p.txt")
+    store = GitHubFileStore(Settings())
+    yield store
+    await store.close()
+
+
+def test_git_blob_sha_matches_git():
+    # `printf 'hello\n' | git hash-object --stdin`
+    assert git_blob_sha(b"hello\n") == "ce013625030ba8dba906f756967f9e9ca394464a"
+    assert git_blob_sha(b"") == "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391"
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_fetch_requests_raw_and_computes_sha(store):
+    body = "DOMAIN,тест.рф\nDOMAIN,a.com\n".encode("utf-8")
+    seen = {}
+
+    def _raw(url, **kwargs):
+        seen["accept"] = kwargs["headers"]["Accept"]
+        return CallbackResult(status=200, body=body, content_type="application/vnd.github.raw")
+
+    with aioresponses() as m:
+        m.get(GET_URL, callback=_raw)
+        result = await store.fetch()
+
+    assert seen["accept"] == "application/vnd.github.raw+json"
+    assert result == {"sha": git_blob_sha(body), "text": body.decode("utf-8")}
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_fetch_falls_back_to_blobs_api_over_contents_limit(store):
+    big = b"DOMAIN,a.com\n" * 10
+    with aioresponses() as m:
+        m.get(GET_URL, payload={"sha": "bigsha", "encoding": "none", "content": "", "size": len(big)})
+        m.get("https://api.github.com/repos/o/r/git/blobs/bigsha", body=big, content_type="application/vnd.github.raw")
+        result = await store.fetch()
+
+    assert result == {"sha": "bigsha", "text": big.decode()}
@@ -0,0 +1,141 @@
+"""Staging-branch mode: edits go to staging, BranchPublisher promotes them (against the fake server)."""
+import asyncio
+
+import pytest
+
+from bot.services.publisher import BranchPublisher, PublishConflict
+
+pytestmark = pytest.mark.integration
+
+PROXY = "rules/private.list"
+DIRECT = "rules/private.direct.list"
+
+
+@pytest.fixture
+def store_env():
+    return {"STAGING_BRANCH": "staging"}
+
+
+@pytest.fixture
+def store(make_store):
+    return make_store(cache_ttl=0)
+
+
+async def _edit(store, path, line):
+    fetched = await store.fetch(file_path=path)
+    return await store.commit(fetched["text"] + line, f"Add rule: {line.strip()}", None, None, fetched["sha"], file_path=path)
+
+
+async def _staged(store):
+    publisher = BranchPublisher(store, "main")
+    await publisher.ensure_staging()
+    await _edit(store, PROXY, "DOMAIN,b.com\n")
+    await _edit(store, DIRECT, "DOMAIN,e.com\n")
+    return publisher
+
+
+async def test_edits_go_to_staging(fake, store):
+    main_head = fake.head("main")
+    await _staged(store)
+    assert fake.head("main") == main_head
+    assert fake.read_file(PROXY, branch="staging") == "DOMAIN,a.com\nDOMAIN,b.com\n"
+    assert fake.read_file(PROXY) == "DOMAIN,a.com\n"
+
+
+async def test_squash_publish_moves_main_once(fake, store):
+    publisher = await _staged(store)
+    main_head = fake.head("main")
+    result = await publisher.publish()
+
+    assert result["published"] == 2
+    published = fake.commits[-1] if fake.commits[-1].sha == fake.head("main") else None
+    assert published is not None and published.parents == [main_head]
+    assert published.message.splitlines() == [
+        "Publish 2 change(s) from staging",
+        "",
+        "- Add rule: DOMAIN,b.com",
+        "- Add rule: DOMAIN,e.com",
+    ]
+    assert result["commit"]["sha"] == fake.head("main")
+    assert fake.read_file(PROXY) == "DOMAIN,a.com\nDOMAIN,b.com\n"
+    assert fake.read_file(DIRECT) == "DOMAIN,d.com\nDOMAIN,e.com\n"
+    # Staging restarts from the published commit
+    assert fake.head("staging") == fake.head("main")
+    assert (await publisher.publish())["published"] == 0
+
+    await _edit(store, PROXY, "DOMAIN,c.com\n")
+    assert (await publisher.publish())["published"] == 1
+    assert fake.read_file(PROXY) == "DOMAIN,a.com\nDOMAIN,b.com\nDOMAIN,c.com\n"
+
+
+async def test_fast_forward_publish(fake, store):
+    publisher = await _staged(store)
+    publisher.mode = "ff"
+    staged = fake.head("staging")
+    result = await publisher.publish()
+    assert result == {"published": 2, "commit": {"sha": staged, "html_url": fake._html_url(staged)}}
+    assert fake.head("main") == staged
+
+
+async def test_direct_edits_to_main_are_kept(fake, store):
+    publisher = await _staged(store)
+    fake.put_file("README.md", "manual edit\n")
+    await publisher.publish()
+    assert fake.read_file("README.md") == "manual edit\n"
+    assert fake.read_file(PROXY) == "DOMAIN,a.com\nDOMAIN,b.com\n"
+    assert (await store.fetch(file_path=PROXY))["text"] == "DOMAIN,a.com\nDOMAIN,b.com\n"
+
+
+async def test_conflicting_main_edit_is_not_published(fake, store):
+    publisher = await _staged(store)
+    fake.put_file(PROXY, "DOMAIN,other.com\n")
+    main_head = fake.head("main")
+    with pytest.raises(PublishConflict):
+        await publisher.publish()
+    assert fake.head("main") == main_head
+
+
+async def test_edits_during_publish_are_replayed_onto_the_published_commit(fake, store):
+    publisher = await _staged(store)
+    reset = publisher._reset_staging
+
+    async def edit_then_reset(staged_head, published):
+        await _edit(store, PROXY, "DOMAIN,late.com\n")
+        await reset(staged_head, published)
+
+    publisher._reset_staging = edit_then_reset
+    await publisher.publish()
+
+    staged = fake._commit(fake.head("staging"))
+    assert staged.parents == [fake.head("main")]
+    assert staged.message == "Add rule: DOMAIN,late.com"
+    assert fake.read_file(PROXY, branch="staging") == "DOMAIN,a.com\nDOMAIN,b.com\nDOMAIN,late.com\n"
+    del publisher._reset_staging
+    assert (await publisher.publish())["published"] == 1
+
+
+async def test_publish_creates_staging_that_was_missing_at_start(fake, store):
+    publisher = BranchPublisher(store, "main")
+    assert "staging" not in fake.refs
+    assert (await publisher.publish())["published"] == 0
+    assert fake.head("staging") == fake.head("main")
+
+
+async def test_commit_racing_the_staging_reset_is_not_overwritten(fake, store):
+    publisher = await _staged(store)
+    api_request = store.api_request
+    racing = []
+
+    async def commit_before_forcing(method, path, *args, **kwargs):
+        if method == "PATCH" and path == "git/refs/heads/staging" and not racing:
+            # An edit arrives after the reset read the staging ref, before it is forced
+            racing.append(asyncio.create_task(_edit(store, PROXY, "DOMAIN,race.com\n")))
+            await asyncio.sleep(0.05)
+        return await api_request(method, path, *args, **kwargs)
+
+    store.api_request = commit_before_forcing
+    await publisher.publish()
+    await racing[0]
+
+    assert fake._commit(fake.head("staging")).parents == [fake.head("main")]
+    assert fake.read_file(PROXY, branch="staging") == "DOMAIN,a.com\nDOMAIN,b.com\nDOMAIN,race.com\n"
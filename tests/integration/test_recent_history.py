@@ -0,0 +1,75 @@
+"""/recent history: both rules files, ETag revalidation, cached commit details and paging."""
+import pytest
+
+from bot.testing.fake_github import FakeGitHub
+
+pytestmark = pytest.mark.integration
+
+PROXY = "rules/private.list"
+DIRECT = "rules/private.direct.list"
+LIST = "GET /repos/o/r/commits"
+DETAIL = "GET /repos/o/r/commits/{sha}"
+
+
+@pytest.fixture
+async def fake():
+    fake = FakeGitHub()
+    fake.put_file(PROXY, "DOMAIN,a.com\n", message="seed proxy")
+    fake.put_file(DIRECT, "DOMAIN,d.com\n", message="seed direct")
+    fake.put_file(PROXY, "DOMAIN,a.com\nDOMAIN,b.com\n", message="add b")
+    fake.put_file(DIRECT, "DOMAIN,e.com\n", message="swap d for e")
+    await fake.start()
+    yield fake
+    await fake.close()
+
+
+async def test_history_covers_both_files_with_rule_diffs(store):
+    commits = await store.get_recent_commits(limit=5)
+    assert [c["commit"]["message"] for c in commits] == ["swap d for e", "add b", "seed direct", "seed proxy"]
+    assert commits[0]["files"] == [DIRECT]
+    assert commits[0]["rules"] == {"added": ["DOMAIN,e.com"], "removed": ["DOMAIN,d.com"]}
+    assert commits[1]["rules"] == {"added": ["DOMAIN,b.com"], "removed": []}
+
+
+async def test_repeat_listing_revalidates_and_reuses_details(store, fake):
+    await store.get_recent_commits(limit=5)
+    remaining = fake.rate_limit
+    commits = await store.get_recent_commits(limit=5)
+    # Both listings answered 304, no commit detail fetched again
+    assert len(commits) == 4
+    assert fake.rate_limit == remaining
+    assert fake.requests[LIST] == 4
+    assert fake.requests[DETAIL] == 4
+
+
+async def test_new_commit_shows_up_after_revalidation(store, fake):
+    await store.get_recent_commits(limit=5)
+    fake.put_file(PROXY, "DOMAIN,b.com\n", message="drop a")
+    commits = await store.get_recent_commits(limit=5)
+    assert commits[0]["commit"]["message"] == "drop a"
+    assert commits[0]["rules"] == {"added": [], "removed": ["DOMAIN,a.com"]}
+    assert fake.requests[DETAIL] == 5
+
+
+async def test_pages_through_older_history(store):
+    first = await store.get_recent_commits(limit=3, page=1)
+    second = await store.get_recent_commits(limit=3, page=2)
+    assert [c["commit"]["message"] for c in first] == ["swap d for e", "add b", "seed direct"]
+    assert [c["commit"]["message"] for c in second] == ["seed proxy"]
+    assert await store.get_recent_commits(limit=3, page=3) == []
+
+
+async def test_listing_errors_are_raised(store, fake):
+    fake.fail_next(404, count=2)
+    with pytest.raises(Exception):
+        await store.get_recent_commits(limit=5)
+
+
+async def test_history_goes_past_one_listing_page(store, fake):
+    for i in range(110):
+        fake.put_file(PROXY, f"DOMAIN,n{i}.com\n", message=f"edit {i}")
+    # 114 commits: the last pages need the second listing page of the proxy file
+    commits = await store.get_recent_commits(limit=5, page=23)
+    assert [c["commit"]["message"] for c in commits] == ["swap d for e", "add b", "seed direct", "seed proxy"]
+    assert [c["commit"]["message"] for c in await store.get_recent_commits(limit=5, page=22)] == [f"edit {i}" for i in range(4, -1, -1)]
+    assert await store.get_recent_commits(limit=5, page=24) == []
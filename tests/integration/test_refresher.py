@@ -0,0 +1,108 @@
+"""Startup warm-up and periodic revalidation of the cached snapshots."""
+import asyncio
+import math
+
+import pytest
+from prometheus_client import REGISTRY
+
+from bot.services.refresher import SnapshotRefresher
+from bot.services.rules_file import parse_snapshot
+
+pytestmark = pytest.mark.integration
+
+PROXY = "rules/private.list"
+DIRECT = "rules/private.direct.list"
+LOG = "url_check.log"
+GET = "GET /repos/o/r/contents/{path}"
+
+
+@pytest.fixture
+def fake_files():
+    return {PROXY: "DOMAIN,a.com\n", DIRECT: "DOMAIN,d.com\n", LOG: "ok\n"}
+
+
+@pytest.fixture
+def store(make_store):
+    return make_store(cache_ttl=3600)
+
+
+def _age(path):
+    return REGISTRY.get_sample_value("rules_snapshot_age_seconds", {"path": path})
+
+
+async def test_warm_up_serves_reads_from_cache(fake, store):
+    refresher = SnapshotRefresher(store, [PROXY, DIRECT, LOG], interval=0)
+    refresher.start()
+    await refresher._task
+    # One batched GraphQL read instead of three REST calls
+    assert fake.requests["POST /graphql"] == 1
+    assert fake.requests[GET] == 0
+
+    assert (await store.fetch(file_path=PROXY))["text"] == "DOMAIN,a.com\n"
+    assert (await store.fetch(file_path=LOG))["text"] == "ok\n"
+    assert fake.requests[GET] == 0
+    assert 0 <= _age(PROXY) < 5
+    await refresher.stop()
+
+
+async def test_periodic_refresh_uses_conditional_requests(fake, store):
+    refresher = SnapshotRefresher(store, [PROXY], interval=0.05)
+    refresher.start()
+    # GraphQL warm-up carries no ETag, so the first revalidation downloads the file
+    await asyncio.sleep(0.08)
+    rate_limit = fake.rate_limit
+
+    await asyncio.sleep(0.12)
+    assert fake.requests[GET] >= 3
+    # Unchanged file: every revalidation was a 304, not charged against the quota
+    assert fake.rate_limit == rate_limit
+
+    fake.put_file(PROXY, "DOMAIN,b.com\n")
+    await asyncio.sleep(0.1)
+    await refresher.stop()
+    assert (await store.fetch(file_path=PROXY))["text"] == "DOMAIN,b.com\n"
+
+
+async def test_refreshed_paths_are_read_from_memory_past_the_cache_ttl(fake, store):
+    store.cache_ttl = 5
+    refresher = SnapshotRefresher(store, [PROXY], interval=60)
+    refresher.start()
+    while (PROXY, "main") not in store._cache:  # warm-up; the first refresh is 60s away
+        await asyncio.sleep(0.01)
+    await store.fetch(file_path=DIRECT)
+    requests = sum(fake.requests.values())
+
+    def age(path, seconds):
+        store._cache[(path, "main")].checked_at -= seconds
+
+    age(PROXY, 30)  # past cache_ttl, within the refresh interval
+    assert (await store.fetch(file_path=PROXY))["text"] == "DOMAIN,a.com\n"
+    assert sum(fake.requests.values()) == requests
+    # A path nobody refreshes still revalidates after cache_ttl, and so does a stalled refresher's
+    age(DIRECT, 30)
+    await store.fetch(file_path=DIRECT)
+    age(PROXY, 60)
+    await store.fetch(file_path=PROXY)
+    assert sum(fake.requests.values()) == requests + 2
+    await refresher.stop()
+
+
+async def test_failed_refresh_does_not_stop_the_loop(fake, store):
+    refresher = SnapshotRefresher(store, [PROXY, "missing.log"], interval=0)
+    store.retry_policy = type(store.retry_policy)(base_delay=0.001)
+    refresher.start()
+    await refresher._task
+    assert (PROXY, "main") in store._cache
+    assert math.isnan(_age("missing.log"))
+    await refresher.stop()
+
+
+def test_parse_snapshot_reuses_parse_for_same_sha():
+    fetched = {"sha": "s-reuse", "text": "DOMAIN,a.com\n# c\n"}
+    first = parse_snapshot(fetched)
+    second = parse_snapshot(dict(fetched))
+    assert first == second and first is not second
+    assert first[0] is second[0]
+    # Same sha with different text (e.g. mocked stores) is parsed again
+    other = parse_snapshot({"sha": "s-reuse", "text": "DOMAIN,b.com\n"})
+    assert other[0].rule.value == "b.com"
@@ -0,0 +1,142 @@
+"""Push webhook: signed payloads posted to a local server invalidate the store cache."""
+import asyncio
+import json
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from bot.services.webhook import WEBHOOK_PATH, PushWebhook, sign, touched_paths, verify_signature
+
+pytestmark = pytest.mark.integration
+
+SECRET = "s3cret"
+PROXY = "rules/private.list"
+DIRECT = "rules/private.direct.list"
+LOG = "url_check.log"
+GET = "GET /repos/o/r/contents/{path}"
+
+
+def push_payload(*modified: str, ref: str = "refs/heads/main") -> dict:
+    return {
+        "ref": ref,
+        "after": "abcdef1234567890",
+        "commits": [{"id": "abcdef1", "added": [], "modified": list(modified), "removed": []}],
+    }
+
+
+@pytest.fixture
+def fake_files():
+    return {PROXY: "DOMAIN,a.com\n", DIRECT: "DOMAIN,d.com\n", LOG: "ok\n"}
+
+
+@pytest.fixture
+def store(make_store):
+    return make_store(cache_ttl=3600)
+
+
+@pytest.fixture
+async def client(store):
+    webhook = PushWebhook(store, SECRET, "main", [PROXY, DIRECT, LOG])
+    client = TestClient(TestServer(webhook.app()))
+    await client.start_server()
+    yield client
+    await client.close()
+    await webhook.close()
+
+
+async def post(client, payload, event="push", secret=SECRET):
+    body = json.dumps(payload).encode("utf-8")
+    headers = {"X-GitHub-Event": event, "X-Hub-Signature-256": sign(secret, body), "Content-Type": "application/json"}
+    return await client.post(WEBHOOK_PATH, data=body, headers=headers)
+
+
+def test_verify_signature():
+    body = b'{"zen": "hi"}'
+    assert verify_signature(SECRET, body, sign(SECRET, body))
+    assert not verify_signature(SECRET, body, sign("other", body))
+    assert not verify_signature(SECRET, body, None)
+    assert not verify_signature("", body, sign("", body))
+
+
+def test_touched_paths():
+    payload = {"commits": [{"added": ["a"], "modified": ["b"], "removed": []}, {"added": [], "modified": [], "removed": ["c"]}]}
+    assert touched_paths(payload) == {"a", "b", "c"}
+    assert touched_paths({"commits": []}) is None
+    assert touched_paths({"commits": [{"id": "x"}]}) is None
+
+
+async def test_push_invalidates_and_refreshes(fake, store, client):
+    assert (await store.fetch(file_path=PROXY))["text"] == "DOMAIN,a.com\n"
+    fake.put_file(PROXY, "DOMAIN,b.com\n")
+    # Served from cache until GitHub tells us otherwise
+    assert (await store.fetch(file_path=PROXY))["text"] == "DOMAIN,a.com\n"
+
+    resp = await post(client, push_payload(PROXY))
+    assert resp.status == 200
+    assert await resp.json() == {"invalidated": [PROXY]}
+    await asyncio.sleep(0.05)  # background refresh
+
+    gets = fake.requests["GET /repos/o/r/contents/{path}"]
+    assert (await store.fetch(file_path=PROXY))["text"] == "DOMAIN,b.com\n"
+    assert fake.requests["GET /repos/o/r/contents/{path}"] == gets
+
+
+async def test_untracked_paths_and_other_branches_ignored(store, client):
+    await store.fetch(file_path=PROXY)
+    resp = await post(client, push_payload("README.md"))
+    assert await resp.json() == {"invalidated": []}
+    resp = await post(client, push_payload(PROXY, ref="refs/heads/dev"))
+    assert resp.status == 202
+    assert (PROXY, "main") in store._cache
+
+
+async def test_push_without_file_lists_invalidates_all(store, client):
+    await store.fetch(file_path=PROXY)
+    await store.fetch(file_path=DIRECT)
+    resp = await post(client, {"ref": "refs/heads/main", "forced": True, "commits": []})
+    assert await resp.json() == {"invalidated": [DIRECT, PROXY, LOG]}
+
+
+async def test_push_to_url_check_log_refreshes_it(fake, store, client):
+    await store.fetch(file_path=LOG)
+    fake.put_file(LOG, "failed\n")
+    resp = await post(client, push_payload(LOG, "README.md"))
+    assert await resp.json() == {"invalidated": [LOG]}
+    await asyncio.sleep(0.05)  # background refresh
+    assert (await store.fetch(file_path=LOG))["text"] == "failed\n"
+
+
+async def test_bad_signature_rejected(store, client):
+    await store.fetch(file_path=PROXY)
+    resp = await post(client, push_payload(PROXY), secret="wrong")
+    assert resp.status == 401
+    assert (PROXY, "main") in store._cache
+
+
+async def test_ping(client):
+    resp = await post(client, {"zen": "Keep it logically awesome."}, event="ping")
+    assert resp.status == 200
+    assert await resp.text() == "pong"
+
+
+async def test_push_during_a_fetch_is_not_undone_by_it(fake, store):
+    webhook = PushWebhook(store, SECRET, "main", [PROXY, DIRECT, LOG])
+    update = store.rate_limit.update
+    pushed = []
+
+    def push_while_answering(headers):
+        # GitHub answered with the old content; the push lands before the store caches it
+        update(headers)
+        if not pushed:
+            pushed.append(PROXY)
+            fake.put_file(PROXY, "DOMAIN,b.com\n")
+            webhook.apply_push(push_payload(PROXY))
+
+    store.rate_limit.update = push_while_answering
+    assert (await store.fetch(file_path=PROXY))["text"] == "DOMAIN,a.com\n"
+    await asyncio.gather(*webhook._tasks)
+
+    gets = fake.requests[GET]
+    assert (await store.fetch(file_path=PROXY))["text"] == "DOMAIN,b.com\n"
+    assert fake.requests[GET] == gets  # the refresh after the push is what is cached
+    await webhook.close()
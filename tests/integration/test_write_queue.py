@@ -0,0 +1,132 @@
+"""Write-behind queue: edits within the window become one commit (against the fake server)."""
+import asyncio
+import datetime as dt
+
+import pytest
+from aiogram.types import CallbackQuery, Chat, Message, User
+
+from bot.handlers.add_rule import on_confirm
+from bot.services.circuit_breaker import CircuitOpen
+from bot.services.rules_file import Rule, RuleOp, RuleType, RulesDocument
+from bot.services.write_queue import WriteBehindQueue
+
+pytestmark = pytest.mark.integration
+
+PROXY = "rules/private.list"
+DIRECT = "rules/private.direct.list"
+
+
+def _add(value):
+    return [RuleOp("add", Rule(type=RuleType.DOMAIN, value=value, policy=None))]
+
+
+def _recorder(results):
+    async def notify(resp, error):
+        results.append((resp, error))
+    return notify
+
+
+async def test_edits_in_window_make_one_commit(fake, store):
+    queue = WriteBehindQueue(store, window=0.05)
+    results = []
+    commits = len(fake.commits)
+    queue.submit(PROXY, _add("b.com"), "Add rule: DOMAIN,b.com", "alice", _recorder(results))
+    queue.submit(PROXY, _add("c.com"), "Add rule: DOMAIN,c.com", "alice", _recorder(results))
+    queue.submit(DIRECT, _add("e.com"), "Add rule: DOMAIN,e.com", "bob", _recorder(results))
+    assert queue.pending() == 3 and queue.pending(PROXY) == 2
+    await asyncio.sleep(0.2)
+
+    assert len(fake.commits) == commits + 1
+    commit = fake.commits[-1]
+    assert sorted(commit.paths) == [DIRECT, PROXY]
+    assert commit.message.startswith("Batch: 3 rule changes\n\n")
+    assert "- Add rule: DOMAIN,c.com" in commit.message
+    assert fake.read_file(PROXY) == "DOMAIN,a.com\n\nDOMAIN,b.com\n\nDOMAIN,c.com\n"
+    assert fake.read_file(DIRECT) == "DOMAIN,d.com\n\nDOMAIN,e.com\n"
+    assert [error for _, error in results] == [None] * 3
+    assert results[0][0]["commit"]["html_url"].endswith(commit.sha)
+    assert queue.pending() == 0
+
+
+async def test_close_flushes_without_waiting(fake, store):
+    queue = WriteBehindQueue(store, window=60)
+    queue.submit(PROXY, _add("b.com"), "Add rule: DOMAIN,b.com")
+    await asyncio.wait_for(queue.close(), timeout=5)
+    assert fake.commits[-1].message == "Add rule: DOMAIN,b.com"
+    assert "DOMAIN,b.com" in fake.read_file(PROXY)
+
+
+async def test_failed_flush_is_reported(fake, store):
+    queue = WriteBehindQueue(store, window=60)
+    results = []
+    queue.submit(PROXY, _add("b.com"), "Add rule: DOMAIN,b.com", notify=_recorder(results))
+    fake.error_rate = 1.0
+    fake.error_status = 404
+    await queue.flush()
+    assert results[0][0] is None and results[0][1] is not None
+    assert fake.read_file(PROXY) == "DOMAIN,a.com\n"
+
+
+class _State:
+    async def get_data(self):
+        return {"rule_type": "DOMAIN", "value": "b.com", "policy": "PROXY"}
+
+    async def clear(self):
+        pass
+
+
+def _confirm_callback(monkeypatch):
+    """add:confirm:add callback whose edited and sent texts are recorded."""
+    m = Message(message_id=1, date=dt.datetime.now(dt.timezone.utc), chat=Chat(id=1, type="private"))
+    cq = CallbackQuery(id="1", from_user=User(id=1, is_bot=False, first_name="U", username="alice"), chat_instance="ci", data="add:confirm:add", message=m)
+    edited, answered = [], []
+
+    async def m_edit(self, text, **kwargs):
+        edited.append(text)
+
+    async def m_answer(self, text, **kwargs):
+        answered.append((text, kwargs.get("reply_markup")))
+
+    async def cq_answer(self, *args, **kwargs):
+        return None
+
+    monkeypatch.setattr(Message, "edit_text", m_edit)
+    monkeypatch.setattr(Message, "answer", m_answer)
+    monkeypatch.setattr(CallbackQuery, "answer", cq_answer)
+    return cq, edited, answered
+
+
+async def test_add_handler_confirms_before_commit(fake, store, monkeypatch):
+    queue = WriteBehindQueue(store, window=60)
+    cq, edited, answered = _confirm_callback(monkeypatch)
+
+    renders = []
+    render = RulesDocument.render
+    monkeypatch.setattr(RulesDocument, "render", lambda self: renders.append(1) or render(self))
+
+    commits = len(fake.commits)
+    await on_confirm(cq, _State(), store, writer=queue)
+    assert "Правило добавлено" in edited[-1] and "60 с" in edited[-1]
+    assert len(fake.commits) == commits
+    assert renders == []  # the flush renders once for the whole batch
+
+    await queue.close()
+    assert len(fake.commits) == commits + 1
+    text, markup = answered[-1]
+    assert "Сохранено в GitHub" in text
+    assert markup.inline_keyboard[0][0].url.endswith(fake.commits[-1].sha)
+
+
+async def test_open_circuit_refuses_queued_edits(fake, store, monkeypatch):
+    queue = WriteBehindQueue(store, window=60)
+    cq, edited, _ = _confirm_callback(monkeypatch)
+    await store.fetch()
+    for _ in range(store.breaker.failure_threshold):
+        store.breaker.record_failure()
+
+    with pytest.raises(CircuitOpen):
+        queue.submit(PROXY, _add("c.com"), "Add rule: DOMAIN,c.com")
+    await on_confirm(cq, _State(), store, writer=queue)
+
+    assert "GitHub недоступен" in edited[-1]
+    assert queue.pending() == 0
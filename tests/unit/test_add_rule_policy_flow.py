@@ -46,7 +46,7 @@ class MockStoreWithPolicy:
         return {"text": self.text, "sha": self.sha}
     
     async def commit(self, new_text: str, message: str, author_name: str | None, 
-                    author_email: str | None, base_sha: str, file_path: str = None):
+                    author_email: str | None, base_sha: str, file_path: str = None, ops=None):
         return {"commit": {"html_url": "https://github.com/test/commit/123"}}
     
     @staticmethod
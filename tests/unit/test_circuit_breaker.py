@@ -0,0 +1,82 @@
+import time
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from bot.handlers.view_config import stats_command
+from bot.services import circuit_breaker
+from bot.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "time", lambda: now[0])
+    return now
+
+
+def test_opens_after_threshold_and_rejects(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_success()  # resets the consecutive count
+    for _ in range(3):
+        breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpen) as exc:
+        breaker.allow()
+    assert exc.value.retry_at == 1030.0
+
+
+def test_half_open_probe_closes_or_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 31
+    breaker.allow()  # the probe
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.allow()  # only one probe at a time
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock[0] += 31
+    breaker.allow()
+    breaker.record(200)
+    assert breaker.state == CLOSED
+    breaker.allow()
+
+
+def test_check_refuses_while_open_without_taking_the_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.check()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+    clock[0] += 31
+    breaker.check()
+    assert breaker.state == OPEN
+    breaker.allow()  # the probe slot is still free
+    assert breaker.state == HALF_OPEN
+
+
+def test_client_errors_do_not_count(clock):
+    breaker = CircuitBreaker(failure_threshold=1)
+    breaker.record(404)
+    breaker.record(409)
+    assert breaker.state == CLOSED
+    breaker.record(502)
+    assert breaker.state == OPEN
+
+
+@pytest.mark.asyncio
+async def test_stats_shows_stale_banner():
+    store = AsyncMock()
+    store.fetch.return_value = {"text": "DOMAIN,a.com\n", "sha": "abc", "stale_since": time.time() - 600}
+    m = MagicMock()
+    m.answer = AsyncMock()
+
+    await stats_command(m, store)
+
+    text = m.answer.call_args[0][0]
+    assert text.startswith("⚠️ GitHub недоступен")
+    assert "Всего: 1" in text
@@ -0,0 +1,51 @@
+"""Test shared aiohttp session lifecycle in GitHubFileStore."""
+import base64
+import pytest
+from aioresponses import aioresponses
+
+from bot.services.github_store import GitHubFileStore
+from bot.config import Settings
+from bot.metrics import GITHUB_CONNECTIONS
+
+
+@pytest.fixture
+def settings(github_env):
+    github_env(GITHUB_PATH_PROXY="p.txt")
+    return Settings()
+
+
+@pytest.mark.asyncio
+async def test_session_reused_between_calls(settings):
+    store = GitHubFileStore(settings)
+    await store.open()
+    session = store._session
+    url = "https://api.github.com/repos/o/r/contents/p.txt?ref=main"
+    content = base64.b64encode(b"DOMAIN,a.com\n").decode("ascii")
+
+    with aioresponses() as m:
+        m.get(url, payload={"content": content, "sha": "s1"}, status=200)
+        m.get(url, payload={"content": content, "sha": "s1"}, status=200)
+        await store.fetch()
+        await store.fetch()
+
+    assert store._session is session
+    assert not session.closed
+    await store.close()
+    assert session.closed
+    assert store._session is None
+
+
+@pytest.mark.asyncio
+async def test_session_opened_lazily_and_open_is_idempotent(settings):
+    store = GitHubFileStore(settings)
+    assert store._session is None
+    session = await store._get_session()
+    await store.open()
+    assert store._session is session
+    await store.close()
+    await store.close()  # closing twice is harmless
+
+
+def test_connections_metric_has_state_label():
+    GITHUB_CONNECTIONS.labels(state="new").inc()
+    GITHUB_CONNECTIONS.labels(state="reused").inc()
@@ -0,0 +1,62 @@
+"""LineRope: persistent sequence behaves like a list and shares unedited nodes."""
+import random
+
+import pytest
+
+from bot.services import line_rope
+from bot.services.line_rope import LineRope
+
+
+def _leaf_ids(rope):
+    return {id(items) for items in line_rope._leaves(rope._root)}
+
+
+def test_behaves_like_list_under_random_edits():
+    rnd = random.Random(3)
+    model = list(range(3000))
+    rope = LineRope(model)
+    versions = [(rope, list(model))]
+    for n in range(2000):
+        op = rnd.random()
+        if op < 0.4 and model:
+            i = rnd.randrange(len(model))
+            model.pop(i)
+            rope = rope.delete(i)
+        elif op < 0.8:
+            i = rnd.randrange(len(model) + 1)
+            model.insert(i, -n)
+            rope = rope.insert(i, -n)
+        elif model:
+            i = rnd.randrange(len(model))
+            model[i] = f"s{n}"
+            rope = rope.set(i, f"s{n}")
+        if n % 250 == 0:
+            versions.append((rope, list(model)))
+    assert list(rope) == model
+    assert len(rope) == len(model)
+    assert [rope[i] for i in range(0, len(model), 37)] == model[::37]
+    # Every older version is untouched
+    for old, expected in versions:
+        assert old == expected
+
+
+def test_edit_copies_only_one_path():
+    rope = LineRope(range(100_000))
+    edited = rope.set(50_000, "x")
+    assert rope[50_000] == 50_000 and edited[50_000] == "x"
+    # One new leaf, every other leaf shared
+    assert len(_leaf_ids(edited) - _leaf_ids(rope)) == 1
+
+
+def test_indexing_and_equality():
+    rope = LineRope("abc")
+    assert rope[-1] == "c"
+    assert rope[1:] == ["b", "c"]
+    assert rope == ["a", "b", "c"] and ["a", "b", "c"] == rope
+    assert rope.share() == rope and rope.share() is not rope
+    assert LineRope().append("a") == ["a"]
+    assert LineRope("a").delete(0) == []
+    with pytest.raises(IndexError):
+        rope[3]
+    with pytest.raises(IndexError):
+        rope.insert(5, "z")
@@ -54,8 +54,8 @@ async def test_delete_shows_loading():
 @pytest.mark.asyncio
 async def test_normalize_shows_loading():
     store = AsyncMock()
-    store.fetch.return_value = {"text": "DOMAIN,google.com,DIRECT", "sha": "abc123"}
-    store.commit.return_value = {"commit": {"html_url": "https://github.com"}}
+    store.fetch_many.return_value = {"rules/private.list": {"text": "DOMAIN,google.com,DIRECT", "sha": "abc123"}}
+    store.commit_many.return_value = {"commit": {"html_url": "https://github.com"}}
     
     m = MagicMock()
     m.from_user = MagicMock()
@@ -11,7 +11,7 @@ class FailingStore(GitHubFileStore):
     def __init__(self):
         pass
 
-    async def fetch(self):
+    async def fetch_many(self, file_paths):
         raise Exception("Network error")
 
 
@@ -45,10 +45,13 @@ class CommitFailStore(GitHubFileStore):
     def __init__(self):
         pass
 
-    async def fetch(self):
-        return {"sha": "abc", "text": "DOMAIN,test.com,PROXY\n"}
+    path_proxy = "rules/private.list"
+    path_direct = "rules/private.direct.list"
 
-    async def commit(self, *args, **kwargs):
+    async def fetch_many(self, file_paths):
+        return {self.path_proxy: {"sha": "abc", "text": "DOMAIN,test.com,PROXY\n"}}
+
+    async def commit_many(self, *args, **kwargs):
         raise Exception("Commit failed")
 
 
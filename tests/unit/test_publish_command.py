@@ -0,0 +1,44 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from bot.handlers.publish import publish_command
+from bot.services.publisher import PublishConflict
+
+
+def _message():
+    m = MagicMock()
+    loading = MagicMock()
+    loading.edit_text = AsyncMock()
+    m.answer = AsyncMock(return_value=loading)
+    return m, loading
+
+
+@pytest.mark.asyncio
+async def test_publish_without_staging_mode():
+    m, _ = _message()
+    await publish_command(m, None)
+    assert "staging" in m.answer.call_args[0][0]
+
+
+@pytest.mark.asyncio
+async def test_publish_reports_count_and_link():
+    m, loading = _message()
+    publisher = MagicMock()
+    publisher.publish = AsyncMock(return_value={"published": 3, "commit": {"sha": "abc", "html_url": "https://example.com/c/abc"}})
+    await publish_command(m, publisher)
+    text = loading.edit_text.call_args[0][0]
+    assert "3" in text
+    assert loading.edit_text.call_args[1]["reply_markup"].inline_keyboard[0][0].url == "https://example.com/c/abc"
+
+
+@pytest.mark.asyncio
+async def test_publish_nothing_and_conflict():
+    m, loading = _message()
+    publisher = MagicMock(target="main", staging="staging")
+    publisher.publish = AsyncMock(return_value={"published": 0, "commit": {}})
+    await publish_command(m, publisher)
+    assert "Нечего публиковать" in loading.edit_text.call_args[0][0]
+
+    publisher.publish = AsyncMock(side_effect=PublishConflict("main conflicts with staging"))
+    await publish_command(m, publisher)
+    assert "конфликт" in loading.edit_text.call_args[0][0]
@@ -1,6 +1,6 @@
 import pytest
 from unittest.mock import AsyncMock, MagicMock
-from bot.handlers.view_config import recent_command
+from bot.handlers.view_config import on_recent_pager, recent_command
 
 
 @pytest.mark.asyncio
@@ -52,3 +52,49 @@ async def test_recent_command_error():
     
     m.answer.assert_called_once()
     assert "Ошибка" in m.answer.call_args[0][0]
+
+
+def _commit(message, added=(), removed=()):
+    return {
+        "commit": {"message": message, "author": {"name": "u", "date": "2024-01-15T10:30:00Z"}},
+        "html_url": "",
+        "rules": {"added": list(added), "removed": list(removed)},
+    }
+
+
+@pytest.mark.asyncio
+async def test_recent_command_shows_rule_changes_and_older_page_button():
+    store = AsyncMock()
+    store.get_recent_commits.return_value = [
+        _commit("Batch", added=["DOMAIN,a.com", "DOMAIN,b.com", "DOMAIN,c.com"], removed=["DOMAIN,old.com"]),
+    ] + [_commit(f"c{i}") for i in range(4)]
+    m = MagicMock()
+    m.answer = AsyncMock()
+
+    await recent_command(m, store)
+
+    store.get_recent_commits.assert_awaited_once_with(limit=5, page=1)
+    text = m.answer.call_args[0][0]
+    assert "➕ <code>DOMAIN,c.com</code>" in text
+    assert "DOMAIN,old.com" not in text
+    assert "… и ещё 1" in text
+    buttons = [b.callback_data for row in m.answer.call_args.kwargs["reply_markup"].inline_keyboard for b in row]
+    assert buttons == ["recent:page:2"]
+
+
+@pytest.mark.asyncio
+async def test_recent_pager_edits_message_with_next_page():
+    store = AsyncMock()
+    store.get_recent_commits.return_value = [_commit("oldest", removed=["DOMAIN,x.com"])]
+    c = MagicMock()
+    c.data = "recent:page:2"
+    c.answer = AsyncMock()
+    c.message.edit_text = AsyncMock()
+
+    await on_recent_pager(c, store)
+
+    store.get_recent_commits.assert_awaited_once_with(limit=5, page=2)
+    text = c.message.edit_text.call_args[0][0]
+    assert "➖ <code>DOMAIN,x.com</code>" in text
+    buttons = [b.callback_data for row in c.message.edit_text.call_args.kwargs["reply_markup"].inline_keyboard for b in row]
+    assert buttons == ["recent:page:1"]
@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+from bot.services.retry import RateLimitExceeded, RateLimitTracker, RetryPolicy, header_wait, is_rate_limited
+
+
+def test_backoff_is_capped_and_jittered():
+    policy = RetryPolicy(base_delay=0.5, max_delay=4.0)
+    for attempt in range(10):
+        d = policy.backoff(attempt)
+        ceiling = min(4.0, 0.5 * 2 ** attempt)
+        assert ceiling / 2 <= d <= ceiling
+
+
+def test_delay_honours_retry_after():
+    policy = RetryPolicy(base_delay=0.5, max_header_wait=10)
+    d = policy.delay(0, {"Retry-After": "3"})
+    assert 3 <= d <= 3.5
+
+
+def test_delay_fails_fast_on_long_waits():
+    policy = RetryPolicy(max_header_wait=10)
+    reset = str(int(time.time()) + 600)
+    with pytest.raises(RateLimitExceeded):
+        policy.delay(0, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset})
+
+
+def test_header_wait_and_rate_limit_detection():
+    assert header_wait({}) is None
+    assert header_wait({"X-RateLimit-Remaining": "10", "X-RateLimit-Reset": "0"}) is None
+    assert header_wait({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "110"}, now=100) == 10
+    assert is_rate_limited(429, {"Retry-After": "1"})
+    assert is_rate_limited(403, {"X-RateLimit-Remaining": "0"})
+    assert not is_rate_limited(403, {"X-RateLimit-Remaining": "5"})
+    assert not is_rate_limited(500, {"Retry-After": "1"})
+
+
+def test_tracker_fails_fast_when_budget_exhausted():
+    tracker = RateLimitTracker()
+    tracker.update({"X-RateLimit-Remaining": "42", "X-RateLimit-Reset": str(int(time.time()) + 60)})
+    tracker.check()
+    tracker.update({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(int(time.time()) + 60)})
+    with pytest.raises(RateLimitExceeded) as exc:
+        tracker.check()
+    assert exc.value.reset_time
+
+
+def test_tracker_blocks_after_secondary_limit():
+    tracker = RateLimitTracker()
+    tracker.update({"Retry-After": "30"})
+    with pytest.raises(RateLimitExceeded):
+        tracker.check()
@@ -0,0 +1,114 @@
+"""RulesDocument: hash index over rule lines kept current across edits."""
+import random
+
+from bot.services.rules_file import (
+    RulesDocument,
+    Rule,
+    RuleType,
+    Policy,
+    find_rule_index,
+    parse_document,
+    parse_text,
+    render_lines,
+    delete_rule,
+    clear_policy,
+    add_rule,
+)
+
+SAMPLE = """# header
+DOMAIN,foo.com,PROXY
+# Added: x
+DOMAIN,bar.com
+DOMAIN-SUFFIX,foo.com
+DOMAIN,foo.com
+"""
+
+
+def _assert_index_matches(doc):
+    keys = {(l.rule.type, l.rule.value) for l in doc.lines if l.rule}
+    keys |= {(RuleType.DOMAIN, "missing.com")}
+    for rtype, value in keys:
+        assert doc.find(rtype, value) == find_rule_index(doc.lines, rtype, value)
+
+
+def test_find_matches_linear_scan():
+    doc = RulesDocument(parse_text(SAMPLE))
+    assert doc.find(RuleType.DOMAIN, "foo.com") == 1
+    assert doc.find(RuleType.DOMAIN_SUFFIX, "foo.com") == 4
+    assert doc.find(RuleType.DOMAIN, "nope.com") is None
+    _assert_index_matches(doc)
+
+
+def test_edits_match_list_functions():
+    lines = parse_text(SAMPLE)
+    doc = RulesDocument(lines)
+    doc.delete(3, removed_comment="# Removed: y")
+    doc.add(Rule(type=RuleType.DOMAIN, value="new.com", policy=None), "# Added: z")
+    doc.clear_policy(doc.find(RuleType.DOMAIN, "foo.com"))
+    doc.delete(doc.find(RuleType.DOMAIN, "foo.com"))
+
+    expected = delete_rule(lines, 3, removed_comment="# Removed: y")
+    expected = add_rule(expected, Rule(type=RuleType.DOMAIN, value="new.com", policy=None), "# Added: z")
+    expected = clear_policy(expected, find_rule_index(expected, RuleType.DOMAIN, "foo.com"))
+    expected = delete_rule(expected, find_rule_index(expected, RuleType.DOMAIN, "foo.com"))
+    assert doc.render() == render_lines(expected)
+    # The duplicate further down became the first occurrence
+    assert doc.find(RuleType.DOMAIN, "foo.com") == find_rule_index(doc.lines, RuleType.DOMAIN, "foo.com") is not None
+    _assert_index_matches(doc)
+
+
+def test_index_survives_many_random_edits():
+    rnd = random.Random(7)
+    doc = RulesDocument(parse_text(SAMPLE))
+    # Enough inserts/deletes to roll the shift log over several times
+    for i in range(400):
+        rules = [(n, l.rule) for n, l in enumerate(doc.lines) if l.rule]
+        if rules and rnd.random() < 0.4:
+            n, _ = rnd.choice(rules)
+            doc.delete(n, removed_comment=rnd.choice([None, "# Removed"]))
+        else:
+            value = f"h{rnd.randrange(60)}.com"
+            doc.add(Rule(type=RuleType.DOMAIN, value=value, policy=Policy.PROXY), rnd.choice(["# Added: a", ""]))
+        _assert_index_matches(doc)
+
+
+def test_copy_is_independent():
+    doc = RulesDocument(parse_text(SAMPLE))
+    other = doc.copy()
+    other.add(Rule(type=RuleType.DOMAIN, value="new.com", policy=None), "# Added")
+    other.delete(1)
+    assert doc.render() == render_lines(parse_text(SAMPLE))
+    assert doc.find(RuleType.DOMAIN, "new.com") is None
+    assert doc.find(RuleType.DOMAIN, "foo.com") == 1
+    assert other.find(RuleType.DOMAIN, "new.com") is not None
+
+
+def test_parse_document_reuses_index_per_snapshot():
+    fetched = {"sha": "doc-sha-1", "text": SAMPLE}
+    first = parse_document(fetched)
+    first.add(Rule(type=RuleType.DOMAIN, value="new.com", policy=None), "# Added")
+    second = parse_document(fetched)
+    assert second.find(RuleType.DOMAIN, "new.com") is None
+    # Unedited copies share the snapshot's index instead of rebuilding it
+    assert second._index is parse_document(fetched)._index
+
+
+def test_snapshot_edits_reuse_the_cached_index(monkeypatch):
+    builds = []
+    ensure = RulesDocument._ensure_index
+
+    def counting(self):
+        if self._index is None:
+            builds.append(self)
+        ensure(self)
+
+    monkeypatch.setattr(RulesDocument, "_ensure_index", counting)
+    fetched = {"sha": "s-index-reuse", "text": SAMPLE}
+    for value in ("one.com", "two.com"):
+        doc = parse_document(fetched)
+        doc.add(Rule(RuleType.DOMAIN, value, None), "# Added: x")
+        assert doc.find(RuleType.DOMAIN, value) == len(doc) - 1
+        _assert_index_matches(doc)
+    # Built once for the snapshot; each edit updates its copy incrementally
+    assert len(builds) == 1
+    assert parse_document(fetched).find(RuleType.DOMAIN, "one.com") is None
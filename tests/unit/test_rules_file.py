@@ -2,7 +2,7 @@ import base64
 import datetime as dt
 import pytest
 
-from bot.services.rules_file import parse_text, list_rules, render_lines, Rule, RuleType, Policy, describe_rule
+from bot.services.rules_file import parse_text, list_rules, render_lines, Rule, RuleType, Policy, describe_rule, rule_changes
 
 SAMPLE = """
 # Comment
@@ -48,3 +48,67 @@ def test_render_empty_file():
     lines = parse_text("# comment\n")
     text = render_lines(lines)
     assert text == "# comment\n"
+
+
+def test_rule_changes_from_patch():
+    patch = (
+        "@@ -1,2 +1,2 @@\n"
+        "-DOMAIN,old.com\n"
+        "-DOMAIN-SUFFIX,same.com,PROXY\n"
+        "+# Added: note\n"
+        "+DOMAIN-SUFFIX,same.com,DIRECT\n"
+        "+IP-CIDR,10.0.0.0/8\n"
+    )
+    added, removed = rule_changes(patch)
+    assert added == ["IP-CIDR,10.0.0.0/8"]
+    assert removed == ["DOMAIN,old.com"]
+
+
+def test_parsed_records_are_compact_and_shared():
+    first = parse_text("DOMAIN,shared.example.com,PROXY\n# c\n")
+    second = parse_text("DOMAIN,shared.example.com\n")
+    line = first[0]
+    assert not hasattr(line, "__dict__") and not hasattr(line.rule, "__dict__")
+    with pytest.raises(AttributeError):
+        line.rule.policy = None
+    # Values are interned across parses; rule lines keep no raw text
+    assert first[0].rule.value is second[0].rule.value
+    assert line.text == "" and first[1].text == "# c"
+
+
+MIXED = """IP-CIDR6,2001:db8::/32,no-resolve
+IP-CIDR,1.2.3.0/24,DIRECT,no-resolve
+GEOIP,CN,DIRECT
+USER-AGENT,App/1.0 (iPhone, iOS 17)*
+URL-REGEX,^https?://ads\\.example\\.com/a{1,3},REJECT
+AND,((DOMAIN,a.com),(DST-PORT,443)),PROXY
+DOMAIN-SUFFIX , spaced.com , PROXY
+DOMAIN,a.com,REJECT-DROP
+  # indented comment
+FINAL,PROXY
+DOMAIN,x.com # trailing
+"""
+
+
+def test_tokenizer_recognises_every_rule_type():
+    lines = parse_text(MIXED)
+    rules = [l.rule for l in lines if l.rule]
+    assert [r.type for r in rules] == [
+        RuleType.IP_CIDR6, RuleType.IP_CIDR, RuleType.GEOIP, RuleType.USER_AGENT,
+        RuleType.URL_REGEX, RuleType.AND, RuleType.DOMAIN_SUFFIX,
+    ]
+    assert rules[1].policy == Policy.DIRECT and rules[1].options == ("no-resolve",)
+    # Commas inside free-form values stay part of the value
+    assert rules[3].value == "App/1.0 (iPhone, iOS 17)*"
+    assert rules[4].value == "^https?://ads\\.example\\.com/a{1,3}" and rules[4].policy == Policy.REJECT
+    assert rules[5].value == "((DOMAIN,a.com),(DST-PORT,443))"
+    assert rules[6].value == "spaced.com"
+    # An unknown policy name keeps the whole line opaque
+    assert [l.kind for l in lines[-4:]] == ["other", "comment", "other", "other"]
+
+
+def test_render_only_drops_policy_of_plain_bot_rules():
+    text = render_lines(parse_text(MIXED + "DOMAIN,b.com,PROXY\n"))
+    # Everything except the bot's own rule types is written back as it was
+    expected = MIXED.replace("DOMAIN-SUFFIX , spaced.com , PROXY", "DOMAIN-SUFFIX,spaced.com")
+    assert text == expected + "DOMAIN,b.com\n"
@@ -45,3 +45,22 @@ def test_replace_policy_no_mutation():
     # New should have new policy
     assert new_lines[0].rule.policy == Policy.DIRECT
     assert new_lines[0].rule is not original_rule
+
+
+def test_edits_keep_previous_versions():
+    """Edits on a parsed snapshot return new versions and leave the old one intact."""
+    from bot.services.rules_file import add_rule, delete_rule, parse_snapshot, render_lines
+
+    fetched = {"sha": "immut-1", "text": "# Added: x\nDOMAIN,a.com\nDOMAIN,b.com,PROXY\n"}
+    lines = parse_snapshot(fetched)
+    added = add_rule(lines, Rule(type=RuleType.DOMAIN, value="c.com", policy=None), "# Added: y")
+    deleted = delete_rule(added, 1, removed_comment="# Removed: z")
+    cleared = clear_policy(deleted, 2)
+
+    assert render_lines(lines) == "# Added: x\nDOMAIN,a.com\nDOMAIN,b.com\n"
+    assert lines[2].rule.policy == Policy.PROXY
+    assert render_lines(added).endswith("# Added: y\nDOMAIN,c.com\n")
+    assert render_lines(deleted).startswith("# Removed: z\n# DOMAIN,a.com\n")
+    assert cleared[2].rule.policy is None and deleted[2].rule.policy == Policy.PROXY
+    # The cached parse is unchanged
+    assert parse_snapshot(fetched) == lines
@@ -41,3 +41,32 @@ def test_clear_policy_renders_two_columns():
     # policy must be dropped
     assert "DOMAIN,foo.com\n" in text
     assert ",PROXY" not in text
+
+
+def test_apply_ops_replays_on_concurrently_edited_content():
+    from bot.services.rules_file import RuleOp, apply_ops
+
+    ops = [
+        RuleOp("add", Rule(type=RuleType.DOMAIN, value="new.com", policy=None), "# Added: mine"),
+        RuleOp("delete", Rule(type=RuleType.DOMAIN, value="foo.com", policy=None), "# Removed: mine"),
+        RuleOp("clear_policy", Rule(type=RuleType.DOMAIN, value="bar.com", policy=None)),
+    ]
+    # Someone else added other.com meanwhile
+    fresh = parse_text(SAMPLE + "\nDOMAIN,other.com\n")
+    text = render_lines(apply_ops(fresh, ops))
+
+    assert "DOMAIN,other.com\n" in text
+    assert "DOMAIN,new.com\n" in text
+    assert "# DOMAIN,foo.com" in text
+    assert "DOMAIN,bar.com\n" in text and ",DIRECT" not in text
+
+
+def test_apply_ops_skips_already_applied():
+    from bot.services.rules_file import RuleOp, apply_ops
+
+    lines = parse_text(SAMPLE)
+    ops = [
+        RuleOp("add", Rule(type=RuleType.DOMAIN, value="foo.com", policy=None), "# Added"),
+        RuleOp("delete", Rule(type=RuleType.DOMAIN, value="gone.com", policy=None), "# Removed"),
+    ]
+    assert render_lines(apply_ops(lines, ops)) == render_lines(lines)
@@ -0,0 +1,84 @@
+"""reparse(): incremental parse that keeps Line objects of unchanged lines."""
+import random
+
+import pytest
+
+from bot.services import rules_file
+from bot.services.rules_file import parse_snapshot, parse_text, reparse
+
+BASE = "".join(f"DOMAIN,host{i}.com\n" if i % 10 else f"# section {i}\n" for i in range(500))
+
+
+@pytest.fixture(autouse=True)
+def _empty_parse_cache():
+    rules_file._parse_cache.clear()
+    yield
+    rules_file._parse_cache.clear()
+
+
+def _edit(text: str, rng: random.Random) -> str:
+    raws = text.splitlines()
+    for _ in range(rng.randint(1, 4)):
+        i = rng.randint(0, len(raws))
+        op = rng.choice(("insert", "delete", "replace"))
+        new = rng.choice(("DOMAIN,new.com", "DOMAIN-SUFFIX,x.org,DIRECT", "# note", "", "junk line", "IP-CIDR,1.2.3.0/24,no-resolve"))
+        if op == "insert" or i == len(raws):
+            raws.insert(i, new)
+        elif op == "delete":
+            del raws[i]
+        else:
+            raws[i] = new
+    return "\n".join(raws) + "\n"
+
+
+def test_reparse_matches_full_parse_and_reuses_lines():
+    old_lines = parse_text(BASE)
+    text = BASE.replace("DOMAIN,host251.com\n", "") + "DOMAIN,added.com\n"
+    lines = reparse(BASE, old_lines, text)
+
+    assert lines == parse_text(text)
+    assert all(a is b for a, b in zip(lines[:251], old_lines[:251]))
+    assert all(a is b for a, b in zip(lines[251:-1], old_lines[252:]))
+
+
+def test_reparse_random_edits_match_full_parse():
+    rng = random.Random(7)
+    old_text, old_lines = BASE, parse_text(BASE)
+    for _ in range(200):
+        text = _edit(old_text, rng)
+        lines = reparse(old_text, old_lines, text)
+        assert lines == parse_text(text)
+        old_text, old_lines = text, lines
+
+
+@pytest.mark.parametrize("old, new", [("", "DOMAIN,a.com\n"), ("DOMAIN,a.com\n", ""), ("a\nb\n", "a\nb\n"), ("x\n", "y\n")])
+def test_reparse_edge_cases(old, new):
+    assert reparse(old, parse_text(old), new) == parse_text(new)
+
+
+def test_reparse_falls_back_when_lines_do_not_match_text():
+    assert reparse(BASE, parse_text("DOMAIN,other.com\n"), BASE) == parse_text(BASE)
+
+
+def test_parse_snapshot_reparses_against_cached_version(monkeypatch):
+    first = parse_snapshot({"sha": "s1", "text": BASE})
+    tokenized = []
+    real = rules_file._tokenize
+    monkeypatch.setattr(rules_file, "_tokenize", lambda raws: tokenized.append(len(raws)) or real(raws))
+
+    text = BASE + "DOMAIN,added.com\n"
+    second = parse_snapshot({"sha": "s2", "text": text})
+
+    assert second == parse_text(text)
+    assert tokenized[0] == 1
+    assert second[0] is first[0]
+
+
+def test_parse_snapshot_parses_unrelated_text_from_scratch(monkeypatch):
+    parse_snapshot({"sha": "s1", "text": BASE})
+    calls = []
+    monkeypatch.setattr(rules_file, "reparse", lambda *a: calls.append(a))
+
+    other = "DOMAIN,unrelated.com\n" * 3
+    assert parse_snapshot({"sha": "s2", "text": other}) == parse_text(other)
+    assert calls == []
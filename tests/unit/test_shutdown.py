@@ -12,20 +12,33 @@ async def test_graceful_shutdown_timeout():
          patch('bot.main.start_metrics_server'), \
          patch('bot.main.Bot') as mock_bot, \
          patch('bot.main.Dispatcher') as mock_dp, \
-         patch('bot.main.GitHubFileStore'):
+         patch('bot.main.GitHubFileStore') as mock_store:
         
         mock_settings.return_value = MagicMock(
             bot_token="test",
             log_level="INFO",
             log_json=False,
             metrics_addr="0.0.0.0:9123",
-            allowed_users=[]
+            allowed_users=[],
+            github_webhook_secret="",
+            snapshot_refresh_seconds=0,
+            write_behind_seconds=0,
+            staging_branch="",
+            github_path_proxy="rules/private.list",
+            github_path_direct="rules/private.direct.list",
         )
         
         mock_bot_instance = MagicMock()
         mock_bot_instance.session.close = AsyncMock()
         mock_bot.return_value = mock_bot_instance
         
+        mock_store_instance = MagicMock()
+        mock_store_instance.open = AsyncMock()
+        mock_store_instance.close = AsyncMock()
+        mock_store_instance.refresh = AsyncMock(return_value={"sha": "s", "text": ""})
+        mock_store_instance.fetch_many = AsyncMock(return_value={})
+        mock_store.return_value = mock_store_instance
+
         mock_dp_instance = MagicMock()
         
         # Simulate a polling task that doesn't stop immediately
@@ -52,3 +65,6 @@ async def test_graceful_shutdown_timeout():
         
         # Verify bot session was closed
         mock_bot_instance.session.close.assert_called_once()
+        # Verify shared GitHub session was opened and closed
+        mock_store_instance.open.assert_called_once()
+        mock_store_instance.close.assert_called_once()